@@ -1,39 +1,176 @@
 import os
+import sys
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 
-# Assuming 'graph' and 'HumanMessage' are correctly imported from your modules
-from graph.main_graph import graph
-from langchain_core.messages import HumanMessage
+from perception.perplexity_api import close_async_client
+from utils.warmup import warm_up, readiness, is_ready
+from graph.checkpoint_compaction import start_compaction_job
+from memory.consolidation import start_consolidation_job
+from utils.metrics import REGISTRY, span, observe, render_prometheus
+from utils.log import get_logger
 
-app = FastAPI(title="JARVIS Agentic AI API", version="1.0.0")
+# The graph, embedding model and vector store are imported/loaded lazily (or
+# by the warm-up task) so the server can start answering /health immediately.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
+# Turns of one session allowed to wait behind the running one before 429
+SESSION_QUEUE_MAX = int(os.getenv("SESSION_QUEUE_MAX", 8))
+
+log = get_logger("api")
+
+SESSION_QUEUE_DEPTH = REGISTRY.gauge("jarvis_session_queue_depth",
+                                     "Turns waiting for an earlier turn of the same session.")
+SESSIONS_ACTIVE = REGISTRY.gauge("jarvis_sessions_active", "Sessions with a turn running or queued.")
+
+
+class SessionBusyError(Exception):
+    """Too many turns of this session are already queued."""
+
+
+class SessionScheduler:
+    """
+    Runs the turns of a session one at a time, in arrival order, so they
+    never race on the session's checkpoint; different sessions still run
+    concurrently. It is per process: with several workers, SESSION_AFFINITY=1
+    (serve.py) sends all of a session's turns to one of them.
+    """
+
+    def __init__(self, max_queued: int = SESSION_QUEUE_MAX):
+        self.max_queued = max_queued
+        self._sessions = {}  # session_id -> [asyncio.Lock, turns running or queued]
+        self._stats = {"turns": 0, "queued": 0, "rejected": 0, "max_depth": 0}
+
+    def waiting(self, session_id: str) -> int:
+        """Turns of this session that would run before a new one."""
+        entry = self._sessions.get(session_id)
+        return entry[1] if entry else 0
+
+    def is_full(self, session_id: str) -> bool:
+        return self.waiting(session_id) > self.max_queued
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = [asyncio.Lock(), 0]
+            SESSIONS_ACTIVE.inc()
+        if entry[1] > self.max_queued:
+            self._stats["rejected"] += 1
+            raise SessionBusyError(f"Session {session_id} already has {entry[1]} turns pending.")
+
+        lock = entry[0]
+        entry[1] += 1
+        self._stats["turns"] += 1
+        queued = lock.locked()
+        if queued:
+            self._stats["queued"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], entry[1] - 1)
+            SESSION_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        acquired = False
+        try:
+            # asyncio.Lock hands itself to waiters in FIFO order
+            await lock.acquire()
+            acquired = True
+            if queued:
+                SESSION_QUEUE_DEPTH.dec()
+                queued = False
+            observe("queue", "session_wait", time.perf_counter() - start)
+            yield
+        finally:
+            if queued:  # cancelled while waiting
+                SESSION_QUEUE_DEPTH.dec()
+            if acquired:
+                lock.release()
+            entry[1] -= 1
+            if entry[1] == 0 and self._sessions.get(session_id) is entry:
+                del self._sessions[session_id]
+                SESSIONS_ACTIVE.dec()
+
+    def stats(self) -> dict:
+        return dict(self._stats, sessions=len(self._sessions), queue_depth=SESSION_QUEUE_DEPTH.value())
+
+
+session_scheduler = SessionScheduler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = asyncio.create_task(warm_up()) if WARMUP_ON_STARTUP else None
+    # Periodic checkpoint pruning / TTL expiry (off unless CHECKPOINT_COMPACT_INTERVAL > 0)
+    compaction_job = start_compaction_job()
+    # Periodic long-term memory dedup (off unless MEMORY_CONSOLIDATE_INTERVAL > 0)
+    consolidation_job = start_consolidation_job()
+    yield
+    if compaction_job is not None:
+        compaction_job.set()
+    if consolidation_job is not None:
+        consolidation_job.set()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    # Release the pooled LLM connections and checkpoint DB on shutdown
+    await close_async_client()
+    if "graph.main_graph" in sys.modules:
+        from graph.main_graph import close_async_graph, wait_for_memory_saves
+        await asyncio.to_thread(wait_for_memory_saves)
+        await close_async_graph()
+
+
+app = FastAPI(title="JARVIS Agentic AI API", version="1.0.0", lifespan=lifespan)
+
+
+class WorkerHeaderMiddleware:
+    """Tags every response with X-Worker-Pid, to see which worker served it (serve.py)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = (b"x-worker-pid", str(os.getpid()).encode())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [self.header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_header)
+
+
+app.add_middleware(WorkerHeaderMiddleware)
 
 # 1. Define the input data structure for the API
 class ChatQuery(BaseModel):
     # Use a session_id instead of a fixed CONVERSATION_ID for multi-user support
     session_id: str
     query: str
+    # Optional: long-term memories are then shared by all of this user's sessions
+    user_id: Optional[str] = None
 
-def get_final_response(query: str, conversation_id: str) -> Optional[str]:
+async def get_final_response(query: str, conversation_id: str, user_id: Optional[str] = None) -> Optional[str]:
     """
-    Runs the agentic graph, returning only the final response.
+    Runs the agentic graph asynchronously, returning only the final response.
     """
+    from graph.main_graph import get_async_graph
+    from langchain_core.messages import HumanMessage
+
     # **IMPORTANT:** Use the session_id as the thread_id for state management
-    config = {"configurable": {"thread_id": conversation_id}}
+    config = {"configurable": {"thread_id": conversation_id, "user_id": user_id}}
     inputs = {"messages": [HumanMessage(content=query)]}
-    
-    final_message = None
-    
-    # Use .stream() to run the graph and get chunks
-    for chunk in graph.stream(inputs, config=config):
-        # We assume the 'respond' node contains the final output message
-        if "respond" in chunk:
-            # Adjust this line based on the exact structure of your final output
-            # This is a common pattern for LangGraph/LangChain runnables
-            final_message = chunk["respond"]["messages"][-1].content 
-            break
-            
+
+    graph = await get_async_graph()
+
+    # ainvoke never blocks the event loop; the final answer is the last message
+    result = await graph.ainvoke(inputs, config=config)
+    final_message = result["messages"][-1].content if result.get("messages") else None
+
     return final_message or "Agent finished, but did not return a response."
 
 
@@ -42,16 +179,134 @@ async def chat_endpoint(data: ChatQuery) -> Dict[str, Any]:
     """
     Primary endpoint for interacting with the agent.
     """
-    print(f"Received query from session {data.session_id}: {data.query}")
-    
-    response_text = get_final_response(data.query, data.session_id)
-    
+    log.info(f"Received query from session {data.session_id}: {data.query}")
+
+    try:
+        with span("request", "chat"):
+            async with session_scheduler.turn(data.session_id):
+                response_text = await get_final_response(data.query, data.session_id, data.user_id)
+    except SessionBusyError as e:
+        return JSONResponse(status_code=429, content={"session_id": data.session_id, "error": str(e)})
+
     return {
         "session_id": data.session_id,
         "response": response_text,
     }
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_events(query: str, conversation_id: str, user_id: Optional[str] = None):
+    """
+    Runs the graph with token streaming on and yields SSE frames:
+    start, tool_start / tool_end per tool call, token (answer text as it is
+    generated), then done with the full response (or error). A reset event
+    means the answer text sent so far is void (the planner's reply was
+    repaired) and the tokens that follow replace it.
+    """
+    from graph.main_graph import get_async_graph
+    from langchain_core.messages import HumanMessage
+
+    yield _sse("start", {"session_id": conversation_id, "queued": session_scheduler.waiting(conversation_id)})
+
+    config = {"configurable": {"thread_id": conversation_id, "user_id": user_id, "stream_tokens": True}}
+    inputs = {"messages": [HumanMessage(content=query)]}
+    tool_names = {}
+    final_message = None
+    start = time.perf_counter()
+
+    try:
+        async with session_scheduler.turn(conversation_id):
+            graph = await get_async_graph()
+            async for mode, chunk in graph.astream(inputs, config=config, stream_mode=["updates", "custom"]):
+                if mode == "custom":
+                    if chunk.get("type") == "token":
+                        yield _sse("token", {"text": chunk["text"]})
+                    elif chunk.get("type") == "reset":
+                        yield _sse("reset", {})
+                    continue
+
+                for node, update in chunk.items():
+                    for message in (update or {}).get("messages", []):
+                        if message.type == "ai" and message.tool_calls:
+                            for tc in message.tool_calls:
+                                tool_names[tc["id"]] = tc["name"]
+                                yield _sse("tool_start", {"id": tc["id"], "tool": tc["name"], "args": tc["args"]})
+                        elif message.type == "tool":
+                            yield _sse("tool_end", {
+                                "id": message.tool_call_id,
+                                "tool": tool_names.get(message.tool_call_id),
+                                "ok": not str(message.content).startswith("Error"),
+                            })
+                        elif message.type == "ai":
+                            final_message = message.content
+                            # Fast-path answers are templated, not generated: send them whole
+                            if node == "fast_router":
+                                yield _sse("token", {"text": final_message})
+    except Exception as e:
+        log.error(f"Stream error for session {conversation_id}: {e}")
+        yield _sse("error", {"message": str(e)})
+        return
+    finally:
+        observe("request", "chat_stream", time.perf_counter() - start)
+
+    yield _sse("done", {"response": final_message or "Agent finished, but did not return a response."})
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(data: ChatQuery):
+    """
+    Same as /chat, but streams progress and the answer as Server-Sent Events.
+    """
+    log.info(f"Received streaming query from session {data.session_id}: {data.query}")
+    if session_scheduler.is_full(data.session_id):
+        return JSONResponse(status_code=429, content={"session_id": data.session_id,
+                                                      "error": "Too many turns pending for this session."})
+    return StreamingResponse(
+        stream_events(data.query, data.session_id, data.user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/health")
 def health_check():
-    """Simple health check endpoint."""
-    return {"status": "ok", "service": "JARVIS-agentic-ai"}
\ No newline at end of file
+    """Liveness: the process is up, even if models are still loading."""
+    return {"status": "ok", "service": "JARVIS-agentic-ai"}
+
+@app.get("/stats")
+def stats():
+    """Cache and queue counters (hit rates, saved latency, backlog)."""
+    from tools.tool_registry import tool_cache, tool_catalog
+    from reasoning.tool_call_parser import parser_stats
+    from perception.llm_client import get_llm_client
+    from memory.local_embedding import get_embedding_cache_stats, embedding_batcher
+    from memory.write_behind import memory_write_queue
+    from perception.perplexity_api import llm_flight
+    from tools.tool_registry import tool_flights
+
+    return {
+        "tool_cache": tool_cache.stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "memory_write_queue": memory_write_queue.stats(),
+        "prompt_tokens": tool_catalog.prompt_stats(),
+        "tool_call_parser": parser_stats(),
+        "llm_client": get_llm_client().stats(),
+        "session_queue": session_scheduler.stats(),
+        "coalescing": {"llm": llm_flight.stats(), **{name: f.stats() for name, f in tool_flights.items()}},
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Latency histograms (requests, graph nodes, LLM, tools, embedding, vector store) for Prometheus."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready_check():
+    """Readiness: 200 once the model, vector store and graph have loaded."""
+    ready = is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "loading", "components": readiness()},
+    )
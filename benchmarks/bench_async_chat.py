@@ -0,0 +1,88 @@
+# benchmarks/bench_async_chat.py
+"""
+Load benchmark for the /chat request path against a local stub LLM.
+
+    python -m benchmarks.bench_async_chat --delay 0.2 --concurrency 1 4 16
+
+For each concurrency level N it runs N sessions at once and reports wall time:
+  - blocking: the old pattern, sync perplexity_search called inside a coroutine
+  - async:    aperplexity_search over the shared connection pool
+  - chat:     the full /chat endpoint (graph.astream) via an in-process ASGI client
+With a serialising event loop wall time grows ~N x delay; with the async path
+it stays close to the per-session cost.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+
+async def run_blocking(n):
+    from perception.perplexity_api import perplexity_search
+
+    async def session(i):
+        return perplexity_search(f"question {i}")
+
+    await asyncio.gather(*(session(i) for i in range(n)))
+
+
+async def run_async(n):
+    from perception.perplexity_api import aperplexity_search
+    await asyncio.gather(*(aperplexity_search(f"question {i}") for i in range(n)))
+
+
+async def run_chat(n):
+    import httpx
+    from api import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(
+            client.post("/chat", json={"session_id": f"bench_{n}_{i}", "query": f"question {i}"})
+            for i in range(n)
+        ))
+
+
+async def run_all(modes, levels):
+    from perception.perplexity_api import close_async_client
+
+    # Single event loop: the pooled client is bound to the loop that created it
+    for name, fn in modes:
+        await fn(1)  # warm-up: imports, model load, checkpointer setup
+        for n in levels:
+            start = time.perf_counter()
+            await fn(n)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10}{n:>10}{elapsed:>12.3f}{n / elapsed:>12.1f}")
+    await close_async_client()
+    if any(name == "chat" for name, _ in modes):
+        from graph.main_graph import close_async_graph
+        await close_async_graph()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--skip-chat", action="store_true", help="only benchmark the LLM client")
+    args = parser.parse_args()
+
+    with StubLLMServer(delay=args.delay) as server:
+        # Must be set before utils.config is imported
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+
+        modes = [("blocking", run_blocking), ("async", run_async)]
+        if not args.skip_chat:
+            modes.append(("chat", run_chat))
+
+        print(f"{'mode':<10}{'sessions':>10}{'wall (s)':>12}{'sessions/s':>12}")
+        asyncio.run(run_all(modes, args.concurrency))
+        print(f"stub LLM requests served: {server.request_count}")
+
+
+if __name__ == "__main__":
+    main()
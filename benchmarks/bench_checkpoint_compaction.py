@@ -0,0 +1,115 @@
+# benchmarks/bench_checkpoint_compaction.py
+"""
+Store size and thread-load latency before and after checkpoint compaction,
+on a synthetic SQLite checkpoint store.
+
+    python -m benchmarks.bench_checkpoint_compaction --threads 2000 --turns 10 --keep-last 10
+
+Each thread gets `turns` turns of three checkpoints (planner, tool, respond)
+whose message list grows like a real conversation. A `--stale` fraction of
+threads was last active 60 days ago and expires under --ttl-days.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from graph.checkpoint_compaction import checkpoint_id_at, compact_sqlite
+
+
+def build_store(path, n_threads, turns, stale_fraction, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    saver = SqliteSaver(conn)
+    saver.setup()
+
+    now = time.time()
+    threads = []
+    for t in range(n_threads):
+        thread_id = f"thread_{t}"
+        threads.append(thread_id)
+        base = now - (60 * 86400 if rng.random() < stale_fraction else rng.uniform(0, 86400))
+        messages, parent, step = [], None, 0
+        for turn in range(turns):
+            messages = messages + [HumanMessage(content=f"question {turn} " + "q" * rng.randint(20, 120))]
+            for node in ("planner_llm", "tool_executor", "respond"):
+                if node == "respond":
+                    messages = messages + [AIMessage(content=f"answer {turn} " + "a" * rng.randint(50, 400))]
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = checkpoint_id_at(base + step * 0.001)
+                checkpoint["channel_values"] = {"messages": messages}
+                checkpoint["channel_versions"] = {"messages": step + 1}
+                config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+                if parent:
+                    config["configurable"]["checkpoint_id"] = parent
+                saver.put(config, checkpoint, {"source": "loop", "step": step}, {"messages": step + 1})
+                parent = checkpoint["id"]
+                step += 1
+    conn.close()
+    return threads
+
+
+def measure(path, threads, samples=300, seed=1):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    saver = SqliteSaver(conn)
+    sample = random.Random(seed).sample(threads, min(samples, len(threads)))
+
+    latest, history = [], []
+    for thread_id in sample:
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        start = time.perf_counter()
+        saver.get_tuple(config)
+        latest.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        sum(1 for _ in saver.list(config))
+        history.append(time.perf_counter() - start)
+
+    rows = conn.execute("SELECT COUNT(*), COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()
+    conn.close()
+    size = sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+    return {
+        "size_mb": size / 1e6,
+        "checkpoints": rows[0],
+        "threads": rows[1],
+        "load_p50_ms": statistics.median(latest) * 1000,
+        "load_p95_ms": sorted(latest)[int(0.95 * len(latest))] * 1000,
+        "history_p50_ms": statistics.median(history) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--stale", type=float, default=0.3)
+    parser.add_argument("--keep-last", type=int, default=10)
+    parser.add_argument("--ttl-days", type=float, default=30)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "compaction.sqlite")
+    start = time.perf_counter()
+    threads = build_store(path, args.threads, args.turns, args.stale)
+    print(f"built {args.threads} threads x {args.turns * 3} checkpoints in {time.perf_counter() - start:.1f}s")
+
+    before = measure(path, threads)
+    stats = compact_sqlite(path, keep_last=args.keep_last, ttl_days=args.ttl_days)
+    after = measure(path, threads)
+
+    print(f"\n{'':<18}{'before':>12}{'after':>12}")
+    for key in before:
+        print(f"{key:<18}{before[key]:>12.2f}{after[key]:>12.2f}")
+    print(f"\nexpired threads: {stats['threads_expired']}, checkpoints deleted: "
+          f"{stats['checkpoints_deleted']}, writes deleted: {stats['writes_deleted']}")
+
+
+if __name__ == "__main__":
+    main()
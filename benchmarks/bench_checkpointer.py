@@ -0,0 +1,155 @@
+# benchmarks/bench_checkpointer.py
+"""
+Concurrent checkpoint writes against each checkpointer backend.
+
+    python -m benchmarks.bench_checkpointer --threads 32 --writes 50
+    python -m benchmarks.bench_checkpointer --backends postgres --database-url postgresql://...
+
+Many threads (sync savers) or tasks (async savers) each write a chain of
+checkpoints for their own thread_id through one shared saver, as the API
+workers do. Afterwards every thread is read back and checked: the latest
+checkpoint must be the last one written and the chain must be complete.
+Reports writes/s per backend; exits 1 if any write failed or was lost.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+from graph.checkpointer import create_checkpointer, create_async_checkpointer
+
+
+def make_checkpoint(step, thread):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid6(clock_seq=step))
+    checkpoint["channel_values"] = {"messages": [
+        HumanMessage(content=f"question {step} from {thread}"),
+        AIMessage(content=f"answer {step} " + "x" * 200),
+    ]}
+    checkpoint["channel_versions"] = {"messages": step}
+    return checkpoint
+
+
+def _config(thread, parent=None):
+    config = {"configurable": {"thread_id": thread, "checkpoint_ns": ""}}
+    if parent:
+        config["configurable"]["checkpoint_id"] = parent
+    return config
+
+
+def write_chain(saver, thread, writes):
+    parent = None
+    for step in range(writes):
+        checkpoint = make_checkpoint(step, thread)
+        saver.put(_config(thread, parent), checkpoint, {"source": "loop", "step": step}, {"messages": step})
+        parent = checkpoint["id"]
+    return parent
+
+
+async def awrite_chain(saver, thread, writes):
+    parent = None
+    for step in range(writes):
+        checkpoint = make_checkpoint(step, thread)
+        await saver.aput(_config(thread, parent), checkpoint, {"source": "loop", "step": step}, {"messages": step})
+        parent = checkpoint["id"]
+    return parent
+
+
+def verify(saver, last_ids, writes):
+    errors = 0
+    for thread, last_id in last_ids.items():
+        latest = saver.get_tuple(_config(thread))
+        count = sum(1 for _ in saver.list(_config(thread)))
+        if latest is None or latest.checkpoint["id"] != last_id or count != writes:
+            errors += 1
+    return errors
+
+
+async def averify(saver, last_ids, writes):
+    errors = 0
+    for thread, last_id in last_ids.items():
+        latest = await saver.aget_tuple(_config(thread))
+        count = 0
+        async for _ in saver.alist(_config(thread)):
+            count += 1
+        if latest is None or latest.checkpoint["id"] != last_id or count != writes:
+            errors += 1
+    return errors
+
+
+def run_sync(backend, args, tag):
+    saver, close = create_checkpointer(backend, database_url=args.database_url, path=args.path)
+    threads = [f"{tag}_sync_{i}" for i in range(args.threads)]
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = {t: pool.submit(write_chain, saver, t, args.writes) for t in threads}
+    elapsed = time.perf_counter() - start
+    last_ids = {}
+    for t, future in futures.items():
+        try:
+            last_ids[t] = future.result()
+        except Exception as e:
+            failures += 1
+            print(f"  write failed for {t}: {e}")
+    failures += verify(saver, last_ids, args.writes)
+    close()
+    return elapsed, failures
+
+
+async def run_async(backend, args, tag):
+    saver, aclose = await create_async_checkpointer(backend, database_url=args.database_url, path=args.path)
+    threads = [f"{tag}_async_{i}" for i in range(args.threads)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(awrite_chain(saver, t, args.writes) for t in threads),
+                                   return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failures = 0
+    last_ids = {}
+    for t, result in zip(threads, results):
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"  write failed for {t}: {result}")
+        else:
+            last_ids[t] = result
+    failures += await averify(saver, last_ids, args.writes)
+    await aclose()
+    return elapsed, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"],
+                        choices=["memory", "sqlite", "postgres"])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50, help="checkpoints per thread")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--path", default=os.path.join(tempfile.mkdtemp(), "bench_checkpoints.sqlite"))
+    args = parser.parse_args()
+
+    total = args.threads * args.writes
+    tag = f"bench_{int(time.time())}"
+    rows, failed = [], False
+    for backend in args.backends:
+        for mode, runner in (("sync", lambda: run_sync(backend, args, tag)),
+                             ("async", lambda: asyncio.run(run_async(backend, args, tag)))):
+            elapsed, failures = runner()
+            failed |= failures > 0
+            rows.append((backend, mode, elapsed, failures))
+
+    print(f"\n{args.threads} concurrent writers x {args.writes} checkpoints")
+    print(f"{'backend':<10}{'mode':<7}{'seconds':>9}{'writes/s':>11}{'failures':>10}")
+    for backend, mode, elapsed, failures in rows:
+        print(f"{backend:<10}{mode:<7}{elapsed:>9.2f}{total / elapsed:>11.0f}{failures:>10}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_embedding_batcher.py
+"""
+Throughput of one-at-a-time embedding versus the micro-batching executor.
+
+    python -m benchmarks.bench_embedding_batcher --concurrency 1 4 16 64
+    python -m benchmarks.bench_embedding_batcher --stub   # no model download
+
+Each of N worker threads embeds `--per-worker` distinct texts. Reports
+embeddings/sec and p50/p99 per-request latency. --stub uses a fake model
+whose cost is a fixed per-call overhead plus a small per-text cost, serialised like a saturated
+CPU, which is
+the shape that makes batching pay off for sentence-transformers on CPU.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from memory.local_embedding import EmbeddingBatcher
+
+
+_stub_cpu = threading.Lock()
+
+
+def stub_compute_batch(texts, call_ms=8.0, per_text_ms=0.5, dim=384):
+    # The lock stands in for the CPU: concurrent model calls don't overlap
+    with _stub_cpu:
+        time.sleep((call_ms + per_text_ms * len(texts)) / 1000)
+    return [[0.0] * dim for _ in texts]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(embed_one, concurrency, per_worker):
+    latencies = []
+
+    def worker(w):
+        for i in range(per_worker):
+            start = time.perf_counter()
+            embed_one(f"worker {w} text {i} about something")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--per-worker", type=int, default=20)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--stub", action="store_true")
+    args = parser.parse_args()
+
+    if args.stub:
+        compute_batch = stub_compute_batch
+    else:
+        from memory.local_embedding import get_embed_model
+        compute_batch = get_embed_model().get_text_embedding_batch
+
+    batcher = EmbeddingBatcher(compute_batch, args.max_batch_size, args.max_wait_ms)
+    modes = [
+        ("single", lambda text: compute_batch([text])),
+        ("batched", batcher.embed),
+    ]
+
+    print(f"{'mode':<10}{'threads':>8}{'emb/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, embed_one in modes:
+        for n in args.concurrency:
+            rate, p50, p99 = run(embed_one, n, args.per_worker)
+            print(f"{name:<10}{n:>8}{rate:>10.1f}{p50:>10.2f}{p99:>10.2f}")
+    print(f"batcher: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_embedding_cache.py
+"""
+Repeated-query workload for the embedding cache.
+
+    python -m benchmarks.bench_embedding_cache --calls 5000 --distinct 200
+    python -m benchmarks.bench_embedding_cache --stub-ms 8   # no model download
+
+Queries are drawn from a Zipf distribution over `--distinct` strings, like a
+chat service where "what is my name" comes up over and over. Reports total
+time without a cache, with the in-memory LRU cache, and after a simulated
+restart that reloads the on-disk cache.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from memory.embedding_cache import EmbeddingCache
+
+
+def make_workload(calls, distinct, seed=0):
+    rng = np.random.default_rng(seed)
+    ranks = rng.zipf(1.3, size=calls) % distinct
+    return [f"user question number {r}" for r in ranks]
+
+
+def stub_model(delay_ms, dim=384):
+    def compute_batch(texts):
+        time.sleep(delay_ms / 1000 * len(texts))
+        return [np.full(dim, hash(t) % 997, dtype=np.float32).tolist() for t in texts]
+    return compute_batch
+
+
+def run(workload, compute_batch, cache=None):
+    start = time.perf_counter()
+    for text in workload:
+        if cache is None:
+            compute_batch([text])
+        else:
+            cache.get_or_compute([text], compute_batch)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--stub-ms", type=float, default=None, help="fake model latency per text (ms)")
+    args = parser.parse_args()
+
+    if args.stub_ms is not None:
+        compute_batch = stub_model(args.stub_ms)
+    else:
+        from memory.local_embedding import get_embed_model
+        compute_batch = get_embed_model().get_text_embedding_batch
+
+    workload = make_workload(args.calls, args.distinct)
+    path = os.path.join(tempfile.mkdtemp(), "embedding_cache")
+
+    print(f"{'mode':<20}{'total (s)':>12}{'per call (ms)':>16}{'hit rate':>10}")
+
+    elapsed = run(workload, compute_batch)
+    print(f"{'no cache':<20}{elapsed:>12.3f}{elapsed / args.calls * 1000:>16.3f}{'-':>10}")
+
+    cache = EmbeddingCache(capacity=args.capacity, path=path)
+    elapsed = run(workload, compute_batch, cache)
+    print(f"{'LRU (cold start)':<20}{elapsed:>12.3f}{elapsed / args.calls * 1000:>16.3f}{cache.stats()['hit_rate']:>10.1%}")
+    cache.close()
+
+    restarted = EmbeddingCache(capacity=args.capacity, path=path)
+    elapsed = run(workload, compute_batch, restarted)
+    print(f"{'disk (after restart)':<20}{elapsed:>12.3f}{elapsed / args.calls * 1000:>16.3f}{restarted.stats()['hit_rate']:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_fast_router.py
+"""
+End-to-end latency and LLM calls with and without the fast-path router, on
+a labelled query set, against a local stub LLM.
+
+    python -m benchmarks.bench_fast_router --delay 0.2
+
+Each query is labelled with the tool the planner should pick (or none).
+The stub planner follows the labels, so the "off" run is the best case for
+the LLM path: one planner call, the tool, one summarising call. Tools with
+side effects (browser, file index, memory store) are replaced by stubs.
+Routing quality is reported as dispatched / correct / wrong / missed.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+# (query, expected tool or None, arguments the planner would send)
+LABELLED_QUERIES = [
+    ("what's my RAM", "get_system_stats", {}),
+    ("how much disk space do I have left", "get_system_stats", {}),
+    ("check my memory usage", "get_system_stats", {}),
+    ("check disk space", "get_system_stats", {}),
+    # Mention RAM / storage but are not about this machine
+    ("what is the price of 16GB RAM", "search_web", {"query": "what is the price of 16GB RAM"}),
+    ("what's the best cloud storage", "search_web", {"query": "what's the best cloud storage"}),
+    ("show me how SSD storage works", "search_web", {"query": "show me how SSD storage works"}),
+    ("play Bohemian Rhapsody", "play_song_on_youtube", {"song_query": "Bohemian Rhapsody"}),
+    ("play shape of you on youtube", "play_song_on_youtube", {"song_query": "shape of you"}),
+    ("play the song hotel california", "play_song_on_youtube", {"song_query": "hotel california"}),
+    ("list files in ~/Downloads", "list_files", {"directory": "~/Downloads"}),
+    ("show me the files", "list_files", {"directory": "."}),
+    ("open ~/Documents/report.pdf", "open_path", {"path": "~/Documents/report.pdf"}),
+    ("find resume.pdf", "find_file", {"filename": "resume.pdf"}),
+    ("where is budget_2024.xlsx", "find_file", {"filename": "budget_2024.xlsx"}),
+    ("remember that my sister's birthday is on March 3", "save_memory",
+     {"fact": "my sister's birthday is on March 3"}),
+    ("what is my name?", "retrieve_memory", {"query": "what is my name?"}),
+    ("what's my favourite colour", "retrieve_memory", {"query": "what's my favourite colour"}),
+    ("who won the 2022 world cup", "search_web", {"query": "who won the 2022 world cup"}),
+    ("what is the capital of australia", "search_web", {"query": "what is the capital of australia"}),
+    ("latest news about electric cars", "search_web", {"query": "latest news about electric cars"}),
+    ("how tall is the eiffel tower", "search_web", {"query": "how tall is the eiffel tower"}),
+    ("hello", None, {}),
+    ("thanks a lot", None, {}),
+    ("what can you do", None, {}),
+    ("tell me a joke about cats", None, {}),
+    ("write a haiku about autumn", None, {}),
+    ("help me plan my weekend", None, {}),
+]
+
+STUB_TOOL_RESULTS = {
+    "play_song_on_youtube": lambda song_query: f"Successfully opened YouTube search for '{song_query}'.",
+    "open_path": lambda path: f"Successfully opened '{path}'.",
+    "find_file": lambda filename: f"Found file at: /home/user/{filename}",
+    "list_files": lambda directory=".": f"Contents of '{directory}':\na.txt\nb.txt",
+    "save_memory": lambda fact: "Successfully saved fact to long-term memory.",
+    "retrieve_memory": lambda query: "Found relevant facts in memory: User's name is Alex",
+}
+
+
+def make_planner_reply(labels):
+    def reply(prompt):
+        user_lines = re.findall(r"^User: (.*)$", prompt, re.MULTILINE)
+        query = user_lines[-1] if user_lines else ""
+        if "Tool Result:" in prompt.rsplit(f"User: {query}", 1)[-1]:
+            return "Here is what I found."
+        tool, args = labels.get(query, (None, {}))
+        if tool is None or tool == "search_web" and "Searching" in prompt:
+            return "Happy to help!"
+        return json.dumps({"tool_name": tool, "parameters": args})
+    return reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    labels = {q: (tool, a) for q, tool, a in LABELLED_QUERIES}
+    server = StubLLMServer(delay=args.delay, reply=make_planner_reply(labels)).start()
+    os.environ["PERPLEXITY_API_URL"] = server.url
+    os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+
+    from langchain_core.messages import HumanMessage
+    import graph.main_graph as main_graph
+    import reasoning.fast_router as fast_router
+    from tools.tool_registry import AVAILABLE_TOOLS, tool_cache
+
+    AVAILABLE_TOOLS.update(STUB_TOOL_RESULTS)
+    graph = main_graph.get_graph()
+
+    # Routing decisions alone
+    dispatched = correct = wrong = missed = 0
+    for query, expected, _ in LABELLED_QUERIES:
+        route = fast_router.fast_route(query, available_tools=AVAILABLE_TOOLS)
+        if route is None:
+            missed += expected is not None
+            continue
+        dispatched += 1
+        if route[0] == expected:
+            correct += 1
+        else:
+            wrong += 1
+            print(f"  misrouted: {query!r} -> {route[0]} (expected {expected})")
+
+    results = {}
+    for enabled in (False, True):
+        main_graph.FAST_ROUTER_ENABLED = fast_router.FAST_ROUTER_ENABLED = enabled
+        tool_cache.clear()
+        latencies, calls = [], []
+        for i, (query, _, _) in enumerate(LABELLED_QUERIES):
+            before = server.request_count
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=query)]},
+                         config={"configurable": {"thread_id": f"router_{enabled}_{i}"}})
+            latencies.append(time.perf_counter() - start)
+            calls.append(server.request_count - before)
+        results["on" if enabled else "off"] = (latencies, calls)
+
+    main_graph.wait_for_memory_saves()
+    server.stop()
+
+    n = len(LABELLED_QUERIES)
+    print(f"\n{n} labelled queries, stub LLM delay {args.delay}s")
+    print(f"routing: {dispatched} dispatched, {correct} correct, {wrong} wrong, {missed} tool queries left to planner")
+    print(f"{'router':<8}{'mean ms':>10}{'p50 ms':>10}{'LLM calls':>12}{'calls/query':>13}")
+    for mode, (latencies, calls) in results.items():
+        print(f"{mode:<8}{statistics.mean(latencies) * 1000:>10.0f}{statistics.median(latencies) * 1000:>10.0f}"
+              f"{sum(calls):>12}{sum(calls) / n:>13.2f}")
+    saved = sum(results["off"][1]) - sum(results["on"][1])
+    print(f"LLM calls saved: {saved} ({saved / max(1, sum(results['off'][1])):.0%})")
+
+
+if __name__ == "__main__":
+    main()
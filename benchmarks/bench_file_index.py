@@ -0,0 +1,131 @@
+# benchmarks/bench_file_index.py
+"""
+Compares find_file's old full os.walk against the persistent FileIndex on a
+synthetic directory tree.
+
+    python -m benchmarks.bench_file_index --files 1000000 --root /tmp/jarvis_tree
+
+The tree is created once (empty files, ~100 per directory) and reused on
+later runs. Reports the walk latency per lookup, index build / reload /
+no-change refresh times, and index lookup latency percentiles.
+"""
+import argparse
+import difflib
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from tools.file_index import FileIndex, SKIP_DIRS
+
+WORDS = ["report", "invoice", "notes", "budget", "draft", "photo", "resume", "project",
+         "meeting", "summary", "backup", "config", "plan", "letter", "data", "slides"]
+EXTENSIONS = [".txt", ".pdf", ".docx", ".py", ".csv", ".md", ".png", ".json"]
+
+
+def make_tree(root, n_files, per_dir=100, seed=0):
+    marker = os.path.join(root, f".tree_{n_files}")
+    if os.path.exists(marker):
+        return
+    rng = random.Random(seed)
+    print(f"Creating {n_files} files under {root} ...")
+    for i in range(n_files):
+        d = i // per_dir
+        directory = os.path.join(root, f"d{d // 100:04d}", f"s{d % 100:02d}")
+        if i % per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}{rng.choice(EXTENSIONS)}"
+        open(os.path.join(directory, name), "w").close()
+    open(marker, "w").close()
+
+
+def legacy_find(root, filename):
+    """The previous find_file: walk, substring match (first ~100), difflib."""
+    matches = []
+    for r, dirs, files in os.walk(root, topdown=True):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')]
+        for file in files:
+            if filename.lower() in file.lower():
+                matches.append(os.path.join(r, file))
+            if len(matches) > 100:
+                break
+        if len(matches) > 100:
+            break
+    if not matches:
+        return None
+    return max(matches, key=lambda x: difflib.SequenceMatcher(None, filename, os.path.basename(x)).ratio())
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--root", default=os.path.join(tempfile.gettempdir(), "jarvis_file_tree"))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--walk-queries", type=int, default=3)
+    args = parser.parse_args()
+
+    make_tree(args.root, args.files)
+    rng = random.Random(1)
+    # Exact names, stems, typos and names that do not exist
+    queries = []
+    for _ in range(args.queries):
+        i = rng.randrange(args.files)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(f"{rng.choice(WORDS)}_{i}")
+        elif kind < 0.7:
+            queries.append(f"{rng.choice(WORDS)}_{rng.choice(WORDS)}")
+        elif kind < 0.9:
+            word = rng.choice(WORDS)
+            queries.append(word[:-2] + word[-1] + word[-2] + f"_{i}")   # transposition
+        else:
+            queries.append(f"missing_{i}_file")
+
+    walk_times = []
+    for q in queries[:args.walk_queries]:
+        start = time.perf_counter()
+        legacy_find(args.root, q)
+        walk_times.append(time.perf_counter() - start)
+
+    index_path = os.path.join(tempfile.gettempdir(), f"jarvis_file_index_{args.files}.json")
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    index = FileIndex(root=args.root, path=index_path, refresh_seconds=1e9)
+    start = time.perf_counter()
+    index.refresh()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.refresh()
+    no_change = time.perf_counter() - start
+
+    reloaded = FileIndex(root=args.root, path=index_path, refresh_seconds=1e9)
+    start = time.perf_counter()
+    reloaded._load()
+    reload = time.perf_counter() - start
+
+    lookup_times = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, limit=1)
+        lookup_times.append(time.perf_counter() - start)
+
+    print(f"files indexed:          {len(index)}")
+    print(f"os.walk per lookup:     {statistics.mean(walk_times) * 1000:.0f} ms (mean of {len(walk_times)})")
+    print(f"index build (cold):     {build:.2f}s")
+    print(f"index reload from disk: {reload:.2f}s")
+    print(f"refresh, no changes:    {no_change:.2f}s")
+    print(f"index lookup p50:       {percentile(lookup_times, 50) * 1000:.1f} ms")
+    print(f"index lookup p95:       {percentile(lookup_times, 95) * 1000:.1f} ms")
+    print(f"index lookup p99:       {percentile(lookup_times, 99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_history.py
+"""
+Planner prompt-build time and prompt size versus session length, comparing
+the old full re-format of the history with the windowed history manager.
+
+    python -m benchmarks.bench_history --turns 10 100 1000 5000
+
+Each synthetic turn is a user question, a tool call, a tool result and an
+answer. "incremental" is the steady state: the session's window is already
+warm and one new turn has just been appended.
+"""
+import argparse
+import time
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+from reasoning.history_manager import HistoryWindow, estimate_tokens
+
+SYSTEM_PROMPT = "You are JARVIS. " * 50
+
+
+def make_turn(i):
+    return [
+        HumanMessage(content=f"question number {i}: what is the weather like in city {i} today?"),
+        AIMessage(content="", tool_calls=[{"id": f"tool_{i}", "name": "search_web",
+                                           "args": {"query": f"weather in city {i}"}}]),
+        ToolMessage(content=f"The weather in city {i} is sunny, 2{i % 10}C, light wind. " * 4,
+                    tool_call_id=f"tool_{i}"),
+        AIMessage(content=f"It is sunny in city {i}, around 2{i % 10} degrees."),
+    ]
+
+
+def legacy_prompt(system_prompt, history):
+    """The previous build_prompt_with_history: every message, every step."""
+    formatted = []
+    for msg in history:
+        if msg.type == "human":
+            formatted.append(f"User: {msg.content}")
+        elif msg.type == "ai":
+            if msg.tool_calls:
+                tc = msg.tool_calls[0]
+                formatted.append(f"JARVIS: (Calling tool: {tc['name']} with args: {tc['args']})")
+            else:
+                formatted.append(f"JARVIS: {msg.content}")
+        elif msg.type == "tool":
+            formatted.append(f"Tool Result: {msg.content}")
+    return system_prompt + "\n\n**Conversation History:**\n" + "\n".join(formatted) + "\n\nJARVIS: "
+
+
+def windowed_prompt(window, history):
+    return SYSTEM_PROMPT + "\n\n**Conversation History:**\n" + window.update(history) + "\n\nJARVIS: "
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100, 500, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} | {'legacy ms':>9} {'legacy tok':>10} | {'cold ms':>8} "
+          f"{'incr ms':>8} {'window tok':>10}")
+    for n in args.turns:
+        history = [m for i in range(n) for m in make_turn(i)]
+
+        legacy_time, legacy = timed(lambda: legacy_prompt(SYSTEM_PROMPT, history), args.repeat)
+        cold_time, windowed = timed(lambda: windowed_prompt(HistoryWindow(), history), max(1, args.repeat // 4))
+
+        # Warm window, then time adding one more turn at a time
+        window = HistoryWindow()
+        windowed_prompt(window, history)
+        grown = list(history)
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            grown.extend(make_turn(n + i))
+            windowed_prompt(window, grown)
+        incr_time = (time.perf_counter() - start) / args.repeat
+
+        print(f"{n:>6} | {legacy_time * 1000:>9.3f} {estimate_tokens(legacy):>10} | "
+              f"{cold_time * 1000:>8.3f} {incr_time * 1000:>8.3f} {estimate_tokens(windowed):>10}")
+
+
+if __name__ == "__main__":
+    main()
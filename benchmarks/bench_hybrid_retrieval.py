@@ -0,0 +1,229 @@
+# benchmarks/bench_hybrid_retrieval.py
+"""
+Recall@k and latency of long-term memory retrieval on a synthetic corpus.
+
+    python -m benchmarks.bench_hybrid_retrieval --users 500 --per-user 200
+    python -m benchmarks.bench_hybrid_retrieval --users 50 --per-user 40 --embeddings model
+
+Every user (namespace) has personal facts ("my dog's name is Rex"), some
+restated or updated over time (the newest value is the right answer), and
+chat summaries about random topics. Queries ask for a fact ("what is my
+dog's name?") or a topic ("what did we say about kubernetes?"); a query is a
+hit when the memory holding the current answer is in the top k.
+
+  global vector      exact cosine top-k over one table (the old retrieval)
+  namespace vector   the same, restricted to the user's namespace
+  namespace hybrid   + BM25 fusion, recency weighting and result dedup
+
+A second part puts the whole corpus in one namespace and compares exact
+search with the IVF index: latency, and the share of the exact top-k the
+IVF index finds (ANN recall).
+
+--embeddings hash (default) uses a hashed bag-of-words embedder so 100k
+memories embed in seconds; "model" uses the real MiniLM model.
+"""
+import argparse
+import random
+import statistics
+import time
+import zlib
+
+import numpy as np
+
+from memory import hybrid_retrieval as hr
+
+DIM = 384
+ATTRIBUTES = {
+    "dog's name": ["Rex", "Bella", "Milo", "Luna", "Max", "Daisy", "Rocky", "Coco", "Bruno", "Nala"],
+    "favorite color": ["blue", "green", "red", "purple", "orange", "teal", "yellow", "black"],
+    "home city": ["Lisbon", "Denver", "Osaka", "Nairobi", "Berlin", "Austin", "Lyon", "Perth", "Quito"],
+    "employer": ["Initech", "Globex", "Umbrella", "Hooli", "Stark", "Wayne", "Acme", "Soylent"],
+    "favorite food": ["ramen", "tacos", "lasagna", "pho", "paella", "curry", "sushi", "falafel"],
+    "sister's name": ["Ana", "Maya", "Iris", "Nora", "Ella", "Zoe", "Lea", "Ivy"],
+    "car": ["Civic", "Corolla", "Model 3", "Golf", "Mustang", "Outback", "Leaf"],
+    "gym schedule": ["mondays", "tuesdays", "weekends", "mornings", "evenings", "fridays"],
+    "favorite band": ["Radiohead", "ABBA", "Queen", "Blur", "Muse", "Oasis", "Toto"],
+    "birthday": ["March 3", "June 21", "July 9", "October 30", "January 12", "May 5"],
+}
+TEMPLATES = ["my {attr} is {value}", "remember that my {attr} is {value}",
+             "I told you my {attr} is {value}", "note: my {attr} is now {value}"]
+TOPICS = ["kubernetes", "sourdough", "marathon", "mortgage", "photosynthesis", "chess openings",
+          "tax returns", "jazz piano", "python asyncio", "volcanoes", "climbing shoes", "espresso",
+          "black holes", "gardening", "vinyl records", "tide pools", "origami", "rust lifetimes"]
+FILLER = ["asked", "talked", "wondered", "chatted", "wanted advice", "had a question"]
+
+
+class HashEmbedder:
+    """Signed feature hashing of words and word pairs: deterministic, fast, lexical."""
+
+    def __call__(self, texts):
+        out = np.zeros((len(texts), DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = [w for w in hr._TOKEN.findall(text.lower()) if w not in hr._STOPWORDS]
+            for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode())
+                out[i, h % DIM] += 1.0 if h & 0x80000000 else -1.0
+        return hr._normalize_rows(out + 1e-6)
+
+
+class ModelEmbedder:
+    def __call__(self, texts):
+        from memory.local_embedding import embed_texts
+        return hr._normalize_rows(embed_texts(list(texts)))
+
+
+def build_corpus(users, per_user, seed):
+    """[(namespace, text, created_at)] plus queries [(namespace, query, answer text)]."""
+    rng = random.Random(seed)
+    now = time.time()
+    memories, queries = [], []
+    for u in range(users):
+        ns = f"user_{u}"
+        # Each fact is stated 1-3 times with a new value (an update), and sometimes restated
+        statements = []
+        for attr in rng.sample(list(ATTRIBUTES), k=rng.randint(4, len(ATTRIBUTES))):
+            for _ in range(rng.randint(1, 3)):
+                value = rng.choice(ATTRIBUTES[attr])
+                text = rng.choice(TEMPLATES).format(attr=attr, value=value)
+                statements.extend([(attr, text)] * rng.choice([1, 1, 2]))
+        topics = [None] * max(0, per_user - len(statements))
+        stream = statements + topics
+        rng.shuffle(stream)
+        # Updates keep their order: the later statement of an attribute is the current one
+        order = iter(statements)
+        stream = [next(order) if item is not None else None for item in stream]
+
+        created = now - 365 * 86400
+        current, latest_topic = {}, {}
+        for item in stream:
+            created += rng.uniform(0.5, 1.5) * 86400 * 300 / len(stream)
+            if item is not None:
+                attr, text = item
+                current[attr] = text
+            else:
+                topic = rng.choice(TOPICS)
+                text = f"user {rng.choice(FILLER)} about {topic}, ticket {rng.randint(1, 10_000)}"
+                latest_topic[topic] = text
+            memories.append((ns, text, created))
+        for attr, text in current.items():
+            queries.append((ns, f"what is my {attr}?", text))
+        for topic, text in list(latest_topic.items())[:3]:
+            queries.append((ns, f"what did we say about {topic} last time?", text))
+    return memories, queries
+
+
+def latency_ms(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return statistics.median(ms), ms[int(0.95 * (len(ms) - 1))]
+
+
+def run_global(matrix, texts, query_vectors, queries, k):
+    hits, samples = 0, []
+    for (ns, query, answer), qv in zip(queries, query_vectors):
+        start = time.perf_counter()
+        top = hr._top(matrix @ qv, k)
+        samples.append(time.perf_counter() - start)
+        hits += answer in {texts[i] for i in top}
+    return hits / len(queries), samples
+
+
+def run_namespaced(indexes, query_vectors, queries, k, hybrid):
+    saved = hr.MEMORY_BM25_WEIGHT, hr.MEMORY_RECENCY_WEIGHT
+    if not hybrid:
+        hr.MEMORY_BM25_WEIGHT, hr.MEMORY_RECENCY_WEIGHT = 0.0, 0.0
+    hits, samples = 0, []
+    try:
+        for (ns, query, answer), qv in zip(queries, query_vectors):
+            index = indexes[ns]
+            start = time.perf_counter()
+            found = index.search(query, qv, k)
+            if hybrid:
+                results = hr.rerank([(s, index.texts[r], index.vector(r)) for s, r, _ in found], k)
+            else:
+                results = [index.texts[r] for _, r, _ in sorted(found, key=lambda f: -f[2])[:k]]
+            samples.append(time.perf_counter() - start)
+            hits += answer in results
+    finally:
+        hr.MEMORY_BM25_WEIGHT, hr.MEMORY_RECENCY_WEIGHT = saved
+    return hits / len(queries), samples
+
+
+def run_ann(matrix, query_vectors, k, nprobe):
+    index = hr.NamespaceIndex("all")
+    index.add([""] * len(matrix), matrix)
+    kth_scores, exact_samples = [], []
+    for qv in query_vectors:
+        start = time.perf_counter()
+        scores = matrix @ qv
+        top = hr._top(scores, k)
+        exact_samples.append(time.perf_counter() - start)
+        kth_scores.append(scores[top[-1]])
+
+    saved = hr.MEMORY_ANN_MIN_SIZE, hr.MEMORY_ANN_NPROBE
+    hr.MEMORY_ANN_MIN_SIZE, hr.MEMORY_ANN_NPROBE = 0, nprobe
+    try:
+        start = time.perf_counter()
+        index._vector_top(query_vectors[0], k)  # builds the IVF index
+        build = time.perf_counter() - start
+        recall, ann_samples = 0.0, []
+        for qv, kth in zip(query_vectors, kth_scores):
+            start = time.perf_counter()
+            _, scores = index._vector_top(qv, k)
+            ann_samples.append(time.perf_counter() - start)
+            # Tie-aware: any row scoring at least the exact k-th best counts (the corpus repeats texts)
+            recall += np.count_nonzero(scores >= kth - 1e-5) / k
+    finally:
+        hr.MEMORY_ANN_MIN_SIZE, hr.MEMORY_ANN_NPROBE = saved
+    return build, exact_samples, ann_samples, recall / len(query_vectors), len(index._ivf.centroids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--per-user", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3, help="top-k (retrieve_memory uses 3)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nprobe", type=int, default=hr.MEMORY_ANN_NPROBE)
+    parser.add_argument("--embeddings", choices=["hash", "model"], default="hash")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    embed = HashEmbedder() if args.embeddings == "hash" else ModelEmbedder()
+    memories, queries = build_corpus(args.users, args.per_user, args.seed)
+    queries = random.Random(args.seed).sample(queries, min(args.queries, len(queries)))
+
+    start = time.perf_counter()
+    texts = [text for _, text, _ in memories]
+    matrix = embed(texts)
+    query_vectors = embed([q for _, q, _ in queries])
+    print(f"{len(memories)} memories, {args.users} namespaces, {len(queries)} queries "
+          f"({args.embeddings} embeddings, {time.perf_counter() - start:.1f}s to embed)")
+
+    start = time.perf_counter()
+    indexes, rows = {}, {}
+    for i, (ns, _, _) in enumerate(memories):
+        rows.setdefault(ns, []).append(i)
+    for ns, ids in rows.items():
+        indexes[ns] = hr.NamespaceIndex(ns)
+        indexes[ns].add([texts[i] for i in ids], matrix[ids], [memories[i][2] for i in ids])
+    print(f"Loaded into namespace indexes in {time.perf_counter() - start:.1f}s\n")
+
+    print(f"{'retrieval':<20}{f'recall@{args.k}':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, run in (("global vector", lambda: run_global(matrix, texts, query_vectors, queries, args.k)),
+                       ("namespace vector", lambda: run_namespaced(indexes, query_vectors, queries, args.k, False)),
+                       ("namespace hybrid", lambda: run_namespaced(indexes, query_vectors, queries, args.k, True))):
+        recall, samples = run()
+        p50, p95 = latency_ms(samples)
+        print(f"{label:<20}{recall:>10.1%}{p50:>9.2f}{p95:>9.2f}")
+
+    build, exact_samples, ann_samples, ann_recall, lists = run_ann(matrix, query_vectors, 10, args.nprobe)
+    print(f"\nOne namespace of {len(matrix)} rows, top-10: IVF with {lists} lists, nprobe {args.nprobe} "
+          f"(built in {build:.1f}s)")
+    print(f"{'search':<20}{'recall@10':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, samples, agreement in (("exact", exact_samples, 1.0), ("IVF", ann_samples, ann_recall)):
+        p50, p95 = latency_ms(samples)
+        print(f"{label:<20}{agreement:>10.1%}{p50:>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/bench_llm_client.py
+"""
+LLM client resilience against a local fault-injecting stub server: the old
+bare requests.post versus LLMClient (timeouts, retries with jittered
+backoff, token-bucket rate limiting, circuit breaker).
+
+    python -m benchmarks.bench_llm_client --requests 200 --concurrency 8
+
+Scenarios:
+  flaky   30% of requests fail with 503
+  hangs   5% of requests stall for --hang seconds (client read timeout 0.5s)
+  burst   all requests at once against a server allowing 20 req/s (429 above)
+  outage  upstream returns 503 for everything, then recovers
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_llm import StubLLMServer
+from perception.llm_client import LLMClient, LLMError, TokenBucket, CircuitBreaker
+
+PAYLOAD = {"model": "sonar", "messages": [{"role": "user", "content": "hello"}]}
+
+
+def baseline_post(url):
+    """The old perplexity_search transport: no session, no timeout, no retry."""
+    return requests.post(url, json=PAYLOAD).json()
+
+
+def run_threads(fn, n, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            ok = "choices" in fn()
+        except (LLMError, requests.RequestException):
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(n)))
+    return results, time.perf_counter() - start
+
+
+async def run_async(client, n):
+    async def one():
+        start = time.perf_counter()
+        try:
+            ok = "choices" in await client.apost(PAYLOAD)
+        except LLMError:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(n)))
+    await client.aclose()
+    return results, time.perf_counter() - start
+
+
+def report(name, results, wall, server=None):
+    ok = sum(1 for success, _ in results if success)
+    latencies = sorted(latency for _, latency in results)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    attempts = f"{server.request_count:>9}" if server else f"{'':>9}"
+    print(f"  {name:<26}{ok / len(results):>9.1%}{statistics.median(latencies) * 1000:>10.0f}"
+          f"{p99 * 1000:>10.0f}{wall:>9.2f}{attempts}")
+
+
+def header(title):
+    print(f"\n{title}")
+    print(f"  {'':<26}{'success':>9}{'p50 ms':>10}{'p99 ms':>10}{'wall s':>9}{'upstream':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.02, help="stub LLM latency (s)")
+    parser.add_argument("--hang", type=float, default=5.0, help="stall length in the hangs scenario (s)")
+    args = parser.parse_args()
+    n, c = args.requests, args.concurrency
+
+    def client(server, **kwargs):
+        kwargs.setdefault("backoff_base", 0.05)
+        kwargs.setdefault("read_timeout", 0.5)
+        return LLMClient(url=server.url, api_key="test", **kwargs)
+
+    header("flaky: 30% of requests return 503")
+    for name in ("baseline", "LLMClient (sync)", "LLMClient (async)"):
+        with StubLLMServer(delay=args.delay, error_rate=0.3) as server:
+            if name == "baseline":
+                results, wall = run_threads(lambda: baseline_post(server.url), n, c)
+            elif name == "LLMClient (sync)":
+                results, wall = run_threads(lambda cl=client(server): cl.post(PAYLOAD), n, c)
+            else:
+                results, wall = asyncio.run(run_async(client(server, max_concurrency=c), n))
+            report(name, results, wall, server)
+
+    header(f"hangs: 5% of requests stall {args.hang:.0f}s")
+    for name in ("baseline", "LLMClient"):
+        with StubLLMServer(delay=args.delay, hang_rate=0.05, hang_seconds=args.hang) as server:
+            fn = (lambda: baseline_post(server.url)) if name == "baseline" else (
+                lambda cl=client(server): cl.post(PAYLOAD))
+            results, wall = run_threads(fn, n // 2, c)
+            report(name, results, wall, server)
+
+    header("burst: every request at once, upstream allows 20 req/s")
+    for name in ("baseline", "LLMClient + bucket 18/s"):
+        with StubLLMServer(delay=args.delay, rate_limit=20) as server:
+            if name == "baseline":
+                fn = lambda: baseline_post(server.url)
+            else:
+                fn = lambda cl=client(server, rate_limiter=TokenBucket(18, 5)): cl.post(PAYLOAD)
+            results, wall = run_threads(fn, n // 2, 32)
+            report(name, results, wall, server)
+            print(f"    {'':<24}429s seen upstream: {server.status_counts.get(429, 0)}")
+
+    header("outage: upstream returns 503 for everything")
+    for name, breaker in (("LLMClient, no breaker", CircuitBreaker(0, 0)),
+                          ("LLMClient + breaker", CircuitBreaker(5, 0.5))):
+        with StubLLMServer(delay=args.delay) as server:
+            server.down = True
+            cl = client(server, breaker=breaker)
+            results, wall = run_threads(lambda: cl.post(PAYLOAD), n // 4, 1)
+            report(name, results, wall, server)
+            if breaker.failure_threshold:
+                server.down = False
+                time.sleep(0.6)
+                start = time.perf_counter()
+                ok = "choices" in cl.post(PAYLOAD)
+                print(f"    {'':<24}after recovery: success={ok} in {(time.perf_counter() - start) * 1000:.0f} ms, "
+                      f"circuit {breaker.state}")
+
+
+if __name__ == "__main__":
+    main()
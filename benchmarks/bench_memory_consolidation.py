@@ -0,0 +1,154 @@
+# benchmarks/bench_memory_consolidation.py
+"""
+Table size and retrieval latency/quality of long-term memory with and
+without write-time dedup and consolidation, on a synthetic memory stream.
+
+    python -m benchmarks.bench_memory_consolidation --users 200 --per-user 300
+    python -m benchmarks.bench_memory_consolidation --users 20 --per-user 100 --embeddings model
+
+Each user keeps restating a few personal facts (the same fact up to
+--max-repeats times, verbatim or reworded, with occasional updates to a new
+value) between chat summaries. The stream is written through MemoryService
+(simple backend) in write-behind sized batches, then every user's facts are
+queried: a hit is a top-3 result whose first statement of the fact carries
+its current value, not an outdated one.
+
+  no dedup                 every memory inserted (the old behaviour)
+  write-time dedup         MEMORY_DEDUP_THRESHOLD
+  dedup + consolidation    then memory.consolidation over every namespace
+
+Latency is the in-process hybrid search (query embedding excluded); "load"
+is the time to load every namespace into the hot cache from the store.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.bench_hybrid_retrieval import ATTRIBUTES, FILLER, TOPICS, HashEmbedder, ModelEmbedder
+
+REWORDINGS = ["my {attr} is {value}", "My {attr} is {value}!", "remember: my {attr} is {value}",
+              "just so you know, my {attr} is {value}", "my {attr} is {value}, I told you before"]
+
+
+def build_stream(users, per_user, max_repeats, update_rate, seed):
+    """[(namespace, text, created_at)] in arrival order, plus queries [(namespace, query, attribute, value)]."""
+    rng = random.Random(seed)
+    now = time.time()
+    streams, queries = [], []
+    for u in range(users):
+        ns = f"user_{u}"
+        attrs = rng.sample(list(ATTRIBUTES), k=rng.randint(3, 6))
+        values = {attr: rng.choice(ATTRIBUTES[attr]) for attr in attrs}
+        items = []
+        while len(items) < per_user:
+            if rng.random() < 0.5:
+                attr = rng.choice(attrs)
+                if rng.random() < update_rate:
+                    values[attr] = rng.choice(ATTRIBUTES[attr])
+                repeats = rng.randint(1, max_repeats)
+                template = REWORDINGS[0] if rng.random() < 0.6 else rng.choice(REWORDINGS)
+                items.extend([(attr, template.format(attr=attr, value=values[attr]), values[attr])] * repeats)
+            else:
+                topic = rng.choice(TOPICS)
+                items.append((None, f"user {rng.choice(FILLER)} about {topic}, ticket {rng.randint(1, 10_000)}", None))
+        items = items[:per_user]
+        created = now - 300 * 86400
+        current = {}
+        for attr, text, value in items:
+            created += rng.uniform(0.5, 1.5) * 86400 * 300 / per_user
+            streams.append((ns, text, created))
+            if attr is not None:
+                current[attr] = value
+        queries.extend((ns, f"what is my {attr}?", attr, value) for attr, value in current.items())
+    # Interleave users as they would arrive
+    streams.sort(key=lambda item: item[2])
+    return streams, queries
+
+
+def ingest(service, stream, vectors, batch):
+    """Writes the stream namespace by namespace in batches of `batch`; returns seconds."""
+    pending = {}
+    start = time.perf_counter()
+    for (ns, text, created), vector in zip(stream, vectors):
+        texts = pending.setdefault(ns, [])
+        texts.append((text, vector, created))
+        if len(texts) == batch:
+            service.store_many([t for t, _, _ in texts], [v for _, v, _ in texts], ns, [c for _, _, c in texts])
+            pending[ns] = []
+    for ns, texts in pending.items():
+        if texts:
+            service.store_many([t for t, _, _ in texts], [v for _, v, _ in texts], ns, [c for _, _, c in texts])
+    return time.perf_counter() - start
+
+
+def evaluate(service, queries, query_vectors, k):
+    from memory.hybrid_retrieval import search_namespaces
+
+    namespaces = sorted({q[0] for q in queries})
+    for ns in namespaces:
+        service.hot_cache.invalidate(ns)
+    start = time.perf_counter()
+    for ns in namespaces:
+        service.hot_cache.get(ns)
+    load = time.perf_counter() - start
+
+    hits, samples = 0, []
+    for (ns, query, attr, value), qv in zip(queries, query_vectors):
+        start = time.perf_counter()
+        results = search_namespaces(service.hot_cache, [ns], query, qv, k)
+        samples.append(time.perf_counter() - start)
+        # A hit: the best-ranked statement of this fact carries its current value (not an outdated one)
+        statements = [r for r in results if attr in r]
+        hits += bool(statements) and value in statements[0]
+    ms = sorted(s * 1000 for s in samples)
+    return {"recall": hits / len(queries), "p50": statistics.median(ms), "p95": ms[int(0.95 * (len(ms) - 1))],
+            "load": load}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=300)
+    parser.add_argument("--max-repeats", type=int, default=10)
+    parser.add_argument("--update-rate", type=float, default=0.15, help="chance a restatement changes the value")
+    parser.add_argument("--batch", type=int, default=8, help="memories per store_many call")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dedup-threshold", type=float, default=None, help="default: MEMORY_DEDUP_THRESHOLD")
+    parser.add_argument("--consolidate-threshold", type=float, default=None,
+                        help="default: MEMORY_CONSOLIDATE_THRESHOLD")
+    parser.add_argument("--embeddings", choices=["hash", "model"], default="hash")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from memory import llama_index_memory as lim
+    from memory.consolidation import MEMORY_CONSOLIDATE_THRESHOLD, consolidate_memories
+
+    dedup_threshold = args.dedup_threshold if args.dedup_threshold is not None else lim.MEMORY_DEDUP_THRESHOLD
+    consolidate_threshold = (args.consolidate_threshold if args.consolidate_threshold is not None
+                             else MEMORY_CONSOLIDATE_THRESHOLD)
+    embed = HashEmbedder() if args.embeddings == "hash" else ModelEmbedder()
+    stream, queries = build_stream(args.users, args.per_user, args.max_repeats, args.update_rate, args.seed)
+    vectors = embed([text for _, text, _ in stream])
+    query_vectors = embed([q[1] for q in queries])
+    print(f"{len(stream)} memories from {args.users} users, {len(queries)} queries, {args.embeddings} embeddings; "
+          f"dedup >= {dedup_threshold}, consolidate >= {consolidate_threshold}\n")
+    print(f"{'setup':<24}{'rows':>9}{'ingest s':>10}{'job s':>8}{'load s':>8}"
+          f"{f'recall@{args.k}':>10}{'p50 ms':>9}{'p95 ms':>9}")
+
+    for label, threshold, consolidate in (("no dedup", 0.0, False),
+                                          ("write-time dedup", dedup_threshold, False),
+                                          ("dedup + consolidation", dedup_threshold, True)):
+        lim.MEMORY_DEDUP_THRESHOLD = threshold
+        service = lim.MemoryService(backend="simple")
+        ingest_seconds = ingest(service, stream, vectors, args.batch)
+        job_seconds = 0.0
+        if consolidate:
+            job_seconds = consolidate_memories(service, threshold=consolidate_threshold)["seconds"]
+        r = evaluate(service, queries, query_vectors, args.k)
+        print(f"{label:<24}{service.count():>9}{ingest_seconds:>10.1f}{job_seconds:>8.2f}{r['load']:>8.2f}"
+              f"{r['recall']:>10.1%}{r['p50']:>9.2f}{r['p95']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_memory_service.py
+"""
+Per-call latency of store/retrieve: rebuilding the store + index on every call
+(the old get_index() pattern) versus the long-lived MemoryService.
+
+    python -m benchmarks.bench_memory_service --backend simple --stub-embeddings
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_memory_service --backend postgres
+
+With --backend simple the "rebuild" rows only measure construction overhead
+(a fresh in-process store starts empty); use postgres for a like-for-like run.
+--stub-embeddings swaps the MiniLM model for llama-index's MockEmbedding so the
+numbers isolate store/index overhead from model inference.
+"""
+import argparse
+import statistics
+import time
+
+from llama_index.core import Document
+from llama_index.core.vector_stores import SimpleVectorStore
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<28}{statistics.mean(ms):>10.2f}{percentile(ms, 50):>10.2f}{percentile(ms, 99):>10.2f}")
+
+
+def timed_calls(fn, n):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["simple", "postgres"], default="simple")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--stub-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from memory import llama_index_memory as lim
+
+    model = lim.embed_model
+    if args.stub_embeddings:
+        from llama_index.core.embeddings import MockEmbedding
+        model = MockEmbedding(embed_dim=lim.EMBED_DIM)
+
+    def fresh_store():
+        return SimpleVectorStore() if args.backend == "simple" else lim.get_pg_vector_store()
+
+    # Before: a new store + index for every call
+    def old_store(i):
+        lim.get_index(fresh_store(), model).insert(Document(text=f"benchmark fact {i}"))
+
+    def old_retrieve(i):
+        lim.get_index(fresh_store(), model).as_retriever(similarity_top_k=3).retrieve(f"fact {i}")
+
+    # After: one service, one store, one index
+    service = lim.MemoryService(backend=args.backend, model=model)
+    service.get_index()
+
+    print(f"{'per-call latency (ms)':<28}{'mean':>10}{'p50':>10}{'p99':>10}")
+    report("store   (rebuild per call)", timed_calls(old_store, args.calls))
+    report("store   (MemoryService)", timed_calls(lambda i: service.store(f"benchmark fact {i}"), args.calls))
+    report("retrieve(rebuild per call)", timed_calls(old_retrieve, args.calls))
+    report("retrieve(MemoryService)", timed_calls(lambda i: service.retrieve(f"fact {i}", top_k=3), args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_metrics.py
+"""
+Overhead of the timing spans: per span in a tight loop, and per turn through
+the full graph against an instant stub LLM (the worst case: no network time
+to hide the cost in), with METRICS_ENABLED on and off.
+
+    python -m benchmarks.bench_metrics --turns 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+
+def per_call_ns(fn, n):
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--loops", type=int, default=200_000)
+    args = parser.parse_args()
+
+    import utils.metrics as metrics
+
+    def bare():
+        pass
+
+    @metrics.timed("bench", "decorated")
+    def decorated():
+        pass
+
+    def with_span():
+        with metrics.span("bench", "span"):
+            pass
+
+    print(f"{'per call':<28}{'enabled ns':>12}{'disabled ns':>13}")
+    base = per_call_ns(bare, args.loops)
+    for name, fn in (("span()", with_span), ("@timed", decorated)):
+        metrics.METRICS_ENABLED = True
+        on = per_call_ns(fn, args.loops) - base
+        metrics.METRICS_ENABLED = False
+        off = per_call_ns(fn, args.loops) - base
+        print(f"{name:<28}{on:>12.0f}{off:>13.0f}")
+    metrics.METRICS_ENABLED = True
+
+    server = StubLLMServer(delay=0.0).start()
+    os.environ["PERPLEXITY_API_URL"] = server.url
+    os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_core.messages import HumanMessage
+    import graph.main_graph as main_graph
+
+    graph = main_graph.get_graph()
+    graph.invoke({"messages": [HumanMessage(content="warm up")]}, config={"configurable": {"thread_id": "warm"}})
+
+    rows = {}
+    for enabled in (False, True, False, True):  # interleaved to even out drift
+        metrics.METRICS_ENABLED = enabled
+        times = []
+        for i in range(args.turns):
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=f"tell me something {i}")]},
+                         config={"configurable": {"thread_id": f"metrics_{enabled}_{i % 20}"}})
+            times.append(time.perf_counter() - start)
+        rows.setdefault(enabled, []).extend(times)
+    main_graph.wait_for_memory_saves()
+    server.stop()
+
+    off, on = statistics.median(rows[False]) * 1000, statistics.median(rows[True]) * 1000
+    spans = sum(series["count"] for labels, series in metrics.SPAN_SECONDS.snapshot().items() if labels[0] != "bench")
+    start = time.perf_counter()
+    text = metrics.render_prometheus()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\ngraph turn, instant LLM ({args.turns * 2} turns each)")
+    print(f"  metrics off   p50 {off:8.2f} ms")
+    print(f"  metrics on    p50 {on:8.2f} ms   overhead {on - off:+.3f} ms ({(on - off) / off:+.1%})")
+    print(f"  spans recorded: {spans}; /metrics body {len(text)} bytes rendered in {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# benchmarks/bench_multi_worker.py
+"""
+Load test for serve.py with several workers, against the local stub LLM.
+
+    python -m benchmarks.bench_multi_worker --sessions 64 --turns 4 --workers 4
+
+Each session first states a fact ("my name is Zorbix17"), which the
+write-behind worker saves to short-term memory, then asks questions that go
+to the planner. The stub LLM checks whether the planner prompt's "Recent
+facts" block (filled from STM, not from the checkpointed history) contains
+the session's fact, so "STM recall" shows whether the worker that served
+the question could see what another (or the same) worker stored.
+
+Setups:
+  1 worker                       the single-process baseline
+  N workers, per-process STM     SHARED_STATE_BACKEND=memory: the old behaviour
+  N workers, shared store        SHARED_STATE_BACKEND=sqlite, any worker per turn
+  N workers, shared + affinity   SESSION_AFFINITY=1 router in front
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_llm import StubLLMServer
+
+FACTS_BLOCK = re.compile(r"Recent facts from this conversation:\n((?:- .*\n?)+)")
+
+
+def reply(prompt):
+    if "Memory filter" in prompt:
+        return "IGNORE"
+    block = FACTS_BLOCK.search(prompt)
+    names = re.findall(r"Zorbix\d+", block.group(1)) if block else []
+    return f"Hello {names[0]}!" if names else "Hello stranger!"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, affinity, shared, stub_url, workdir):
+    env = dict(os.environ,
+               PORT=str(port), HOST="127.0.0.1", WEB_CONCURRENCY=str(workers),
+               SESSION_AFFINITY="1" if affinity else "0",
+               SHARED_STATE_BACKEND="sqlite" if shared else "memory",
+               SHARED_STATE_PATH=os.path.join(workdir, "shared_state.sqlite"),
+               CHECKPOINT_DB_PATH=os.path.join(workdir, "checkpoints.sqlite"),
+               PERPLEXITY_API_URL=stub_url, PERPLEXITY_API_KEY="offline",
+               FAST_ROUTER_ENABLED="0", LOG_LEVEL="WARNING")
+    env.setdefault("MEMORY_BACKEND", "simple")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen([sys.executable, "serve.py"], cwd=root, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(base, workers, timeout=180):
+    """Until /ready (models loaded) has answered 200 from every worker."""
+    deadline = time.monotonic() + timeout
+    ready = set()
+    while time.monotonic() < deadline:
+        # A new connection per probe, so the kernel can hand it to any worker
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.get(f"{base}/ready")
+                if response.status_code == 200:
+                    if "workers" in response.json():  # the affinity router asked every worker
+                        return
+                    ready.add(response.headers.get("x-worker-pid"))
+                    if len(ready) >= workers:
+                        return
+                    continue
+            except httpx.HTTPError:
+                pass
+        await asyncio.sleep(0.3)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(base, sessions, turns, save_wait):
+    latencies, recalled, asked, failures = [], 0, 0, 0
+    workers_per_session = []
+
+    async with httpx.AsyncClient(base_url=base, timeout=120,
+                                 limits=httpx.Limits(max_connections=sessions)) as client:
+        # Warm-up: first-request costs (graph compile, checkpointer setup) stay out of the numbers
+        await asyncio.gather(*(client.post("/chat", json={"session_id": f"warm_{i}", "query": "hello"})
+                               for i in range(16)))
+
+        async def session(i):
+            nonlocal recalled, asked, failures
+            sid = f"load_{i}"
+            pids = set()
+            for t in range(turns):
+                query = f"my name is Zorbix{i}" if t == 0 else f"please greet me warmly, round {t}"
+                start = time.perf_counter()
+                # A new connection per turn, as behind a load balancer: a kept-alive
+                # connection would pin the session to one worker by accident
+                response = await client.post("/chat", json={"session_id": sid, "query": query},
+                                             headers={"Connection": "close"})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+                    continue
+                pids.add(response.headers.get("x-worker-pid"))
+                if t == 0:
+                    await asyncio.sleep(save_wait)  # let the write-behind queue store the fact
+                else:
+                    asked += 1
+                    recalled += f"Zorbix{i}!" in response.json()["response"]
+            workers_per_session.append(len(pids))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        wall = time.perf_counter() - start
+
+    return {
+        "wall": wall,
+        "turns_per_s": len(latencies) / wall,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+        "recall": recalled / asked if asked else 0.0,
+        "spread": sum(1 for n in workers_per_session if n > 1) / len(workers_per_session),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub LLM latency (s)")
+    parser.add_argument("--save-wait", type=float, default=0.3, help="pause after the fact turn (s)")
+    args = parser.parse_args()
+
+    setups = [("1 worker", 1, False, False),
+              (f"{args.workers} workers, per-process STM", args.workers, False, False),
+              (f"{args.workers} workers, shared store", args.workers, False, True),
+              (f"{args.workers} workers, shared + affinity", args.workers, True, True)]
+
+    server = StubLLMServer(delay=args.delay, reply=reply).start()
+    print(f"{args.sessions} sessions x {args.turns} turns, LLM delay {args.delay}s")
+    print(f"{'setup':<36}{'turns/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'STM recall':>12}{'multi-worker':>14}{'errors':>8}")
+    for label, workers, affinity, shared in setups:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as workdir:
+            process = start_server(port, workers, affinity, shared, server.url, workdir)
+            try:
+                base = f"http://127.0.0.1:{port}"
+                asyncio.run(wait_ready(base, workers))
+                r = asyncio.run(run_load(base, args.sessions, args.turns, args.save_wait))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        print(f"{label:<36}{r['turns_per_s']:>9.1f}{r['p50']:>9.0f}{r['p95']:>9.0f}"
+              f"{r['recall']:>12.0%}{r['spread']:>14.0%}{r['failures']:>8}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
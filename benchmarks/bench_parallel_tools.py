@@ -0,0 +1,99 @@
+# benchmarks/bench_parallel_tools.py
+"""
+Multi-tool request through the full graph, one tool call per planner round
+trip versus one round trip with a list of calls run in parallel.
+
+    python -m benchmarks.bench_parallel_tools --delay 0.2 --tool-delays 0.3 0.2 0.1
+
+The stub LLM plays the planner: in "sequential" mode it asks for one stub
+tool per round trip (the old single-call behaviour), in "parallel" mode it
+asks for all of them in one JSON list. Stub tools sleep for fixed delays.
+Both the sync (invoke) and async (ainvoke) graph paths are measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+
+def make_stub_tool(name, delay):
+    def stub_tool(query: str = ""):
+        time.sleep(delay)
+        return f"{name} result for {query}"
+    return stub_tool
+
+
+def make_reply(tool_names, parallel):
+    def reply(prompt):
+        done = prompt.count("Tool Result:")
+        if done >= len(tool_names):
+            return "Here is everything you asked for."
+        if parallel:
+            return json.dumps([{"tool_name": n, "parameters": {"query": "x"}} for n in tool_names])
+        return json.dumps({"tool_name": tool_names[done], "parameters": {"query": "x"}})
+    return reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--tool-delays", type=float, nargs="+", default=[0.3, 0.2, 0.1])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    tool_names = [f"stub_tool_{i}" for i in range(len(args.tool_delays))]
+    server = StubLLMServer(delay=args.delay).start()
+    os.environ["PERPLEXITY_API_URL"] = server.url
+    os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+
+    from langchain_core.messages import HumanMessage
+    from tools.tool_registry import AVAILABLE_TOOLS
+    from perception.perplexity_api import close_async_client
+    from graph.main_graph import get_graph, get_async_graph, close_async_graph, wait_for_memory_saves
+
+    for name, delay in zip(tool_names, args.tool_delays):
+        AVAILABLE_TOOLS[name] = make_stub_tool(name, delay)
+
+    graph = get_graph()
+    results = []
+
+    async def run_async(mode_runs):
+        agraph = await get_async_graph()
+        for label, run_id in mode_runs:
+            await agraph.ainvoke({"messages": [HumanMessage(content="do everything")]},
+                                 config={"configurable": {"thread_id": f"{label}_{run_id}"}})
+        # Each asyncio.run is a new loop; release loop-bound clients
+        await close_async_graph()
+        await close_async_client()
+
+    for parallel in (False, True):
+        mode = "parallel" if parallel else "sequential"
+        server.reply = make_reply(tool_names, parallel)
+        for path in ("sync", "async"):
+            calls_before = server.request_count
+            start = time.perf_counter()
+            if path == "sync":
+                for run in range(args.runs):
+                    graph.invoke({"messages": [HumanMessage(content="do everything")]},
+                                 config={"configurable": {"thread_id": f"{mode}_sync_{run}"}})
+            else:
+                asyncio.run(run_async([(f"{mode}_async", run) for run in range(args.runs)]))
+            elapsed = (time.perf_counter() - start) / args.runs
+            llm_calls = (server.request_count - calls_before) / args.runs
+            results.append((mode, path, elapsed, llm_calls))
+
+    wait_for_memory_saves()
+    server.stop()
+
+    print(f"\ntools: {len(tool_names)} with delays {args.tool_delays}, LLM delay {args.delay}s")
+    print(f"{'mode':<12}{'path':<8}{'s/request':>12}{'LLM calls':>12}")
+    for mode, path, elapsed, llm_calls in results:
+        print(f"{mode:<12}{path:<8}{elapsed:>12.3f}{llm_calls:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+# benchmarks/bench_replay.py
+"""
+Offline replay of a conversation corpus through the compiled agent graph.
+
+    python -m benchmarks.bench_replay --sessions 64 --concurrency 16 --rounds 3
+    python -m benchmarks.bench_replay --corpus my_corpus.json --path sync --json out.json
+
+Nothing leaves the machine: the LLM is the local stub server playing a
+scripted planner, tools with network or desktop side effects are replaced by
+stub tools, the embedding model is replaced by hashed bag-of-words vectors
+(--embeddings model loads the real MiniLM model instead), long-term memory
+uses the in-process "simple" backend and checkpoints go to a temporary
+SQLite file.
+
+A corpus is a JSON list of conversations; each turn names the tool rounds
+the planner should ask for before answering (a round with several tools is
+one parallel call):
+
+    [{"kind": "tool", "turns": [
+        {"user": "what's new with the mars rover", "tools": [["search_web"]], "answer": "..."}]}]
+
+Without --corpus a built-in mix is generated: single-shot questions,
+tool-using turns (one and two rounds, parallel calls), fast-path requests
+the router answers without the planner, and long sessions that state facts
+and ask about them later. Each session gets its own thread_id and sessions
+run concurrently.
+
+Reported: end-to-end and per-node latency percentiles (from the timing
+spans), LLM calls per turn by purpose, and memory growth per round (process
+RSS, short-term-memory facts, history windows, checkpoint file size).
+--max-p95-ms / --max-llm-calls-per-turn / --max-rss-growth-mb turn the run
+into a regression check that exits non-zero when a limit is exceeded.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_hybrid_retrieval import HashEmbedder
+from benchmarks.stub_llm import StubLLMServer
+
+# Tools that would reach the network or the desktop are replaced by stubs
+STUBBED_TOOLS = ("search_web", "play_song_on_youtube", "open_path", "find_file", "list_files")
+
+TOPICS = ["the mars rover", "quantum computing", "the euro exchange rate", "electric cars",
+          "the champions league", "solar panels", "the james webb telescope", "coffee prices",
+          "rust programming", "the olympics", "volcanoes in iceland", "sourdough bread"]
+FACTS = [("my name is {name}", "what is my name"),
+         ("I live in {city}", "where do I live"),
+         ("my favourite colour is {colour}", "what is my favourite colour"),
+         ("I work as a {job}", "what do I do for work")]
+NAMES = ["Alex", "Priya", "Sam", "Lena", "Omar", "Mei"]
+CITIES = ["Chennai", "Lisbon", "Denver", "Osaka", "Nairobi", "Oslo"]
+COLOURS = ["blue", "green", "amber", "violet"]
+JOBS = ["data engineer", "nurse", "teacher", "pilot"]
+
+
+# ============================================================
+# ========================= CORPUS ===========================
+# ============================================================
+
+def _turn(user, tools=(), answer=None):
+    return {"user": user, "tools": [list(r) for r in tools], "answer": answer or f"Stub answer about: {user}"}
+
+
+def build_corpus(sessions: int, long_turns: int, seed: int = 0):
+    """The built-in mix: 30% single, 30% tool, 15% fast path, 25% long sessions."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(sessions):
+        topic = TOPICS[i % len(TOPICS)]
+        roll = rng.random()
+        if roll < 0.30:
+            corpus.append({"kind": "single", "turns": [_turn(f"explain {topic} in one sentence (#{i})")]})
+        elif roll < 0.60:
+            tools = rng.choice([[["search_web"]],
+                                [["search_web", "get_system_stats"]],
+                                [["search_web"], ["search_web"]]])
+            corpus.append({"kind": "tool", "turns": [_turn(f"look up the latest on {topic} (#{i})", tools)]})
+        elif roll < 0.75:
+            corpus.append({"kind": "fast", "turns": [_turn(rng.choice(["how much ram is free", "show system stats",
+                                                                      "check disk space"]))]})
+        else:
+            values = {"name": rng.choice(NAMES), "city": rng.choice(CITIES),
+                      "colour": rng.choice(COLOURS), "job": rng.choice(JOBS)}
+            turns = []
+            for t in range(long_turns):
+                statement, question = FACTS[(t // 3) % len(FACTS)]
+                step = t % 3
+                if step == 0:
+                    turns.append(_turn(statement.format(**values), answer="Noted."))
+                elif step == 1:
+                    turns.append(_turn(f"tell me about {TOPICS[(i + t) % len(TOPICS)]} (#{i}.{t})",
+                                       [["search_web"]] if t % 2 else ()))
+                else:
+                    turns.append(_turn(question + "?", answer=f"You told me {statement.format(**values)}."))
+            corpus.append({"kind": "long", "turns": turns})
+    return corpus
+
+
+def load_corpus(path: str):
+    with open(path) as f:
+        corpus = json.load(f)
+    for conversation in corpus:
+        conversation.setdefault("kind", "custom")
+        conversation["turns"] = [_turn(t["user"], t.get("tools", ()), t.get("answer")) for t in conversation["turns"]]
+    return corpus
+
+
+# ============================================================
+# ===================== SCRIPTED PLANNER =====================
+# ============================================================
+
+class ScriptedLLM:
+    """
+    Reply function for the stub server. The planner prompt ends with the
+    windowed history; the last "User:" line is the current turn, and the
+    tool calls already made since then tell which scripted round is next.
+    """
+
+    def __init__(self, corpus):
+        self.scripts = {}
+        for conversation in corpus:
+            for turn in conversation["turns"]:
+                self.scripts[turn["user"]] = turn
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+    def __call__(self, prompt: str) -> str:
+        if "Memory filter" in prompt:
+            self._count("memory_filter")
+            return "IGNORE"
+        if "Your previous reply could not be used" in prompt:
+            self._count("repair")
+        else:
+            self._count("planner")
+        lines = prompt.splitlines()
+        last_user = max((i for i, line in enumerate(lines) if line.startswith("User: ")), default=None)
+        if last_user is None:
+            return "Stub answer."
+        turn = self.scripts.get(lines[last_user][len("User: "):].strip())
+        if turn is None:
+            return "Stub answer."
+        done = sum(1 for line in lines[last_user:] if line.startswith("JARVIS: (Calling tool"))
+        if done >= len(turn["tools"]):
+            return turn["answer"]
+        calls = [{"tool_name": name, "parameters": _stub_args(name, turn["user"])} for name in turn["tools"][done]]
+        return json.dumps(calls[0] if len(calls) == 1 else calls)
+
+
+def _stub_args(name, query):
+    from tools.tool_registry import tool_catalog
+    required = [p["name"] for p in tool_catalog.schemas.get(name, {}).get("params", []) if p["required"]]
+    return {required[0]: query} if required else {}
+
+
+def make_stub_tool(name, original, delay):
+    """Same signature and docstring as the real tool, so the catalog and validation see no difference."""
+    @functools.wraps(original)
+    def stub_tool(*args, **kwargs):
+        time.sleep(delay)
+        return f"Stub {name} result for {args or kwargs}"
+    return stub_tool
+
+
+def make_async_stub_tool(name, original, delay):
+    @functools.wraps(original)
+    async def stub_tool(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return f"Stub {name} result for {args or kwargs}"
+    return stub_tool
+
+
+class HashEmbeddingModel:
+    """Stands in for the MiniLM model: same dimension, deterministic, nothing to download."""
+
+    def __init__(self):
+        self._embed = HashEmbedder()
+
+    def get_text_embedding_batch(self, texts):
+        return self._embed(texts).tolist()
+
+    def get_query_embedding(self, query):
+        return self._embed([query])[0].tolist()
+
+
+# ============================================================
+# ===================== MEASUREMENTS =========================
+# ============================================================
+
+def install_span_recorder():
+    """Keeps every raw span duration (the histogram only has buckets) for exact percentiles."""
+    import utils.metrics as metrics
+
+    class RecordingHistogram(metrics.Histogram):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.samples = {}
+
+        def observe(self, value, labels=()):
+            super().observe(value, labels)
+            self.samples.setdefault(labels, []).append(value)
+
+    recorder = RecordingHistogram(metrics.SPAN_SECONDS.name, metrics.SPAN_SECONDS.description,
+                                  metrics.SPAN_SECONDS.labelnames)
+    metrics.SPAN_SECONDS = recorder
+    return recorder
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, on platforms without /proc
+
+
+def memory_snapshot(db_path):
+    from memory.short_term_memory import short_term_memory
+    from reasoning.history_manager import _windows
+    size = sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+    return {"rss_mb": rss_mb(), "stm_sessions": len(short_term_memory),
+            "stm_facts": sum(len(stm) for stm in list(short_term_memory.values())),
+            "history_windows": len(_windows), "checkpoint_mb": size / 2**20}
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {"n": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1] * 1000}
+
+
+# ============================================================
+# ========================= REPLAY ===========================
+# ============================================================
+
+async def replay_async(corpus, round_id, concurrency, turn_times):
+    from langchain_core.messages import HumanMessage
+    from graph.main_graph import get_async_graph
+
+    graph = await get_async_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(i, conversation):
+        async with semaphore:
+            config = {"configurable": {"thread_id": f"replay_{round_id}_{i}"}}
+            for turn in conversation["turns"]:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=turn["user"])]}, config=config)
+                turn_times.append((conversation["kind"], time.perf_counter() - start))
+
+    await asyncio.gather(*(session(i, c) for i, c in enumerate(corpus)))
+
+
+def replay_sync(corpus, round_id, concurrency, turn_times):
+    from langchain_core.messages import HumanMessage
+    from graph.main_graph import get_graph
+
+    graph = get_graph()
+
+    def session(item):
+        i, conversation = item
+        config = {"configurable": {"thread_id": f"replay_{round_id}_{i}"}}
+        for turn in conversation["turns"]:
+            start = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=turn["user"])]}, config=config)
+            turn_times.append((conversation["kind"], time.perf_counter() - start))
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(session, enumerate(corpus)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSON corpus file (default: generated mix)")
+    parser.add_argument("--sessions", type=int, default=64, help="sessions in the generated corpus")
+    parser.add_argument("--long-turns", type=int, default=12, help="turns per long session")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3, help="replays of the corpus, on fresh thread_ids")
+    parser.add_argument("--path", choices=("async", "sync"), default="async")
+    parser.add_argument("--delay", type=float, default=0.05, help="stub LLM latency (s)")
+    parser.add_argument("--tool-delay", type=float, default=0.02, help="stub tool latency (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embeddings", choices=["hash", "model"], default="hash")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--max-llm-calls-per-turn", type=float)
+    parser.add_argument("--max-rss-growth-mb", type=float, help="RSS growth allowed between the first and last round")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.sessions, args.long_turns, args.seed)
+    scripted = ScriptedLLM(corpus)
+    server = StubLLMServer(delay=args.delay, reply=scripted).start()
+    db_path = os.path.join(tempfile.mkdtemp(), "replay.sqlite")
+    os.environ["PERPLEXITY_API_URL"] = server.url
+    os.environ.setdefault("PERPLEXITY_API_KEY", "offline")
+    os.environ.setdefault("MEMORY_BACKEND", "simple")
+    os.environ.setdefault("CHECKPOINT_BACKEND", "sqlite")
+    os.environ["CHECKPOINT_DB_PATH"] = db_path
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    if args.embeddings == "hash":
+        import memory.local_embedding as local_embedding
+        # Every embedding (router, STM, memory filter, long-term memory) goes through this model
+        local_embedding._embed_model_instance = HashEmbeddingModel()
+
+    from langchain_core.messages import HumanMessage
+    from tools.tool_registry import AVAILABLE_TOOLS, ASYNC_TOOLS, register_tool
+    from perception.perplexity_api import close_async_client
+    from graph.main_graph import get_graph, get_async_graph, close_async_graph, wait_for_memory_saves
+
+    for name in STUBBED_TOOLS:
+        if name in ASYNC_TOOLS:
+            ASYNC_TOOLS[name] = make_async_stub_tool(name, ASYNC_TOOLS[name], args.tool_delay)
+        register_tool(name, make_stub_tool(name, AVAILABLE_TOOLS[name], args.tool_delay))
+    recorder = install_span_recorder()
+
+    async def run_round(round_id, turn_times):
+        # One event loop per round: release the loop-bound clients at the end
+        try:
+            await replay_async(corpus, round_id, args.concurrency, turn_times)
+        finally:
+            await close_async_graph()
+            await close_async_client()
+
+    async def warm_up():
+        try:
+            graph = await get_async_graph()
+            await graph.ainvoke({"messages": [HumanMessage(content="warm up")]},
+                                config={"configurable": {"thread_id": "replay_warmup"}})
+        finally:
+            await close_async_graph()
+            await close_async_client()
+
+    # Model loading, checkpointer setup and first-call costs stay out of the numbers;
+    # the vector store's first use imports llama-index, which takes seconds
+    from memory.llama_index_memory import memory_service
+    memory_service.get_index()
+    if args.path == "async":
+        asyncio.run(warm_up())
+    else:
+        get_graph().invoke({"messages": [HumanMessage(content="warm up")]},
+                           config={"configurable": {"thread_id": "replay_warmup"}})
+    wait_for_memory_saves()
+    recorder.samples.clear()
+    scripted.calls.clear()
+    server.request_count = 0
+
+    turns_per_round = sum(len(c["turns"]) for c in corpus)
+    print(f"corpus: {len(corpus)} sessions, {turns_per_round} turns "
+          f"({', '.join(f'{k} {sum(1 for c in corpus if c['kind'] == k)}' for k in sorted({c['kind'] for c in corpus}))}); "
+          f"path {args.path}, concurrency {args.concurrency}, LLM delay {args.delay}s")
+
+    snapshots = [memory_snapshot(db_path)]
+    turn_times = []
+    start = time.perf_counter()
+    for round_id in range(args.rounds):
+        if args.path == "async":
+            asyncio.run(run_round(round_id, turn_times))
+        else:
+            replay_sync(corpus, round_id, args.concurrency, turn_times)
+        wait_for_memory_saves()
+        snapshots.append(memory_snapshot(db_path))
+    wall = time.perf_counter() - start
+    server.stop()
+
+    turns = len(turn_times)
+    results = {
+        "turns": turns,
+        "wall_s": wall,
+        "turns_per_s": turns / wall,
+        "e2e_ms": percentiles([t for _, t in turn_times]),
+        "e2e_ms_by_kind": {kind: percentiles([t for k, t in turn_times if k == kind])
+                           for kind in sorted({k for k, _ in turn_times})},
+        "spans_ms": {f"{kind}/{name}": percentiles(values)
+                     for (kind, name), values in sorted(recorder.samples.items())},
+        "llm_calls_per_turn": server.request_count / turns,
+        "llm_calls_by_purpose": {k: v / turns for k, v in sorted(scripted.calls.items())},
+        "memory": snapshots,
+    }
+
+    print(f"\n{turns} turns in {wall:.1f}s ({results['turns_per_s']:.1f} turns/s)")
+    print(f"\n{'latency (ms)':<28}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = [("e2e", results["e2e_ms"])] + [(f"e2e {k}", v) for k, v in results["e2e_ms_by_kind"].items()]
+    rows += list(results["spans_ms"].items())
+    for label, p in rows:
+        print(f"{label:<28}{p['n']:>7}{p['p50']:>9.1f}{p['p95']:>9.1f}{p['p99']:>9.1f}{p['max']:>9.1f}")
+
+    purposes = ", ".join(f"{k} {v:.2f}" for k, v in results["llm_calls_by_purpose"].items())
+    print(f"\nLLM calls per turn: {results['llm_calls_per_turn']:.2f} ({purposes})")
+
+    print(f"\n{'memory after':<16}{'RSS MB':>9}{'STM sessions':>14}{'STM facts':>11}{'windows':>9}{'ckpt MB':>9}")
+    for i, s in enumerate(snapshots):
+        label = "start" if i == 0 else f"round {i}"
+        print(f"{label:<16}{s['rss_mb']:>9.1f}{s['stm_sessions']:>14}{s['stm_facts']:>11}"
+              f"{s['history_windows']:>9}{s['checkpoint_mb']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.max_p95_ms is not None and results["e2e_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"e2e p95 {results['e2e_ms']['p95']:.1f} ms > {args.max_p95_ms} ms")
+    if args.max_llm_calls_per_turn is not None and results["llm_calls_per_turn"] > args.max_llm_calls_per_turn:
+        failures.append(f"LLM calls per turn {results['llm_calls_per_turn']:.2f} > {args.max_llm_calls_per_turn}")
+    growth = snapshots[-1]["rss_mb"] - snapshots[1]["rss_mb"] if len(snapshots) > 2 else 0.0
+    if args.max_rss_growth_mb is not None and growth > args.max_rss_growth_mb:
+        failures.append(f"RSS grew {growth:.1f} MB after the first round > {args.max_rss_growth_mb} MB")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
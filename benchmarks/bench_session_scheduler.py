@@ -0,0 +1,182 @@
+# benchmarks/bench_session_scheduler.py
+"""
+Per-session turn ordering and single-flight coalescing, against the local
+stub LLM.
+
+    python -m benchmarks.bench_session_scheduler --turns 6 --sessions 32
+
+Ordering: `turns` messages of one session are posted a few ms apart without
+waiting for the answers (a client retrying, a double-submitted form). The
+stub's reply lists the numbered turns it saw in the planner prompt's
+history, so each answer shows whether its turn saw every earlier turn, and a
+final turn shows how many turns the session's checkpoint kept. Run with the
+scheduler bypassed (the old behaviour) and with it.
+
+Coalescing: `sessions` sessions ask the same question at the same moment;
+the stub answers with a search_web call, then a final answer. Upstream LLM
+requests per round are counted with SINGLE_FLIGHT_ENABLED off and on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+
+os.environ.setdefault("MEMORY_BACKEND", "simple")
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["FAST_ROUTER_ENABLED"] = "0"
+
+import httpx
+
+from benchmarks.stub_llm import StubLLMServer
+
+TURN = re.compile(r"^User: turn (\d+)\b", re.M)
+
+
+def reply(prompt):
+    if "Memory filter" in prompt:
+        return "IGNORE"
+    if "User: " not in prompt:  # search_web's own completion
+        return "Sunny, 21 degrees."
+    if "User: turn" in prompt:
+        return "seen " + ",".join(TURN.findall(prompt))
+    if "JARVIS: (Calling tool" in prompt:
+        return "It is sunny."
+    last_user = prompt.rsplit("User: ", 1)[1].splitlines()[0].strip()
+    return json.dumps({"tool_name": "search_web", "parameters": {"query": last_user}})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(port):
+    import uvicorn
+    from api import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+class _Unordered:
+    """The scheduler bypassed: every turn starts as soon as it arrives."""
+
+    @asynccontextmanager
+    async def turn(self, session_id):
+        yield
+
+    def waiting(self, session_id):
+        return 0
+
+    def is_full(self, session_id):
+        return False
+
+
+async def ordering_round(client, sid, turns, gap):
+    async def post(i):
+        await asyncio.sleep(i * gap)
+        response = await client.post("/chat", json={"session_id": sid, "query": f"turn {i}"})
+        if response.status_code != 200:
+            return i, None
+        seen = response.json()["response"].removeprefix("seen ")
+        return i, [int(n) for n in seen.split(",") if n]
+
+    results = await asyncio.gather(*(post(i) for i in range(turns)))
+    # A later turn of the same session: which turns did the checkpoint keep?
+    final = await client.post("/chat", json={"session_id": sid, "query": f"turn {turns}"})
+    kept = final.json()["response"].removeprefix("seen ").split(",")[:-1]
+    in_order = sum(1 for i, seen in results if seen == list(range(i + 1)))
+    errors = sum(1 for _, seen in results if seen is None)
+    return {"in_order": in_order, "errors": errors, "kept": len([k for k in kept if k])}
+
+
+async def coalescing_round(client, sessions, label):
+    query = f"what is the weather in paris {label}"
+    answers = await asyncio.gather(*(client.post("/chat", json={"session_id": f"co_{label}_{i}", "query": query})
+                                     for i in range(sessions)))
+    return sum(1 for a in answers if a.status_code == 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=6, help="concurrent turns per session (ordering)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--gap", type=float, default=0.005, help="seconds between a session's turns")
+    parser.add_argument("--sessions", type=int, default=32, help="sessions asking the same question")
+    parser.add_argument("--delay", type=float, default=0.1, help="stub LLM latency (s)")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(delay=args.delay, reply=reply).start()
+    os.environ["PERPLEXITY_API_URL"] = stub.url
+    os.environ["PERPLEXITY_API_KEY"] = "offline"
+
+    import api
+    import utils.single_flight as single_flight
+    from perception.perplexity_api import llm_flight
+    from tools.tool_registry import tool_flights
+    from utils.metrics import render_prometheus
+
+    port = free_port()
+    server, thread = start_api(port)
+    base = f"http://127.0.0.1:{port}"
+
+    async def run():
+        async with httpx.AsyncClient(base_url=base, timeout=120,
+                                     limits=httpx.Limits(max_connections=max(args.sessions, args.turns) + 4)) as client:
+            await client.post("/chat", json={"session_id": "warm", "query": "hello"})
+
+            print(f"Ordering: {args.rounds} sessions x {args.turns} turns posted {args.gap * 1000:.0f} ms apart, "
+                  f"LLM delay {args.delay}s")
+            print(f"{'scheduler':<12}{'in order':>10}{'kept':>8}{'errors':>8}{'wall s':>8}")
+            scheduler = api.session_scheduler
+            for label, replacement in (("off", _Unordered()), ("on", scheduler)):
+                api.session_scheduler = replacement
+                totals = {"in_order": 0, "errors": 0, "kept": 0}
+                start = time.perf_counter()
+                for r in range(args.rounds):
+                    result = await ordering_round(client, f"order_{label}_{r}", args.turns, args.gap)
+                    for key in totals:
+                        totals[key] += result[key]
+                wall = time.perf_counter() - start
+                n = args.rounds * args.turns
+                print(f"{label:<12}{totals['in_order'] / n:>10.0%}{totals['kept'] / n:>8.0%}"
+                      f"{totals['errors']:>8}{wall:>8.2f}")
+            api.session_scheduler = scheduler
+            print(f"scheduler stats: {scheduler.stats()}")
+
+            print(f"\nCoalescing: {args.sessions} sessions ask the same question at once")
+            print(f"{'single-flight':<14}{'LLM requests':>14}{'ok':>6}{'wall s':>8}")
+            for label, enabled in (("off", False), ("on", True)):
+                single_flight.SINGLE_FLIGHT_ENABLED = enabled
+                before = stub.request_count
+                start = time.perf_counter()
+                ok = await coalescing_round(client, args.sessions, label)
+                wall = time.perf_counter() - start
+                print(f"{label:<14}{stub.request_count - before:>14}{ok:>6}{wall:>8.2f}")
+            print(f"llm flight: {llm_flight.stats()}, "
+                  + ", ".join(f"{name}: {f.stats()}" for name, f in tool_flights.items()))
+
+    asyncio.run(run())
+    print()
+    for line in render_prometheus().splitlines():
+        if line.startswith(("jarvis_coalesced_calls_total", "jarvis_session_queue_depth", "jarvis_sessions_active")):
+            print(line)
+    server.should_exit = True
+    thread.join(timeout=10)
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
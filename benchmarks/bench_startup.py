@@ -0,0 +1,53 @@
+# benchmarks/bench_startup.py
+"""
+Import-time budget check for the entry points.
+
+    python -m benchmarks.bench_startup            # exits 1 if over budget
+    python -m benchmarks.bench_startup --budget 1.5 --runs 5
+
+Each module is imported in a fresh interpreter (best of --runs). Heavy
+components (embedding model, llama-index/pgvector, checkpointer) must stay
+off the import path, so these numbers should be well under the budget.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+MODULES = ["api", "graph.main_graph", "tools.tool_registry", "memory.local_embedding"]
+
+
+def import_time(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=3.0, help="seconds allowed per module import")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'module':<28}{'import (s)':>12}{'budget':>10}")
+    for module in args.modules:
+        best = min(import_time(module) for _ in range(args.runs))
+        flag = "" if best <= args.budget else "  OVER"
+        print(f"{module:<28}{best:>12.3f}{args.budget:>10.1f}{flag}")
+        if flag:
+            over_budget.append(module)
+
+    # The heavy model must not be loaded as a side effect of importing the app
+    check = "import api, sys; print('torch' in sys.modules or 'sentence_transformers' in sys.modules)"
+    loaded = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True)
+    if loaded.stdout.strip().splitlines()[-1] == "True":
+        print("embedding model stack was imported eagerly by `import api`")
+        over_budget.append("api (eager model import)")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
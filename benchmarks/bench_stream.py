@@ -0,0 +1,97 @@
+# benchmarks/bench_stream.py
+"""
+Time-to-first-byte and time-to-first-token of /chat/stream versus the
+blocking /chat, against a local streaming stub LLM.
+
+    python -m benchmarks.bench_stream --delay 0.3 --token-delay 0.03 --words 60
+
+The API runs under uvicorn on a local port (an in-process ASGI transport
+would buffer the whole response). The stub waits `delay` before the first
+token and `token-delay` between words.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(port):
+    import uvicorn
+    from api import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def measure(base_url, runs):
+    import httpx
+
+    rows = {"chat_total": [], "stream_ttfb": [], "stream_first_token": [], "stream_total": []}
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        for i in range(runs):
+            start = time.perf_counter()
+            await client.post("/chat", json={"session_id": f"chat_{i}", "query": "tell me a story"})
+            rows["chat_total"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            first_byte = first_token = None
+            async with client.stream("POST", "/chat/stream",
+                                     json={"session_id": f"stream_{i}", "query": "tell me a story"}) as response:
+                async for line in response.aiter_lines():
+                    now = time.perf_counter() - start
+                    if first_byte is None:
+                        first_byte = now
+                    if first_token is None and line == "event: token":
+                        first_token = now
+            rows["stream_ttfb"].append(first_byte)
+            rows["stream_first_token"].append(first_token)
+            rows["stream_total"].append(time.perf_counter() - start)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.3, help="stub time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    parser.add_argument("--words", type=int, default=60, help="length of the stub answer")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    answer = " ".join(f"word{i}" for i in range(args.words))
+    stub = StubLLMServer(delay=args.delay, token_delay=args.token_delay, reply=lambda prompt: answer).start()
+    os.environ["PERPLEXITY_API_URL"] = stub.url
+    os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+    os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+
+    port = free_port()
+    server, thread = start_api(port)
+    base_url = f"http://127.0.0.1:{port}"
+    asyncio.run(measure(base_url, 1))  # warm-up: imports, checkpointer
+    rows = asyncio.run(measure(base_url, args.runs))
+    server.should_exit = True
+    thread.join(timeout=10)
+    stub.stop()
+
+    print(f"\nstub: {args.delay}s to first token, {args.words} words x {args.token_delay}s")
+    for key, values in rows.items():
+        print(f"{key:<20} p50 {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_tool_cache.py
+"""
+Replays a search_web query stream through the tool-result cache against a
+local stub LLM and reports hit rate and latency saved.
+
+    python -m benchmarks.bench_tool_cache --delay 0.2
+    TOOL_CACHE_SEMANTIC=1 python -m benchmarks.bench_tool_cache   # paraphrase reuse
+
+The stream mixes exact repeats, case/punctuation variants and paraphrases of
+a small set of questions, as if several sessions asked the same things.
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.stub_llm import StubLLMServer
+
+QUESTIONS = [
+    ("who won the 2022 world cup", "who was the winner of the 2022 world cup"),
+    ("what is the capital of australia", "which city is australia's capital"),
+    ("how tall is mount everest", "what is the height of mount everest"),
+    ("when was python first released", "what year did python come out"),
+    ("what is the speed of light", "how fast does light travel"),
+]
+
+
+def make_stream(n, seed=0):
+    rng = random.Random(seed)
+    stream = []
+    for _ in range(n):
+        original, paraphrase = rng.choice(QUESTIONS)
+        form = rng.random()
+        if form < 0.5:
+            stream.append(original)
+        elif form < 0.8:
+            stream.append(original.upper() + "?")
+        else:
+            stream.append(paraphrase)
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    with StubLLMServer(delay=args.delay) as server:
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        from tools.tool_registry import run_tool, AVAILABLE_TOOLS, tool_cache
+
+        stream = make_stream(args.queries)
+
+        start = time.perf_counter()
+        for q in stream:
+            AVAILABLE_TOOLS["search_web"](query=q)
+        uncached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for q in stream:
+            run_tool("search_web", {"query": q})
+        cached = time.perf_counter() - start
+
+        stats = tool_cache.stats()["tools"]["search_web"]
+        print(f"queries:            {args.queries}")
+        print(f"uncached total:     {uncached:.2f}s")
+        print(f"cached total:       {cached:.2f}s")
+        print(f"hit rate:           {stats['hit_rate']:.1%} "
+              f"(exact {stats['hits']}, semantic {stats['semantic_hits']}, misses {stats['misses']})")
+        print(f"latency saved:      {stats['saved_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/bench_tool_call_parser.py
+"""
+Parse accuracy of the planner-output parser on a fuzzed corpus of LLM
+replies, against the old greedy-regex extraction, plus parse time and how
+early the streaming scanner decides.
+
+    python -m benchmarks.bench_tool_call_parser --cases 5000 --seed 0
+
+Each generated reply is labelled: a tool call (with the expected calls), an
+answer (prose, possibly with braces, code or JSON in it), or unusable (wrong
+tool name, missing argument: only a repair retry can fix it). Replies are
+built from clean calls and answers with the formatting noise LLMs add:
+code fences, prose around the JSON, Python-style quotes, trailing commas,
+a missing closing brace.
+
+One answer template mentions {"tool_name": ...} in prose on purpose: the
+parser treats it as a broken call and spends a repair retry on it.
+
+"user retries" counts replies the old parser turned into "I got confused"
+or a call to a non-existent tool, i.e. a lost turn.
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+from reasoning.tool_call_parser import ToolCallScanner, parse_tool_calls
+
+SCHEMAS = {
+    "search_web": {"params": [{"name": "query", "type": "str", "required": True, "default": None}]},
+    "list_files": {"params": [{"name": "directory", "type": "str", "required": False, "default": "."}]},
+    "get_system_stats": {"params": []},
+    "play_song_on_youtube": {"params": [{"name": "song_query", "type": "str", "required": True, "default": None}]},
+    "save_memory": {"params": [{"name": "fact", "type": "str", "required": True, "default": None}]},
+}
+ARGS = {
+    "search_web": lambda r: {"query": r.choice(["who won the 2022 world cup", "json {format} spec",
+                                                "what is 2 + 2", "latest \"AI\" news"])},
+    "list_files": lambda r: {"directory": r.choice([".", "~/Downloads", "/tmp/{build}"])},
+    "get_system_stats": lambda r: {},
+    "play_song_on_youtube": lambda r: {"song_query": r.choice(["Bohemian Rhapsody", "Let it be"])},
+    "save_memory": lambda r: {"fact": r.choice(["my dog is called Rex", "I like {curly} braces"])},
+}
+ANSWERS = [
+    "The capital of Australia is Canberra.",
+    "In Python a dict looks like {\"a\": 1, \"b\": 2}.",
+    "Use a set: {1, 2, 3} has no duplicates.",
+    "Here is an example:\n```python\nconfig = {'debug': True}\n```",
+    "A JSON array is written [1, 2, 3] and objects use {}.",
+    "I can search the web, play music, list files and remember facts for you.",
+    "The function f(x) = {x^2 if x > 0} is piecewise.",
+    "Sure! To call a tool I would normally output {\"tool_name\": ...} but here I can answer directly: 42.",
+]
+PROSE = ["Sure, let me check that.", "Okay!", "I'll look that up for you."]
+
+
+def legacy_extract(llm_response):
+    """The previous planner parsing, for comparison."""
+    match = re.search(r"\[\s*\{.*\}\s*\]", llm_response, re.DOTALL)
+    if match:
+        try:
+            calls = json.loads(match.group())
+            if all(isinstance(c, dict) and "tool_name" in c for c in calls):
+                return calls
+        except json.JSONDecodeError:
+            pass
+    match = re.search(r"\{.*\}", llm_response, re.DOTALL)
+    if not match:
+        return None
+    parsed = json.loads(match.group())
+    if "tool_calls" in parsed:
+        return parsed["tool_calls"]
+    return [parsed]
+
+
+def legacy_outcome(text):
+    try:
+        calls = legacy_extract(text)
+    except Exception:
+        return "confused", None
+    if not calls:
+        return "answer", None
+    return "tool_calls", [{"name": c.get("tool_name"), "args": c.get("parameters", {})} for c in calls]
+
+
+def make_case(r):
+    kind = r.choices(["tool", "answer", "unusable"], weights=[6, 3, 1])[0]
+    if kind == "answer":
+        return r.choice(ANSWERS), "answer", None
+
+    names = r.sample(sorted(SCHEMAS), r.choice([1, 1, 1, 2, 3]))
+    calls = [{"tool_name": n, "parameters": ARGS[n](r)} for n in names]
+    expected = [{"name": c["tool_name"], "args": c["parameters"]} for c in calls]
+    if kind == "unusable":
+        if r.random() < 0.5:
+            calls[0]["tool_name"] = calls[0]["tool_name"].replace("_", "")
+        else:
+            calls[0] = {"tool_name": "search_web", "parameters": {}}
+        expected = None
+
+    value = calls[0] if len(calls) == 1 and r.random() < 0.7 else (
+        {"tool_calls": calls} if r.random() < 0.3 else calls)
+    text = json.dumps(value, indent=r.choice([None, 2]))
+    noise = r.random()
+    if noise < 0.15:
+        text = f"```json\n{text}\n```"
+    elif noise < 0.3:
+        text = f"{r.choice(PROSE)}\n{text}"
+    elif noise < 0.4:
+        text = repr(value)  # Python dict syntax
+    elif noise < 0.5:
+        text = re.sub(r"([}\]])$", r",\1", text.replace("}}", "},}", 1))
+    elif noise < 0.6 and kind == "tool":
+        text = text[:-1]  # truncated: missing last closer
+    return text, kind, expected
+
+
+def is_correct(kind, expected, outcome, calls):
+    if kind == "tool":
+        return outcome == "tool_calls" and calls == expected
+    if kind == "answer":
+        return outcome == "answer"
+    return outcome == "invalid"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    r = random.Random(args.seed)
+    corpus = [make_case(r) for _ in range(args.cases)]
+
+    rows = {"legacy": {"correct": 0, "user_retries": 0, "llm_retries": 0, "times": []},
+            "parser": {"correct": 0, "user_retries": 0, "llm_retries": 0, "times": []}}
+    by_kind = {}
+    early, failures = [], []
+    disagree = [0, 0]  # 4-char chunks, one chunk
+    for text, kind, expected in corpus:
+        start = time.perf_counter()
+        outcome, calls = legacy_outcome(text)
+        rows["legacy"]["times"].append(time.perf_counter() - start)
+        ok_legacy = is_correct(kind, expected, outcome, calls)
+        rows["legacy"]["correct"] += ok_legacy
+        spurious = outcome == "tool_calls" and any(c["name"] not in SCHEMAS for c in calls)
+        rows["legacy"]["user_retries"] += outcome == "confused" or spurious
+
+        start = time.perf_counter()
+        result = parse_tool_calls(text, SCHEMAS)
+        rows["parser"]["times"].append(time.perf_counter() - start)
+        outcome = {"tool_calls": "tool_calls", "answer": "answer"}.get(result.kind, "invalid")
+        ok = is_correct(kind, expected, outcome, result.calls)
+        rows["parser"]["correct"] += ok
+        rows["parser"]["llm_retries"] += result.kind == "invalid"
+        by_kind.setdefault(kind, [0, 0, 0])
+        by_kind[kind][0] += 1
+        by_kind[kind][1] += ok_legacy
+        by_kind[kind][2] += ok
+        if not ok and len(failures) < 5:
+            failures.append((kind, text[:80], result))
+
+        # The streaming scanner must agree with the parser whether the reply
+        # arrives in one chunk or token by token
+        if result.kind != "invalid":
+            for size in (len(text), 4):
+                scanner = ToolCallScanner()
+                for i in range(0, len(text), size):
+                    scanner.feed(text[i:i + size])
+                scanner.finish()
+                disagree[size > 4] += scanner.is_tool_call != (result.kind == "tool_calls")
+
+        if kind == "tool":
+            scanner = ToolCallScanner()
+            for i in range(0, len(text), 4):  # ~token-sized chunks
+                scanner.feed(text[i:i + 4])
+                if scanner.is_tool_call is not None:
+                    early.append((i + 4) / len(text))
+                    break
+
+    n = len(corpus)
+    print(f"{n} replies: " + ", ".join(f"{k} {v[0]}" for k, v in sorted(by_kind.items())))
+    print(f"\n{'':<10}{'accuracy':>10}{'user retries':>14}{'LLM repairs':>13}{'parse us p50':>14}")
+    for name, row in rows.items():
+        print(f"{name:<10}{row['correct'] / n:>10.1%}{row['user_retries']:>14}{row['llm_retries']:>13}"
+              f"{statistics.median(row['times']) * 1e6:>14.1f}")
+    print("\naccuracy by label:  " + ", ".join(
+        f"{k}: legacy {v[1] / v[0]:.0%} -> parser {v[2] / v[0]:.0%}" for k, v in sorted(by_kind.items())))
+    if early:
+        print(f"streaming: tool calls recognised after {statistics.median(early):.0%} of the reply (median)")
+    print(f"streaming: scanner disagrees with the parser on {disagree[1]} replies fed in one chunk, "
+          f"{disagree[0]} fed in 4-char chunks")
+    for kind, text, result in failures:
+        print(f"  miss [{kind}] {text!r} -> {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_tool_catalog.py
+"""
+Planner tool-prompt size and build time with a large registry: the old
+per-call docstring dump versus the cached catalog prompt versus top-k
+selection by embedding, plus how often the selection keeps the right tool.
+
+    python -m benchmarks.bench_tool_catalog --domains 25 --top-k 8
+
+Synthetic tools are `domain x action` (25 domains x 5 actions = 125 tools),
+each with a signature and a docstring in the registry's style; each tool
+gets one natural-language query that should pick it.
+"""
+import argparse
+import inspect
+import statistics
+import time
+
+DOMAINS = [
+    ("weather", "forecast", "location"), ("calendar", "event", "title"), ("email", "message", "recipient"),
+    ("music", "playlist", "name"), ("lights", "light scene", "room"), ("thermostat", "temperature schedule", "zone"),
+    ("timer", "countdown timer", "label"), ("notes", "note", "text"), ("stocks", "stock watchlist", "ticker"),
+    ("news", "news feed", "topic"), ("maps", "saved place", "address"), ("translate", "translation", "phrase"),
+    ("recipes", "recipe", "dish"), ("fitness", "workout", "activity"), ("shopping", "shopping list", "item"),
+    ("reminders", "reminder", "task"), ("contacts", "contact", "person"), ("camera", "security camera", "camera_id"),
+    ("currency", "exchange rate alert", "currency_pair"), ("flights", "flight booking", "flight_number"),
+    ("hotels", "hotel reservation", "city"), ("podcasts", "podcast subscription", "show"),
+    ("alarms", "wake-up alarm", "time"), ("banking", "bank transfer", "account"), ("parking", "parking spot", "garage"),
+    ("tv", "tv recording", "channel"), ("garden", "sprinkler schedule", "zone_name"),
+    ("pets", "pet feeder schedule", "pet_name"),
+]
+ACTIONS = [
+    ("get", "Gets the current {noun} for a {param}.", "what is the current {noun} for my {param}"),
+    ("create", "Creates a new {noun} with the given {param}.", "add a new {noun} for {param} please"),
+    ("delete", "Deletes an existing {noun} by {param}.", "remove the {noun} with this {param}"),
+    ("list", "Lists all saved {noun} entries, optionally filtered by {param}.", "show me all my {noun} entries"),
+    ("update", "Updates the settings of a {noun} identified by {param}.", "change the settings of my {noun}"),
+]
+
+
+def make_tool(name, param, description):
+    def tool(**kwargs):
+        return f"{name} ok"
+    tool.__name__ = name
+    tool.__signature__ = inspect.Signature([
+        inspect.Parameter(param, inspect.Parameter.KEYWORD_ONLY, annotation=str),
+        inspect.Parameter("limit", inspect.Parameter.KEYWORD_ONLY, annotation=int, default=10),
+    ])
+    tool.__doc__ = f"{name}({param}: str, limit: int = 10): {description}"
+    return tool
+
+
+def synthetic_tools(n_domains):
+    tools, queries = {}, []
+    for domain, noun, param in DOMAINS[:n_domains]:
+        for action, doc, query in ACTIONS:
+            name = f"{action}_{domain}_{noun.replace(' ', '_').replace('-', '_')}"
+            tools[name] = make_tool(name, param, doc.format(noun=noun, param=param.replace("_", " ")))
+            queries.append((query.format(noun=noun, param=param.replace("_", " ")), name))
+    return tools, queries
+
+
+def docstring_dump(tools):
+    """What the planner used to do on every call."""
+    return "\n".join(f'- "{func.__doc__.strip()}"' for func in tools.values() if func.__doc__)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domains", type=int, default=25, help=f"synthetic domains (max {len(DOMAINS)})")
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from memory.local_embedding import get_embedding
+    from reasoning.history_manager import estimate_tokens
+    from tools.tool_registry import AVAILABLE_TOOLS, register_tool, tool_catalog
+
+    tools, queries = synthetic_tools(args.domains)
+    for name, func in tools.items():
+        register_tool(name, func)
+    tool_catalog.top_k = args.top_k
+    print(f"registry: {len(tool_catalog)} tools, top-k {args.top_k} "
+          f"(+ always included: {', '.join(tool_catalog.always_include)})")
+
+    query_embeddings = [get_embedding(query) for query, _ in queries]
+    start = time.perf_counter()
+    tool_catalog.select(queries[0][0], query_embeddings[0])
+    print(f"first selection (embeds every tool description once): {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    old_text, old_us = timed(lambda: docstring_dump(AVAILABLE_TOOLS), args.repeat)
+    full_text, full_us = timed(lambda: tool_catalog.prompt, args.repeat)
+
+    hits, select_us, selected_tokens = 0, [], []
+    for (query, target), embedding in zip(queries, query_embeddings):
+        start = time.perf_counter()
+        names = tool_catalog.select(query, embedding)
+        text = tool_catalog.render(names)
+        select_us.append((time.perf_counter() - start) * 1e6)
+        selected_tokens.append(estimate_tokens(text))
+        hits += target in names
+
+    print(f"\n{'tool prompt':<28}{'tokens':>10}{'build us':>12}")
+    print(f"{'docstrings, every call':<28}{estimate_tokens(old_text):>10}{old_us:>12.1f}")
+    print(f"{'catalog, all tools':<28}{estimate_tokens(full_text):>10}{full_us:>12.1f}")
+    print(f"{'catalog, top-k':<28}{statistics.mean(selected_tokens):>10.0f}{statistics.median(select_us):>12.1f}")
+    print(f"\nselection recall@{args.top_k}: {hits}/{len(queries)} ({hits / len(queries):.1%}) "
+          f"queries kept their target tool")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/stub_llm.py
+"""
+Local stand-in for the Perplexity chat-completions API, used by the benchmarks.
+Every request sleeps for a fixed delay and returns an OpenAI-style completion.
+Requests with "stream": true get the reply as server-sent events instead,
+one word per chunk, `token_delay` seconds apart (after the initial delay);
+non-streamed replies wait for the same generation time before answering.
+
+Faults can be injected: `error_rate` of requests fail with `error_status`,
+`hang_rate` of requests sleep `hang_seconds` before answering, `down=True`
+fails everything with 503, and `rate_limit` (requests/second) answers
+excess requests with 429 and a Retry-After header.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def default_reply(prompt: str) -> str:
+    """Answers directly (no tool call) and tells the memory filter to IGNORE."""
+    if "Memory filter" in prompt:
+        return "IGNORE"
+    return "This is a stub answer."
+
+
+class StubLLMServer:
+    def __init__(self, delay: float = 0.2, reply=default_reply, host: str = "127.0.0.1", port: int = 0,
+                 token_delay: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 hang_rate: float = 0.0, hang_seconds: float = 30.0, rate_limit: float = 0.0, seed: int = 0):
+        self.delay = delay
+        self.token_delay = token_delay
+        self.reply = reply
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rate_limit = rate_limit
+        self.down = False
+        self.request_count = 0
+        self.status_counts = {}
+        self._recent = []  # arrival times within the last second, for rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        ThreadingHTTPServer.request_queue_size = 256  # listen backlog for bursts
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                prompt = body["messages"][-1]["content"]
+                with stub._lock:
+                    stub.request_count += 1
+                    fault = stub._fault()
+                if fault == "hang":
+                    time.sleep(stub.hang_seconds)
+                elif fault:
+                    self._error(fault)
+                    return
+                time.sleep(stub.delay)
+                reply = stub.reply(prompt)
+                if body.get("stream"):
+                    self._stream(reply)
+                    return
+
+                tokens = len(re.findall(r"\S+\s*", reply))
+                if stub.token_delay and tokens > 1:
+                    time.sleep(stub.token_delay * (tokens - 1))
+                payload = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": reply}}]
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status):
+                payload = json.dumps({"error": {"code": status}}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, reply):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(re.findall(r"\S+\s*", reply)):
+                    if i:
+                        time.sleep(stub.token_delay)
+                    event = {"choices": [{"delta": {"content": token}}]}
+                    self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # client gave up (e.g. its read timeout)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _fault(self):
+        """None, "hang" or an HTTP error status for the next request (called under the lock)."""
+        if self.down:
+            status = 503
+        elif self.rate_limit:
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            status = 429 if len(self._recent) >= self.rate_limit else None
+            if status is None:
+                self._recent.append(now)
+        else:
+            status = None
+        if status is None and self._random.random() < self.error_rate:
+            status = self.error_status
+        if status is None and self._random.random() < self.hang_rate:
+            return "hang"
+        self.status_counts[status or 200] = self.status_counts.get(status or 200, 0) + 1
+        return status
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
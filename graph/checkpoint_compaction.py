@@ -0,0 +1,238 @@
+# graph/checkpoint_compaction.py
+"""
+Retention for the checkpoint store.
+
+Every planner / tool / respond step writes a checkpoint, so a long-lived
+thread accumulates thousands of them although only the latest is ever
+loaded. Compaction:
+  - keeps the newest CHECKPOINT_KEEP_LAST checkpoints of each thread and
+    deletes older ones with their pending writes (and, on Postgres, the
+    channel blobs of the deleted checkpoints that no remaining checkpoint
+    of the thread still references);
+  - deletes whole threads idle for longer than CHECKPOINT_THREAD_TTL_DAYS;
+  - reclaims the space (VACUUM on SQLite).
+
+Checkpoint ids are time-ordered UUIDv6 strings, so "idle since" is a plain
+string comparison against an id built for the cutoff time.
+
+Run it once from the command line:
+
+    python -m graph.checkpoint_compaction --keep-last 10 --ttl-days 30
+
+or periodically inside the API (CHECKPOINT_COMPACT_INTERVAL seconds).
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+
+from utils.config import CHECKPOINT_BACKEND, CHECKPOINT_DB_PATH
+from utils.log import get_logger
+
+log = get_logger("checkpoint")
+
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 10))
+CHECKPOINT_THREAD_TTL_DAYS = float(os.getenv("CHECKPOINT_THREAD_TTL_DAYS", 0))    # 0 = never expire
+CHECKPOINT_COMPACT_INTERVAL = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL", 0))  # 0 = no background job
+
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """Smallest UUIDv6 checkpoint id for a Unix timestamp."""
+    ticks = int(timestamp * 1e7) + _UUID_EPOCH_OFFSET
+    value = (((ticks >> 12) & 0xFFFFFFFFFFFF) << 80) | (6 << 76) | ((ticks & 0x0FFF) << 64)
+    return str(uuid.UUID(int=value))
+
+
+def _cutoff_id(ttl_days):
+    return checkpoint_id_at(time.time() - ttl_days * 86400) if ttl_days and ttl_days > 0 else None
+
+
+# -----------------------
+# SQLite
+# -----------------------
+def compact_sqlite(path: str = CHECKPOINT_DB_PATH, keep_last: int = CHECKPOINT_KEEP_LAST,
+                   ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS, vacuum: bool = True):
+    import sqlite3
+
+    size_before = _sqlite_size(path)
+    conn = sqlite3.connect(path, timeout=30)
+    stats = {"backend": "sqlite", "threads_expired": 0}
+    try:
+        with conn:
+            cutoff = _cutoff_id(ttl_days)
+            if cutoff:
+                expired = [row[0] for row in conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < ?",
+                    (cutoff,))]
+                for thread_id in expired:
+                    conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                    conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                stats["threads_expired"] = len(expired)
+
+            stats["checkpoints_deleted"] = conn.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                        ) AS rn
+                        FROM checkpoints
+                    ) WHERE rn > ?
+                )
+                """, (keep_last,)).rowcount
+            stats["writes_deleted"] = conn.execute(
+                """
+                DELETE FROM writes WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = writes.thread_id
+                      AND c.checkpoint_ns = writes.checkpoint_ns
+                      AND c.checkpoint_id = writes.checkpoint_id
+                )
+                """).rowcount
+        if vacuum:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    stats["bytes_before"] = size_before
+    stats["bytes_after"] = _sqlite_size(path)
+    return stats
+
+
+def _sqlite_size(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+# -----------------------
+# Postgres
+# -----------------------
+def _columns(rows, width):
+    """Rows as `width` column lists, the parameters of an unnest()."""
+    return [list(column) for column in zip(*rows)] or [[] for _ in range(width)]
+
+
+def compact_postgres(database_url: str, keep_last: int = CHECKPOINT_KEEP_LAST,
+                     ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS, vacuum: bool = True):
+    import psycopg
+
+    stats = {"backend": "postgres", "threads_expired": 0}
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        size_query = ("SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+                      "WHERE c.relname IN ('checkpoints', 'checkpoint_blobs', 'checkpoint_writes')")
+        stats["bytes_before"] = conn.execute(size_query).fetchone()[0]
+
+        with conn.transaction():
+            cutoff = _cutoff_id(ttl_days)
+            if cutoff:
+                expired = [row[0] for row in conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < %s",
+                    (cutoff,))]
+                for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+                    conn.execute(f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (expired,))
+                stats["threads_expired"] = len(expired)
+
+            # Only what this run prunes: a checkpoint being written right now has its
+            # blobs in place before its row exists, so "unreferenced" is not "unused"
+            pruned = conn.execute(
+                """
+                DELETE FROM checkpoints c USING (
+                    SELECT thread_id, checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                    ) AS rn
+                    FROM checkpoints
+                ) ranked
+                WHERE ranked.rn > %s
+                  AND c.thread_id = ranked.thread_id
+                  AND c.checkpoint_ns = ranked.checkpoint_ns
+                  AND c.checkpoint_id = ranked.checkpoint_id
+                RETURNING c.thread_id, c.checkpoint_ns, c.checkpoint_id, c.checkpoint -> 'channel_versions'
+                """, (keep_last,)).fetchall()
+            stats["checkpoints_deleted"] = len(pruned)
+            stats["writes_deleted"] = conn.execute(
+                """
+                DELETE FROM checkpoint_writes w
+                USING unnest(%s::text[], %s::text[], %s::text[]) AS p(thread_id, checkpoint_ns, checkpoint_id)
+                WHERE w.thread_id = p.thread_id
+                  AND w.checkpoint_ns = p.checkpoint_ns
+                  AND w.checkpoint_id = p.checkpoint_id
+                """, _columns([row[:3] for row in pruned], 3)).rowcount
+            # Channel values are stored once per version and shared by the checkpoints
+            # that did not change them: drop a pruned checkpoint's versions unless a
+            # remaining checkpoint of its thread still points at them
+            versions = {(thread_id, ns, channel, str(version))
+                        for thread_id, ns, _, channel_versions in pruned
+                        for channel, version in (channel_versions or {}).items()}
+            stats["blobs_deleted"] = conn.execute(
+                """
+                DELETE FROM checkpoint_blobs b
+                USING unnest(%s::text[], %s::text[], %s::text[], %s::text[])
+                    AS p(thread_id, checkpoint_ns, channel, version)
+                WHERE b.thread_id = p.thread_id
+                  AND b.checkpoint_ns = p.checkpoint_ns
+                  AND b.channel = p.channel
+                  AND b.version = p.version
+                  AND NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = b.thread_id
+                      AND c.checkpoint_ns = b.checkpoint_ns
+                      AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                  )
+                """, _columns(versions, 4)).rowcount
+        if vacuum:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                conn.execute(f"VACUUM (ANALYZE) {table}")
+        stats["bytes_after"] = conn.execute(size_query).fetchone()[0]
+    return stats
+
+
+def compact_checkpoints(backend: str = CHECKPOINT_BACKEND, database_url: str = None,
+                        keep_last: int = CHECKPOINT_KEEP_LAST, ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS,
+                        vacuum: bool = True):
+    """Compacts the configured checkpoint store; returns what was removed."""
+    start = time.perf_counter()
+    if backend == "sqlite":
+        stats = compact_sqlite(CHECKPOINT_DB_PATH, keep_last, ttl_days, vacuum)
+    elif backend == "postgres":
+        stats = compact_postgres(database_url or os.getenv("DATABASE_URL"), keep_last, ttl_days, vacuum)
+    else:
+        return {"backend": backend, "skipped": True}
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    log.info(f"[Checkpoint] Compacted: {stats}")
+    return stats
+
+
+def start_compaction_job(interval: float = CHECKPOINT_COMPACT_INTERVAL, **kwargs):
+    """Runs compact_checkpoints every `interval` seconds on a daemon thread."""
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                compact_checkpoints(**kwargs)
+            except Exception as e:
+                log.error(f"[Checkpoint] Compaction failed: {e}")
+
+    threading.Thread(target=loop, name="checkpoint-compaction", daemon=True).start()
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=CHECKPOINT_BACKEND, choices=["sqlite", "postgres"])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--keep-last", type=int, default=CHECKPOINT_KEEP_LAST)
+    parser.add_argument("--ttl-days", type=float, default=CHECKPOINT_THREAD_TTL_DAYS)
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+    compact_checkpoints(args.backend, args.database_url, args.keep_last, args.ttl_days, not args.no_vacuum)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# graph/checkpointer.py
+"""
+Checkpointer backends for the agent graph, selected by CHECKPOINT_BACKEND.
+
+  sqlite    one file, WAL journal so several worker processes can read while
+            one writes; busy_timeout instead of "database is locked" errors.
+  postgres  psycopg connection pool shared by all threads / tasks of a worker;
+            every worker process gets its own pool against the same database.
+  memory    in-process only, nothing persisted.
+
+Each backend has a sync variant (graph.stream/invoke) and an async one
+(graph.astream/ainvoke). Database drivers are imported only when selected.
+"""
+from utils.config import CHECKPOINT_BACKEND, CHECKPOINT_DB_PATH, CHECKPOINT_POOL_SIZE
+from utils.log import get_logger
+
+log = get_logger("checkpoint")
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+_SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+]
+
+
+def _postgres_kwargs():
+    from psycopg.rows import dict_row
+    # The shape langgraph's PostgresSaver expects from its connections
+    return {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND, database_url: str = None,
+                        path: str = CHECKPOINT_DB_PATH, pool_size: int = CHECKPOINT_POOL_SIZE):
+    """
+    Returns (checkpointer, close) for the sync graph API.
+    `close()` releases the connection / pool.
+    """
+    if backend == "sqlite":
+        import sqlite3
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        for pragma in _SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        saver = SqliteSaver(conn)
+        saver.setup()
+        log.info(f"[Checkpoint] SQLite (WAL) at {path}")
+        return saver, conn.close
+
+    if backend == "postgres":
+        if not database_url:
+            raise ValueError("CHECKPOINT_BACKEND=postgres requires DATABASE_URL.")
+        from psycopg_pool import ConnectionPool
+        from langgraph.checkpoint.postgres import PostgresSaver
+
+        pool = ConnectionPool(database_url, min_size=1, max_size=pool_size,
+                              kwargs=_postgres_kwargs(), open=True)
+        saver = PostgresSaver(pool)
+        saver.setup()
+        log.info(f"[Checkpoint] Postgres, pool of up to {pool_size} connections")
+        return saver, pool.close
+
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver(), lambda: None
+
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r}")
+
+
+async def create_async_checkpointer(backend: str = CHECKPOINT_BACKEND, database_url: str = None,
+                                    path: str = CHECKPOINT_DB_PATH, pool_size: int = CHECKPOINT_POOL_SIZE):
+    """
+    Returns (checkpointer, aclose) for the async graph API. Must be called
+    from the event loop that will use it; `await aclose()` on shutdown.
+    """
+    if backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        conn = await aiosqlite.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        for pragma in _SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        log.info(f"[Checkpoint] Async SQLite (WAL) at {path}")
+        return saver, conn.close
+
+    if backend == "postgres":
+        if not database_url:
+            raise ValueError("CHECKPOINT_BACKEND=postgres requires DATABASE_URL.")
+        from psycopg_pool import AsyncConnectionPool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+        pool = AsyncConnectionPool(database_url, min_size=1, max_size=pool_size,
+                                   kwargs=_postgres_kwargs(), open=False)
+        await pool.open()
+        saver = AsyncPostgresSaver(pool)
+        await saver.setup()
+        log.info(f"[Checkpoint] Async Postgres, pool of up to {pool_size} connections")
+        return saver, pool.close
+
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        async def aclose():
+            return None
+        return InMemorySaver(), aclose
+
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r}")
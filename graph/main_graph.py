@@ -1,9 +1,10 @@
 # graph/main_graph.py
 
 import os
-import json
-import re
-import operator
+import asyncio
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import TypedDict, Annotated, Sequence
 
 from dotenv import load_dotenv
@@ -11,18 +12,45 @@ load_dotenv()
 
 # LangGraph
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph.message import add_messages
+from langgraph.config import get_stream_writer
 
 # LangChain messages
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 
 # Internal modules
-from perception.perplexity_api import perplexity_search
-from reasoning.llm_reasoning import llm_reasoning_with_history
-from memory.short_term_memory import update_short_term_memory
-from memory.local_embedding import get_embedding
-from tools.tool_registry import AVAILABLE_TOOLS, TOOL_DESCRIPTIONS
+from reasoning.llm_reasoning import (
+    llm_reasoning_with_history,
+    allm_reasoning_with_history,
+    allm_reasoning_stream,
+)
+from memory.short_term_memory import (
+    update_short_term_memory,
+    search_short_term_memory,
+    get_short_term_memory_size,
+    DEFAULT_SESSION,
+)
+from memory.local_embedding import get_embedding, aget_embedding
+from memory.write_behind import memory_write_queue
+from reasoning.memory_classifier import classify_memory
+from reasoning.history_manager import compact_history, estimate_tokens, format_history
+from reasoning.tool_call_parser import ToolCallScanner, parse_tool_calls, count as count_parse
+from reasoning.fast_router import FAST_ROUTER_ENABLED, fast_route, route_by_rules, format_tool_result
+from tools.tool_registry import (
+    AVAILABLE_TOOLS,
+    tool_catalog,
+    run_tool,
+    arun_tool,
+    tool_pool,
+    get_tool_timeout,
+)
+from graph.checkpointer import create_checkpointer, create_async_checkpointer
 from utils.config import POSTGRES_CONFIG
+from utils.log import get_logger
+from utils.metrics import timed
+
+log = get_logger("graph")
 
 
 # ============================================================
@@ -30,7 +58,7 @@ from utils.config import POSTGRES_CONFIG
 # ============================================================
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-STM_CONDENSE_THRESHOLD = int(os.getenv("STM_CONDENSE_THRESHOLD", 5))
+STM_TOP_K = int(os.getenv("STM_TOP_K", 3))
 
 
 # ============================================================
@@ -40,7 +68,7 @@ STM_CONDENSE_THRESHOLD = int(os.getenv("STM_CONDENSE_THRESHOLD", 5))
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL or DATABASE_URL.strip() == "":
-    print("⚠️ DATABASE_URL not set. Using local PostgreSQL from .env ...")
+    log.warning("⚠️ DATABASE_URL not set. Using local PostgreSQL from .env ...")
 
     DATABASE_URL = (
         f"postgresql://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@"
@@ -48,7 +76,7 @@ if not DATABASE_URL or DATABASE_URL.strip() == "":
         f"{POSTGRES_CONFIG['dbname']}"
     )
 
-    print(f"✔️ Local DATABASE_URL = {DATABASE_URL}")
+    log.info(f"✔️ Local DATABASE_URL = {DATABASE_URL}")
 
 
 # ============================================================
@@ -56,23 +84,23 @@ if not DATABASE_URL or DATABASE_URL.strip() == "":
 # ============================================================
 
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    # add_messages appends, and also lets respond replace old turns with a summary
+    # (RemoveMessage) so the checkpointed history stays bounded
+    messages: Annotated[Sequence[BaseMessage], add_messages]
 
 
 # ============================================================
 # ===================== PLANNER NODE =========================
 # ============================================================
 
-def call_planner_llm(state: AgentState):
-    print("🤖 [Node] Planner LLM is thinking...")
-    messages = state["messages"]
-
-    system_prompt = f"""
+# The tool list between the two parts is chosen per query by the tool catalog
+PLANNER_PROMPT_HEAD = """
 You are JARVIS, a proactive, highly capable AI assistant.
 
 You have access to these tools:
-{TOOL_DESCRIPTIONS}
+"""
 
+PLANNER_PROMPT_RULES = """
 Rules:
 1. If last message is a ToolMessage → summarize result for user.
 2. If HumanMessage:
@@ -80,117 +108,339 @@ Rules:
    - Use system tools for system actions.
    - Use search_web for general knowledge.
    - Otherwise answer normally.
-3. If planning to use a tool → output ONLY JSON tool call.
+3. If planning to use a tool → output ONLY JSON tool call:
+   {"tool_name": "...", "parameters": {...}}
+   For several independent tools, output ONLY a JSON list of such calls;
+   they run in parallel and all results come back together.
 4. Otherwise → output ONLY the answer.
 """
 
-    llm_response = llm_reasoning_with_history(system_prompt, messages)
 
-    try:
-        match = re.search(r"\{.*\}", llm_response, re.DOTALL)
-
-        if match:
-            tool_call_json = json.loads(match.group())
-            tool_name = tool_call_json.get("tool_name")
-            parameters = tool_call_json.get("parameters", {})
-
-            print(f"🤖 [Planner] Calling tool: {tool_name}")
-
-            return {
-                "messages": [
-                    AIMessage(
-                        content="",
-                        tool_calls=[{
-                            "id": f"tool_{len(messages)}",
-                            "name": tool_name,
-                            "args": parameters
-                        }]
-                    )
-                ]
-            }
-        else:
-            print("🤖 [Planner] Responding directly.")
-            return {"messages": [AIMessage(content=llm_response)]}
+def _session_id(config: RunnableConfig):
+    return (config or {}).get("configurable", {}).get("thread_id", DEFAULT_SESSION)
+
+
+def _memory_namespaces(config: RunnableConfig):
+    """Long-term memory namespaces of this turn: the user's (if the caller sent one), then the session's."""
+    configurable = (config or {}).get("configurable", {})
+    return tuple(ns for ns in dict.fromkeys((configurable.get("user_id"), _session_id(config))) if ns)
+
+
+def _last_user_query(messages):
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            return m.content
+    return ""
+
+
+def _planner_prompt(tools_text, stm_hits):
+    """The offered tools, plus the most relevant short-term facts for this session, if any."""
+    prompt = PLANNER_PROMPT_HEAD + tools_text + "\n" + PLANNER_PROMPT_RULES
+    if not stm_hits:
+        return prompt
+    facts = "\n".join(f"- {fact}" for fact, _ in stm_hits)
+    return prompt + f"\nRecent facts from this conversation:\n{facts}\n"
+
+
+def _planner_context(messages, config, embedding):
+    """(tools text, STM hits) for a query whose embedding is already computed (or None)."""
+    query = _last_user_query(messages)
+    tools_text = tool_catalog.prompt_for(query, embedding)
+    if embedding is None or not get_short_term_memory_size(_session_id(config)):
+        return tools_text, []
+    return tools_text, search_short_term_memory(embedding, _session_id(config), top_k=STM_TOP_K)
+
+
+def _needs_query_embedding(messages, config):
+    return bool(_last_user_query(messages)) and (
+        tool_catalog.selects or get_short_term_memory_size(_session_id(config)) > 0)
 
-    except Exception as e:
-        print(f"Planner error: {e}, LLM said: {llm_response}")
-        return {"messages": [AIMessage(content="I got confused. Please try again.")]}
+
+def _build_planner_prompt(messages, config, embedding=None):
+    tools_text, stm_hits = _planner_context(messages, config, embedding)
+    system_prompt = _planner_prompt(tools_text, stm_hits)
+    # Token accounting: the history text is cached per session, so this is cheap
+    history_tokens = estimate_tokens(format_history(messages, _session_id(config)))
+    tool_catalog.record_prompt("planner", estimate_tokens(system_prompt) + history_tokens,
+                               estimate_tokens(tools_text))
+    return system_prompt
+
+
+def _parse(llm_response: str):
+    result = parse_tool_calls(llm_response, tool_catalog.schemas)
+    count_parse("parsed")
+    count_parse({"tool_calls": "tool_calls", "answer": "answers"}.get(result.kind, "invalid"))
+    return result
+
+
+def _repair_prompt(system_prompt, llm_response, result):
+    """The planner prompt plus what was wrong with the previous reply (one retry)."""
+    return system_prompt + (
+        f"\nYour previous reply could not be used: {'; '.join(result.errors)}.\n"
+        f"Previous reply: {llm_response[:500]}\n"
+        "Reply again with ONLY a valid JSON tool call for one of the tools above, or ONLY the answer.\n"
+    )
+
+
+def _repaired(first, second):
+    if second.kind == "invalid":
+        count_parse("repair_failed")
+        return first
+    count_parse("repaired")
+    log.info("🤖 [Planner] Repaired an unusable reply.")
+    return second
+
+
+def _parse_planner_output(result, messages):
+    """Turns a parsed planner reply into either tool call(s) or a direct answer."""
+    if result.kind == "tool_calls":
+        tool_calls = [
+            {"id": f"tool_{len(messages)}_{i}", "name": call["name"], "args": call["args"]}
+            for i, call in enumerate(result.calls)
+        ]
+        log.info(f"🤖 [Planner] Calling tool(s): {', '.join(tc['name'] for tc in tool_calls)}")
+        return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+    if result.kind == "invalid":
+        log.warning(f"Planner error: {'; '.join(result.errors)}")
+        # Keep whatever prose came with the broken call rather than failing the turn
+        return {"messages": [AIMessage(content=result.answer or "I got confused. Please try again.")]}
+
+    log.info("🤖 [Planner] Responding directly.")
+    return {"messages": [AIMessage(content=result.answer)]}
+
+
+@timed("node", "planner_llm")
+def call_planner_llm(state: AgentState, config: RunnableConfig):
+    log.info("🤖 [Node] Planner LLM is thinking...")
+    messages = state["messages"]
+    embedding = get_embedding(_last_user_query(messages)) if _needs_query_embedding(messages, config) else None
+    system_prompt = _build_planner_prompt(messages, config, embedding)
+    llm_response = llm_reasoning_with_history(system_prompt, messages, _session_id(config))
+    result = _parse(llm_response)
+    if result.kind == "invalid":
+        retry = llm_reasoning_with_history(_repair_prompt(system_prompt, llm_response, result),
+                                           messages, _session_id(config))
+        result = _repaired(result, _parse(retry))
+    return _parse_planner_output(result, messages)
+
+
+async def _astream_planner(system_prompt, messages, session_id):
+    """
+    Streams the planner output. Answer text is forwarded to the graph's
+    "custom" stream as {"type": "token", "text": ...} events as soon as the
+    scanner knows it is not part of a JSON tool call.
+    Returns the full reply and whether any of it was streamed.
+    """
+    writer = get_stream_writer()
+    scanner = ToolCallScanner()
+    streamed = False
+    async for token in allm_reasoning_stream(system_prompt, messages, session_id):
+        text = scanner.feed(token)
+        if not streamed:
+            text = text.lstrip()
+        if text:
+            writer({"type": "token", "text": text})
+            streamed = True
+    text = scanner.finish()
+    if text.strip():
+        writer({"type": "token", "text": text if streamed else text.lstrip()})
+        streamed = True
+    return scanner.text.strip(), streamed
+
+
+@timed("node", "planner_llm")
+async def acall_planner_llm(state: AgentState, config: RunnableConfig):
+    log.info("🤖 [Node] Planner LLM is thinking (async)...")
+    messages = state["messages"]
+    embedding = await aget_embedding(_last_user_query(messages)) if _needs_query_embedding(messages, config) else None
+    system_prompt = _build_planner_prompt(messages, config, embedding)
+    stream_tokens = (config or {}).get("configurable", {}).get("stream_tokens")
+    streamed = False
+    if stream_tokens:
+        llm_response, streamed = await _astream_planner(system_prompt, messages, _session_id(config))
+    else:
+        llm_response = await allm_reasoning_with_history(system_prompt, messages, _session_id(config))
+    result = _parse(llm_response)
+    if result.kind == "invalid":
+        first = result
+        retry = await allm_reasoning_with_history(_repair_prompt(system_prompt, llm_response, result),
+                                                  messages, _session_id(config))
+        result = _repaired(result, _parse(retry))
+        if stream_tokens and result is not first:
+            writer = get_stream_writer()
+            # The prose streamed from the broken reply is superseded: tell the client to drop it
+            if streamed:
+                writer({"type": "reset"})
+            if result.kind == "answer":
+                writer({"type": "token", "text": result.answer})
+    return _parse_planner_output(result, messages)
 
 
 # ============================================================
 # ==================== TOOL EXECUTOR NODE ====================
 # ============================================================
 
-def call_tool_executor(state: AgentState):
-    print("🤖 [Node] Tool Executor")
+def _run_tool(name, args, tool_call_id, namespaces=None):
+    if name not in AVAILABLE_TOOLS:
+        return ToolMessage(content=f"Error: Tool '{name}' not found.", tool_call_id=tool_call_id)
+
+    try:
+        result = run_tool(name, args, namespaces)
+        log.info(f"🤖 [Tool Executor] {name} succeeded")
+        return ToolMessage(content=str(result), tool_call_id=tool_call_id)
+    except Exception as e:
+        log.error(f"Error running tool {name}: {e}")
+        return ToolMessage(content=f"Error running tool: {e}", tool_call_id=tool_call_id)
+
+
+def _timeout_message(name, tool_call_id):
+    log.warning(f"Tool {name} timed out after {get_tool_timeout(name)}s")
+    return ToolMessage(content=f"Error: Tool '{name}' timed out after {get_tool_timeout(name):g}s.",
+                       tool_call_id=tool_call_id)
 
-    last = state["messages"][-1]
-    tool_call = last.tool_calls[0]
 
-    name = tool_call["name"]
-    args = tool_call["args"]
+def _execute_tool_calls(tool_calls, namespaces=None):
+    # All calls start at once on the tool pool; each gets its own deadline.
+    # A timed-out tool keeps running in its thread but is reported as failed.
+    start = time.monotonic()
+    futures = [tool_pool.submit(_run_tool, tc["name"], tc["args"], tc["id"], namespaces) for tc in tool_calls]
 
+    messages = []
+    for tc, future in zip(tool_calls, futures):
+        remaining = start + get_tool_timeout(tc["name"]) - time.monotonic()
+        try:
+            messages.append(future.result(timeout=max(0.0, remaining)))
+        except FutureTimeoutError:
+            messages.append(_timeout_message(tc["name"], tc["id"]))
+    return messages
+
+
+@timed("node", "tool_executor")
+def call_tool_executor(state: AgentState, config: RunnableConfig):
+    log.info("🤖 [Node] Tool Executor")
+    return {"messages": _execute_tool_calls(state["messages"][-1].tool_calls, _memory_namespaces(config))}
+
+
+async def _arun_tool(name, args, tool_call_id, namespaces=None):
     if name not in AVAILABLE_TOOLS:
-        return {
-            "messages": [
-                ToolMessage(content=f"Error: Tool '{name}' not found.", tool_call_id=tool_call["id"])
-            ]
-        }
+        return ToolMessage(content=f"Error: Tool '{name}' not found.", tool_call_id=tool_call_id)
 
     try:
-        result = AVAILABLE_TOOLS[name](**args)
-        print(f"🤖 [Tool Executor] {name} succeeded")
-        return {
-            "messages": [
-                ToolMessage(content=str(result), tool_call_id=tool_call["id"])
-            ]
-        }
+        result = await asyncio.wait_for(arun_tool(name, args, namespaces), timeout=get_tool_timeout(name))
+        log.info(f"🤖 [Tool Executor] {name} succeeded")
+        return ToolMessage(content=str(result), tool_call_id=tool_call_id)
+    except asyncio.TimeoutError:
+        return _timeout_message(name, tool_call_id)
     except Exception as e:
-        print(f"Error running tool {name}: {e}")
-        return {
-            "messages": [
-                ToolMessage(content=f"Error running tool: {e}", tool_call_id=tool_call["id"])
-            ]
-        }
+        log.error(f"Error running tool {name}: {e}")
+        return ToolMessage(content=f"Error running tool: {e}", tool_call_id=tool_call_id)
+
+
+async def _aexecute_tool_calls(tool_calls, namespaces=None):
+    # Coroutine tools run on the loop, blocking ones on the tool pool, all concurrently
+    messages = await asyncio.gather(*(_arun_tool(tc["name"], tc["args"], tc["id"], namespaces) for tc in tool_calls))
+    return list(messages)
+
+
+@timed("node", "tool_executor")
+async def acall_tool_executor(state: AgentState, config: RunnableConfig):
+    log.info("🤖 [Node] Tool Executor (async)")
+    return {"messages": await _aexecute_tool_calls(state["messages"][-1].tool_calls, _memory_namespaces(config))}
+
+
+# ============================================================
+# ================== FAST-PATH ROUTER NODE ===================
+# ============================================================
+
+def _fast_path_call(route, messages):
+    tool, args, source = route
+    log.info(f"🤖 [Fast Router] {tool} via {source}, skipping planner")
+    tool_call = {"id": f"fast_{len(messages)}", "name": tool, "args": args}
+    return AIMessage(content="", tool_calls=[tool_call]), tool_call
+
+
+def _fast_path_answer(call_message, tool_message):
+    """
+    Tool call + result + templated answer. A failed tool leaves the result
+    for the planner to explain instead.
+    """
+    if str(tool_message.content).startswith("Error"):
+        return {"messages": [call_message, tool_message]}
+    answer = format_tool_result(call_message.tool_calls[0]["name"], tool_message.content)
+    return {"messages": [call_message, tool_message, AIMessage(content=answer)]}
+
+
+@timed("node", "fast_router")
+def call_fast_router(state: AgentState, config: RunnableConfig):
+    messages = state["messages"]
+    route = fast_route(_last_user_query(messages), available_tools=AVAILABLE_TOOLS)
+    if route is None:
+        return {"messages": []}
+    call_message, tool_call = _fast_path_call(route, messages)
+    tool_message = _execute_tool_calls([tool_call], _memory_namespaces(config))[0]
+    return _fast_path_answer(call_message, tool_message)
+
+
+@timed("node", "fast_router")
+async def acall_fast_router(state: AgentState, config: RunnableConfig):
+    messages = state["messages"]
+    query = _last_user_query(messages)
+    if not FAST_ROUTER_ENABLED or not query:
+        return {"messages": []}
+    # Rules first; only embed (cached, batched) when no rule matched
+    embedding = None if route_by_rules(query) is not None else await aget_embedding(query)
+    route = fast_route(query, embedding=embedding, available_tools=AVAILABLE_TOOLS)
+    if route is None:
+        return {"messages": []}
+    call_message, tool_call = _fast_path_call(route, messages)
+    tool_message = (await _aexecute_tool_calls([tool_call], _memory_namespaces(config)))[0]
+    return _fast_path_answer(call_message, tool_message)
+
+
+def after_fast_router(state: AgentState):
+    last = state["messages"][-1]
+    # Templated answer ready → respond; otherwise (no route, or a failed tool) → planner
+    if isinstance(last, AIMessage) and not last.tool_calls:
+        return "respond"
+    return "planner"
 
 
 # ============================================================
 # =================== FINAL RESPONSE NODE ====================
 # ============================================================
 
-def respond_and_save_node(state: AgentState):
+def _build_memory_summary(state: AgentState):
     final_response = state["messages"][-1].content
-    print("🤖 JARVIS:", final_response)
+    log.debug(f"[Respond] Final response: {final_response}")
 
-    # find last user message
-    user_query = ""
-    for m in reversed(state["messages"]):
-        if isinstance(m, HumanMessage):
-            user_query = m.content
-            break
+    user_query = _last_user_query(state["messages"])
+    return user_query, f'User: "{user_query}" | JARVIS: "{final_response}"'
 
-    summary = f'User: "{user_query}" | JARVIS: "{final_response}"'
 
-    decision_prompt = f"""
-Memory filter:
-"{summary}"
+def _save_to_stm(user_query: str, summary: str, session_id: str):
+    """Synchronous save, used only when the write-behind queue is full."""
+    decision, confidence, source = classify_memory(user_query, summary)
+    if decision != "SAVE":
+        log.info(f"[STM] Ignored trivial exchange ({source}, {confidence:.2f}).")
+        return
+    update_short_term_memory(summary, get_embedding(summary), session_id)
+    log.info(f"[STM] Saved ({source}, {confidence:.2f}): {summary}")
 
-Return ONLY: SAVE or IGNORE.
-"""
 
-    try:
-        decision = perplexity_search(decision_prompt).strip().upper()
-    except:
-        decision = "SAVE"
-
-    if decision == "SAVE":
-        embedding = get_embedding(summary)
-        update_short_term_memory(summary, embedding)
-        print(f"[STM] Saved: {summary}")
-    else:
-        print("[STM] Ignored trivial exchange.")
+def wait_for_memory_saves(timeout=None):
+    """Blocks until every queued memory write has run (call before exiting)."""
+    return memory_write_queue.flush(timeout)
+
 
-    return state
+@timed("node", "respond")
+def respond_and_save_node(state: AgentState, config: RunnableConfig):
+    user_query, summary = _build_memory_summary(state)
+    # Persistence happens in the write-behind worker, off the response path
+    if not memory_write_queue.submit_exchange(user_query, summary, _session_id(config)):
+        _save_to_stm(user_query, summary, _session_id(config))
+    # The final answer is already the last message; only old turns may be compacted
+    return {"messages": compact_history(state["messages"])}
 
 
 # ============================================================
@@ -208,11 +458,24 @@ def should_continue(state: AgentState):
 
 graph_builder = StateGraph(AgentState)
 
-graph_builder.add_node("planner_llm", call_planner_llm)
-graph_builder.add_node("tool_executor", call_tool_executor)
+# The fast router, planner and tool executor carry a sync and an async implementation:
+# graph.stream/invoke use the former, graph.astream/ainvoke the latter.
+# respond only hands memory work to a background thread, so one version suffices.
+graph_builder.add_node("fast_router", RunnableLambda(call_fast_router, afunc=acall_fast_router))
+graph_builder.add_node("planner_llm", RunnableLambda(call_planner_llm, afunc=acall_planner_llm))
+graph_builder.add_node("tool_executor", RunnableLambda(call_tool_executor, afunc=acall_tool_executor))
 graph_builder.add_node("respond", respond_and_save_node)
 
-graph_builder.set_entry_point("planner_llm")
+graph_builder.set_entry_point("fast_router")
+
+graph_builder.add_conditional_edges(
+    "fast_router",
+    after_fast_router,
+    {
+        "planner": "planner_llm",
+        "respond": "respond"
+    }
+)
 
 graph_builder.add_conditional_edges(
     "planner_llm",
@@ -231,7 +494,56 @@ graph_builder.add_edge("respond", END)
 # =============== CHECKPOINT (POSTGRES + SQLITE) ==============
 # ============================================================
 
-# IMPORTANT: langgraph-checkpoint-sqlite v3.x uses new signature.
-memory = SqliteSaver.from_conn_string(DATABASE_URL)
-
-graph = graph_builder.compile(checkpointer=memory)
+# The backend (sqlite / postgres / memory) comes from CHECKPOINT_BACKEND; see
+# graph/checkpointer.py. The checkpointer is opened on first use rather than
+# at import time.
+_graph = None
+_close_checkpointer = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """Returns the graph compiled with the sync checkpointer, for stream/invoke."""
+    global _graph, _close_checkpointer
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                memory, _close_checkpointer = create_checkpointer(database_url=DATABASE_URL)
+                _graph = graph_builder.compile(checkpointer=memory)
+    return _graph
+
+
+def close_graph():
+    """Closes the sync checkpointer's connection / pool."""
+    global _graph, _close_checkpointer
+    with _graph_lock:
+        if _close_checkpointer is not None:
+            _close_checkpointer()
+        _graph = None
+        _close_checkpointer = None
+
+
+# The async graph needs an async checkpointer bound to the running event loop,
+# so it is compiled on first use (e.g. from the FastAPI app).
+_async_graph = None
+_aclose_checkpointer = None
+_async_graph_lock = asyncio.Lock()
+
+
+async def get_async_graph():
+    """Returns the graph compiled with the async checkpointer, for astream/ainvoke."""
+    global _async_graph, _aclose_checkpointer
+    async with _async_graph_lock:
+        if _async_graph is None:
+            saver, _aclose_checkpointer = await create_async_checkpointer(database_url=DATABASE_URL)
+            _async_graph = graph_builder.compile(checkpointer=saver)
+    return _async_graph
+
+
+async def close_async_graph():
+    """Closes the async checkpointer connection / pool. Call on application shutdown."""
+    global _async_graph, _aclose_checkpointer
+    if _aclose_checkpointer is not None:
+        await _aclose_checkpointer()
+    _async_graph = None
+    _aclose_checkpointer = None
@@ -1,5 +1,5 @@
 # main.py
-from graph.main_graph import graph
+from graph.main_graph import get_graph, close_graph, wait_for_memory_saves
 from langchain_core.messages import HumanMessage
 
 # This is your persistent, fixed thread ID
@@ -17,20 +17,30 @@ def run_ai(query, conversation_id):
     # 2. Use .stream() to run the graph and get chunks
     # This loop will run until the agent hits the "respond" node.
     final_response = None
-    for chunk in graph.stream(inputs, config=config):
-        # The 'chunk' is the output of the *last node* that ran
-        # We only care about the final response from the "respond" node
+    for chunk in get_graph().stream(inputs, config=config):
+        # The 'chunk' is the output of the *last node* that ran; the answer is
+        # the last AI message without tool calls (from the planner or fast path)
+        for update in chunk.values():
+            for message in (update or {}).get("messages", []):
+                if message.type == "ai" and not message.tool_calls:
+                    final_response = message.content
         if "respond" in chunk:
-            # The 'respond_and_save_node' prints the message,
-            # so we just break the loop.
             break
 
+    final_response = final_response or "Agent finished, but did not return a response."
+    # Printed, not logged: it is the CLI's output whatever LOG_LEVEL / LOG_FORMAT say
+    print(f"🤖 JARVIS: {final_response}")
+    return final_response
+
 if __name__ == "__main__":
     print("🤖 JARVIS: Online. (Loading persistent memory...)")
     
     while True:
         user_query = input("You: ")
         if user_query.lower() in ["exit", "quit"]:
+            # Let background memory saves finish before the process exits
+            wait_for_memory_saves()
+            close_graph()
             break
         
         # This loop now correctly waits for the agent to finish
@@ -0,0 +1,165 @@
+# memory/consolidation.py
+"""
+Consolidation for long-term memory.
+
+Write-time dedup (MEMORY_DEDUP_THRESHOLD in llama_index_memory) only sees
+memories stored after it was enabled, and only at its own, stricter
+threshold. Consolidation walks every namespace, clusters its memories by
+cosine similarity (newest first, MEMORY_CONSOLIDATE_THRESHOLD), keeps the
+newest memory of each cluster, which supersedes the older ones, and deletes
+the rest in one bulk call per namespace. That removes verbatim and
+near-verbatim repeats; an update to a new value ("I live in Paris" ->
+"I live in Berlin") scores well below 0.9, so memories are also matched on
+the fact slots the user states in them (fact_slots: "my <attribute> is",
+"I live in", "I work at", ...). A memory is superseded once every slot it
+states has been stated again by a newer memory.
+
+Run it once from the command line:
+
+    python -m memory.consolidation --threshold 0.9
+    python -m memory.consolidation --namespace user_42 --dry-run
+
+or periodically inside the API (MEMORY_CONSOLIDATE_INTERVAL seconds). With
+several workers only the one holding the job's lease in the shared store
+runs it; another takes over if that worker stops renewing it.
+"""
+import argparse
+import os
+import re
+import socket
+import threading
+import time
+
+from utils.log import get_logger
+from utils.shared_state import get_shared_store
+
+log = get_logger("memory")
+
+MEMORY_CONSOLIDATE_THRESHOLD = float(os.getenv("MEMORY_CONSOLIDATE_THRESHOLD", 0.9))
+MEMORY_CONSOLIDATE_INTERVAL = float(os.getenv("MEMORY_CONSOLIDATE_INTERVAL", 0))  # 0 = no background job
+MEMORY_CONSOLIDATE_MAX_ROWS = int(os.getenv("MEMORY_CONSOLIDATE_MAX_ROWS", 50_000))  # larger namespaces are skipped
+
+JOBS_NAMESPACE = "jobs"
+
+# Stored memories are exchange summaries; only what the user said states facts
+_USER_PART = re.compile(r'^\s*User:\s*"(.*?)"\s*\|\s*JARVIS:', re.DOTALL)
+# "my favorite color is", "my sister's name is", "my dog is called"
+_MY_ATTRIBUTE = re.compile(r"\bmy ((?:[a-z]+'s )?(?:[a-z]+ ){0,2}?[a-z]+) (?:is|are|was)(?: now)?( called| named)?\b")
+SLOT_PATTERNS = [(re.compile(p), slot) for p, slot in [
+    (r"\bi(?: now| currently)? (?:live|stay|reside) in\b|\bi(?:'ve| have)? (?:just )?moved to\b", "home city"),
+    (r"\bi(?: now| currently)? work (?:at|for)\b", "employer"),
+    (r"\bi(?: now| currently)? work as\b", "job"),
+    (r"\bi(?: am|'m) \d+ years old\b", "age"),
+    (r"\bi(?: am|'m) (?:originally )?from\b", "hometown"),
+    (r"\bcall me\b", "name"),
+]]
+_SLOT_ALIASES = {"home": "home city", "phone number": "phone"}
+
+
+def fact_slots(text: str) -> frozenset:
+    """The attributes a memory states a value for ("home city", "dog's name", ...)."""
+    match = _USER_PART.match(text)
+    statement = " ".join((match.group(1) if match else text).lower().split())
+    slots = set()
+    for attribute, named in _MY_ATTRIBUTE.findall(statement):
+        attribute = attribute.replace("favourite", "favorite")
+        slots.add(_SLOT_ALIASES.get(attribute, attribute) + ("'s name" if named else ""))
+    slots.update(slot for pattern, slot in SLOT_PATTERNS if pattern.search(statement))
+    return frozenset(slots)
+
+
+def slot_updates(texts, created_at, skip=()) -> dict:
+    """
+    Newest first: a memory all of whose fact slots were stated by newer ones
+    is superseded by the newest of them. Returns {dropped row: kept row}.
+    Rows in `skip` (already superseded) neither drop nor supersede.
+    """
+    order = sorted(range(len(texts)), key=lambda row: -(created_at[row] or 0.0))
+    newest, superseded = {}, {}
+    for row in order:
+        if row in skip:
+            continue
+        slots = fact_slots(texts[row])
+        if slots and all(slot in newest for slot in slots):
+            superseded[row] = newest[min(slots)]
+            continue
+        for slot in slots:
+            newest.setdefault(slot, row)
+    return superseded
+
+
+def consolidate_namespace(service, namespace: str, threshold: float = MEMORY_CONSOLIDATE_THRESHOLD,
+                          dry_run: bool = False) -> dict:
+    from memory.hybrid_retrieval import near_duplicates
+
+    rows = service.load_rows(namespace, MEMORY_CONSOLIDATE_MAX_ROWS)
+    if rows is None:
+        log.warning(f"[Consolidation] Skipped '{namespace}': more than {MEMORY_CONSOLIDATE_MAX_ROWS} memories")
+        return {"rows": None, "deleted": 0}
+    ids, texts, vectors, created_at = rows
+    if len(ids) < 2:
+        return {"rows": len(ids), "deleted": 0}
+
+    superseded = near_duplicates(vectors, [c or 0.0 for c in created_at], threshold)
+    superseded.update(slot_updates(texts, created_at, skip=superseded))
+    for dropped, kept in list(superseded.items())[:3]:
+        log.debug(f"[Consolidation] '{texts[dropped]}' superseded by '{texts[kept]}'")
+    if superseded and not dry_run:
+        service.delete(namespace, [ids[row] for row in superseded])
+    return {"rows": len(ids), "deleted": len(superseded)}
+
+
+def consolidate_memories(service=None, namespaces=None, threshold: float = MEMORY_CONSOLIDATE_THRESHOLD,
+                         dry_run: bool = False) -> dict:
+    """Consolidates the given namespaces (default: all); returns totals."""
+    if service is None:
+        from memory.llama_index_memory import memory_service as service
+
+    start = time.perf_counter()
+    stats = {"namespaces": 0, "skipped": 0, "rows_before": service.count(), "deleted": 0}
+    for namespace in namespaces or service.namespaces():
+        result = consolidate_namespace(service, namespace, threshold, dry_run)
+        if result["rows"] is None:
+            stats["skipped"] += 1
+            continue
+        stats["namespaces"] += 1
+        stats["deleted"] += result["deleted"]
+    stats["rows_after"] = service.count()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    log.info(f"[Consolidation] {stats}")
+    return stats
+
+
+def start_consolidation_job(interval: float = MEMORY_CONSOLIDATE_INTERVAL, **kwargs):
+    """Runs consolidate_memories every `interval` seconds on a daemon thread (one worker at a time)."""
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                # The lease outlives one interval, so the worker running the job keeps it
+                if not get_shared_store().acquire(JOBS_NAMESPACE, "memory_consolidation", owner, 2 * interval):
+                    log.debug("[Consolidation] Another worker runs the job.")
+                    continue
+                consolidate_memories(**kwargs)
+            except Exception as e:
+                log.error(f"[Consolidation] Failed: {e}")
+
+    threading.Thread(target=loop, name="memory-consolidation", daemon=True).start()
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=MEMORY_CONSOLIDATE_THRESHOLD)
+    parser.add_argument("--namespace", action="append", help="only these namespaces (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be deleted")
+    args = parser.parse_args()
+    print(consolidate_memories(namespaces=args.namespace, threshold=args.threshold, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
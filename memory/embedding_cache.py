@@ -0,0 +1,221 @@
+# memory/embedding_cache.py
+"""
+Content-hashed LRU cache for embeddings.
+
+Vectors live in one float32 matrix of `capacity` rows. With a `path`, that
+matrix is a memory-mapped file (`<path>.f32`) plus a JSON key index
+(`<path>.json`), so cached embeddings survive restarts. capacity <= 0
+(EMBEDDING_CACHE_SIZE=0) disables the cache: every lookup misses.
+
+The index is only written every `flush_every` puts, so every row also
+carries a tag of its key (`<path>.keys`): on load, index entries whose row
+now holds another key's vector (it was evicted and reused after the last
+flush) are dropped instead of served. One process at a time owns the files
+(`<path>.lock`); another process opening the same path, e.g. a second API
+worker, falls back to an in-memory cache.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+from utils.log import get_logger
+
+log = get_logger("embedding")
+
+
+TAG_BYTES = 16
+
+
+def content_key(text: str, kind: str = "text") -> str:
+    """Stable key for a piece of text ("text" and "query" embed differently)."""
+    return hashlib.sha256(f"{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _key_tag(key: str) -> np.ndarray:
+    return np.frombuffer(hashlib.sha256(key.encode("utf-8")).digest()[:TAG_BYTES], dtype=np.uint8)
+
+
+class EmbeddingCache:
+    def __init__(self, capacity: int = 10000, dim: int = 384, path: str = None, flush_every: int = 100):
+        self.capacity = capacity
+        self.dim = dim
+        self.path = path
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+
+        self._slots = OrderedDict()  # key -> row in self._vectors, oldest first
+        self._free = list(range(capacity - 1, -1, -1))
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self._tags = None
+        self._lock_file = None
+
+        if capacity <= 0:
+            self.path = None
+            self._vectors = None
+            return
+        if path and not self._lock_path():
+            log.warning(f"[EmbeddingCache] {path} is in use by another process, caching in memory only.")
+            self.path = path = None
+        if path:
+            self._vectors = self._open_disk_store()
+            atexit.register(self.flush)
+        else:
+            self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+
+    # -----------------------
+    # Disk persistence
+    # -----------------------
+    def _lock_path(self) -> bool:
+        """Takes the single-writer lock on the cache files; False if another process holds it."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if fcntl is None:
+            return True
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _open_disk_store(self):
+        matrix_path, index_path, tags_path = f"{self.path}.f32", f"{self.path}.json", f"{self.path}.keys"
+        index = None
+        if all(os.path.exists(p) for p in (matrix_path, index_path, tags_path)):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index.get("dim") != self.dim or index.get("capacity") != self.capacity:
+                log.warning("[EmbeddingCache] Cache shape changed, starting empty.")
+                index = None
+
+        mode = "r+" if index is not None else "w+"
+        vectors = np.memmap(matrix_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self._tags = np.memmap(tags_path, dtype=np.uint8, mode=mode, shape=(self.capacity, TAG_BYTES))
+
+        if index is not None:
+            stale = 0
+            for key, slot in index["entries"]:
+                if np.array_equal(self._tags[slot], _key_tag(key)):
+                    self._slots[key] = slot
+                else:
+                    stale += 1
+            used = set(self._slots.values())
+            self._free = [s for s in range(self.capacity - 1, -1, -1) if s not in used]
+            log.info(f"[EmbeddingCache] Loaded {len(self._slots)} cached embeddings from {matrix_path}")
+            if stale:
+                log.warning(f"[EmbeddingCache] Dropped {stale} entries whose row was reused after the last flush")
+        return vectors
+
+    def flush(self):
+        """Writes the memory-mapped vectors and key index to disk."""
+        if not self.path:
+            return
+        with self._lock:
+            self._vectors.flush()
+            self._tags.flush()
+            index = {"dim": self.dim, "capacity": self.capacity, "entries": list(self._slots.items())}
+            tmp_path = f"{self.path}.json.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, f"{self.path}.json")
+            self._dirty = 0
+
+    # -----------------------
+    # Cache operations
+    # -----------------------
+    def get(self, key: str):
+        if self._vectors is None:  # disabled
+            return None
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return self._vectors[slot].tolist()
+
+    def put(self, key: str, embedding):
+        if self._vectors is None:
+            return
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    # Evict the least recently used entry and reuse its row
+                    _, slot = self._slots.popitem(last=False)
+            self._slots[key] = slot
+            self._slots.move_to_end(key)
+            if self._tags is not None:
+                # Untag the row while it holds neither the old vector nor the new one
+                self._tags[slot] = 0
+                self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+                self._tags[slot] = _key_tag(key)
+            else:
+                self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+            self._dirty += 1
+            should_flush = self.path and self._dirty >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def get_or_compute(self, texts, compute_batch, kind: str = "text"):
+        """
+        Returns embeddings for `texts`, calling `compute_batch(list_of_texts)`
+        once for all the misses.
+        """
+        keys = [content_key(t, kind) for t in texts]
+        results = [self.get(k) for k in keys]
+
+        missing = {}
+        for i, vec in enumerate(results):
+            if vec is None:
+                missing.setdefault(texts[i], []).append(i)
+
+        if missing:
+            computed = compute_batch(list(missing))
+            for text, embedding in zip(missing, computed):
+                self.put(content_key(text, kind), embedding)
+                for i in missing[text]:
+                    results[i] = list(embedding)
+        return results
+
+    def close(self):
+        """Flushes and releases the cache files (another process may then open them)."""
+        self.flush()
+        self.path = None  # no more writes to files this process no longer owns
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+            self.hits = self.misses = 0
+            self._dirty = 1
+        self.flush()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
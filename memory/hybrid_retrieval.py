@@ -0,0 +1,443 @@
+# memory/hybrid_retrieval.py
+"""
+Hybrid retrieval for long-term memory, served from an in-process hot cache.
+
+Memories belong to a namespace: the user id when the caller has one, else
+the session id; rows written before namespaces existed are in "global".
+The first query for a namespace loads its rows from the vector store into a
+NamespaceIndex, which then answers every query in-process:
+
+  vector   cosine top-k: one matrix product while the namespace is small, an
+           IVF index (k-means lists over NumPy, MEMORY_ANN_NPROBE lists
+           probed) once it has MEMORY_ANN_MIN_SIZE rows
+  keyword  BM25 over an inverted index of the same rows
+  fusion   cosine and max-normalized BM25 blended (MEMORY_BM25_WEIGHT),
+           then weighted by recency (MEMORY_RECENCY_WEIGHT, half-life
+           MEMORY_RECENCY_HALF_LIFE_DAYS); near-duplicate results
+           (cosine >= MEMORY_RESULT_DEDUP_THRESHOLD) are dropped
+
+Writes go to the vector store and into the loaded index. HotMemoryCache keeps
+at most MEMORY_HOT_MAX_ROWS rows loaded, evicting the least recently used
+namespaces; a namespace larger than that is queried in the vector store.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from utils.log import get_logger
+from utils.metrics import REGISTRY, span
+
+log = get_logger("memory")
+
+MEMORY_GLOBAL_NAMESPACE = "global"
+MEMORY_SEARCH_GLOBAL = os.getenv("MEMORY_SEARCH_GLOBAL", "1") == "1"
+MEMORY_HOT_MAX_ROWS = int(os.getenv("MEMORY_HOT_MAX_ROWS", 200_000))
+MEMORY_ANN_MIN_SIZE = int(os.getenv("MEMORY_ANN_MIN_SIZE", 20_000))
+MEMORY_ANN_NPROBE = int(os.getenv("MEMORY_ANN_NPROBE", 16))
+MEMORY_BM25_WEIGHT = float(os.getenv("MEMORY_BM25_WEIGHT", 0.3))
+MEMORY_RECENCY_WEIGHT = float(os.getenv("MEMORY_RECENCY_WEIGHT", 0.5))
+MEMORY_RECENCY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", 60))
+MEMORY_RESULT_DEDUP_THRESHOLD = float(os.getenv("MEMORY_RESULT_DEDUP_THRESHOLD", 0.95))
+
+LTM_NAMESPACE = "ltm"  # shared-store namespace for per-namespace versions
+
+HOT_ROWS = REGISTRY.gauge("jarvis_ltm_hot_rows", "Long-term memories loaded in the in-process index.")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does did for from has have i in is it its me my of on or our so that the "
+    "their them they this to was we were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class BM25:
+    """Incremental Okapi BM25 over integer document ids 0..n-1."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> ([doc ids], [term frequencies])
+        self._arrays = {}    # term -> (ids, tfs) as arrays, dropped when the term gets a new posting
+        self._lengths = []
+        self._lengths_array = None
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, tokens):
+        doc_id = len(self._lengths)
+        for term, tf in Counter(tokens).items():
+            ids, tfs = self._postings.setdefault(term, ([], []))
+            ids.append(doc_id)
+            tfs.append(tf)
+            self._arrays.pop(term, None)
+        self._lengths.append(len(tokens))
+        self._lengths_array = None
+        self._total_length += len(tokens)
+
+    def _posting(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            ids, tfs = self._postings[term]
+            arrays = self._arrays[term] = (np.array(ids, dtype=np.int64), np.array(tfs, dtype=np.float32))
+        return arrays
+
+    def top(self, tokens, k: int):
+        """(doc ids, scores) of the k best-scoring documents, best first."""
+        n = len(self._lengths)
+        terms = [t for t in set(tokens) if t in self._postings]
+        if not n or not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._lengths, dtype=np.float32)
+        lengths = self._lengths_array
+        norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / n))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            ids, tfs = self._posting(term)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[ids])
+        matched = np.flatnonzero(scores)
+        order = matched[_top(scores[matched], k)]
+        return order, scores[order]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index: rows are grouped under their nearest k-means
+    centroid, and a query only scores the rows of the `nprobe` closest lists.
+    """
+
+    def __init__(self, matrix, n_lists: int = None, iterations: int = 10, sample: int = 20_000, seed: int = 0):
+        n = len(matrix)
+        self.size = n
+        n_lists = n_lists or max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        train = matrix[rng.choice(n, size=min(n, sample), replace=False)]
+        centroids = train[rng.choice(len(train), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            # An empty list restarts on a random training row
+            sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+        self.centroids = centroids
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):  # bounded temporary (rows x lists) score matrix
+            assign[start:start + 8192] = np.argmax(matrix[start:start + 8192] @ centroids.T, axis=1)
+        self.order = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.order], np.arange(n_lists + 1))
+
+    def candidates(self, query, nprobe: int):
+        lists = _top(self.centroids @ query, nprobe)
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+
+class NamespaceIndex:
+    """Every loaded memory of one namespace: text, unit vector, creation time and BM25 postings."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.texts = []
+        self.created_at = np.empty(0, dtype=np.float64)
+        self._matrix = None  # (capacity, dim); rows past len(self) are unused
+        self._bm25 = BM25()
+        self._ivf = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, texts, vectors, created_at=None):
+        if not texts:
+            return
+        vectors = _normalize_rows(vectors)
+        now = time.time()
+        created = np.array([now if c is None else c for c in (created_at or [None] * len(texts))], dtype=np.float64)
+        with self._lock:
+            n = len(self.texts)
+            if self._matrix is None:
+                self._matrix = np.zeros((max(len(texts), 64), vectors.shape[1]), dtype=np.float32)
+            if n + len(texts) > len(self._matrix):
+                grown = np.zeros((max(n + len(texts), 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+                grown[:n] = self._matrix[:n]
+                self._matrix = grown
+            self._matrix[n:n + len(texts)] = vectors
+            self.texts.extend(texts)
+            self.created_at = np.concatenate([self.created_at, created])
+            for text in texts:
+                self._bm25.add(tokenize(text))
+
+    @property
+    def matrix(self):
+        return self._matrix[:len(self.texts)] if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def vector(self, row):
+        return self._matrix[row]
+
+    def max_similarity(self, vectors):
+        """Highest cosine of each vector with any loaded row (-1 when empty)."""
+        vectors = _normalize_rows(vectors)
+        with self._lock:
+            if not self.texts:
+                return np.full(len(vectors), -1.0, dtype=np.float32)
+            if len(self.texts) < MEMORY_ANN_MIN_SIZE:
+                return (vectors @ self.matrix.T).max(axis=1)
+            return np.array([self._vector_top(v, 1)[1][0] for v in vectors], dtype=np.float32)
+
+    def _vector_top(self, query, k: int):
+        n = len(self.texts)
+        if n < MEMORY_ANN_MIN_SIZE:
+            scores = self.matrix @ query
+            top = _top(scores, k)
+            return top, scores[top]
+        # Rebuilt once the rows added since the last build reach half its size
+        if self._ivf is None or n - self._ivf.size > self._ivf.size // 2:
+            with span("memory", "ann_build"):
+                self._ivf = IVFIndex(self.matrix)
+            log.info(f"[Memory] Built IVF index for '{self.namespace}' ({n} rows, {len(self._ivf.centroids)} lists)")
+        rows = np.concatenate([self._ivf.candidates(query, MEMORY_ANN_NPROBE), np.arange(self._ivf.size, n)])
+        scores = self._matrix[rows] @ query
+        top = _top(scores, k)
+        return rows[top], scores[top]
+
+    def search(self, query_text: str, query_vector, top_k: int, now: float = None):
+        """[(score, row, cosine)] of the best fused candidates, best first."""
+        query = _normalize_rows(query_vector)[0]
+        depth = max(4 * top_k, 20)
+        with self._lock:
+            if not self.texts:
+                return []
+            vec_rows, _ = self._vector_top(query, depth)
+            bm25_rows, bm25_scores = self._bm25.top(tokenize(query_text), depth)
+
+            rows = np.union1d(vec_rows, bm25_rows)
+            cosines = self._matrix[rows] @ query
+            keyword = np.zeros(len(rows), dtype=np.float32)
+            if len(bm25_rows):
+                keyword[np.searchsorted(rows, bm25_rows)] = bm25_scores / bm25_scores.max()
+            scores = ((1 - MEMORY_BM25_WEIGHT) * np.maximum(cosines, 0) + MEMORY_BM25_WEIGHT * keyword).astype(np.float64)
+            if MEMORY_RECENCY_WEIGHT:
+                age_days = ((now or time.time()) - self.created_at[rows]) / 86400
+                decay = 0.5 ** (np.maximum(age_days, 0) / MEMORY_RECENCY_HALF_LIFE_DAYS)
+                scores *= 1 - MEMORY_RECENCY_WEIGHT + MEMORY_RECENCY_WEIGHT * decay
+            return [(float(scores[i]), int(rows[i]), float(cosines[i])) for i in np.argsort(-scores)]
+
+
+def near_duplicates(vectors, created_at, threshold: float, block: int = 512):
+    """
+    Greedy clustering, newest first: a row whose cosine with an already kept
+    (newer) row is >= threshold is superseded by it. Returns {dropped row: kept row}.
+    """
+    vectors = _normalize_rows(vectors)
+    order = np.argsort(-np.asarray(created_at, dtype=np.float64), kind="stable")
+    kept, superseded = [], {}
+    kept_matrix = vectors[:0]
+    for start in range(0, len(order), block):
+        rows = order[start:start + block]
+        if kept:
+            sims = vectors[rows] @ kept_matrix.T
+            best, best_at = sims.max(axis=1), sims.argmax(axis=1)
+        new = []
+        for j, row in enumerate(rows.tolist()):
+            if kept and best[j] >= threshold:
+                superseded[row] = kept[best_at[j]]
+                continue
+            if new:
+                sims = vectors[new] @ vectors[row]
+                if sims.max() >= threshold:
+                    superseded[row] = new[int(sims.argmax())]
+                    continue
+            new.append(row)
+        kept.extend(new)
+        kept_matrix = vectors[kept]
+    return superseded
+
+
+def rerank(candidates, top_k: int, dedup_threshold: float = MEMORY_RESULT_DEDUP_THRESHOLD):
+    """
+    candidates: [(score, text, unit vector or None)]. Best first, dropping
+    exact repeats and results too close to one already kept.
+    """
+    kept, kept_vectors, seen = [], [], set()
+    for score, text, vector in sorted(candidates, key=lambda c: -c[0]):
+        key = " ".join(text.lower().split())
+        if key in seen:
+            continue
+        if vector is not None and kept_vectors and float(np.max(np.stack(kept_vectors) @ vector)) >= dedup_threshold:
+            continue
+        seen.add(key)
+        kept.append(text)
+        if vector is not None:
+            kept_vectors.append(vector)
+        if len(kept) == top_k:
+            break
+    return kept
+
+
+class HotMemoryCache:
+    """
+    Namespace -> NamespaceIndex, least recently used first out. `loader(ns)`
+    returns (texts, vectors, created_at) for a namespace, or None when it has
+    more than `max_rows` rows (the caller then queries the vector store).
+    With a shared store, a write by another worker bumps the namespace's
+    version and the next query here reloads it.
+    """
+
+    def __init__(self, loader, max_rows: int = MEMORY_HOT_MAX_ROWS, store=None):
+        self.loader = loader
+        self.max_rows = max_rows
+        self._store = store if store is not None and store.shared else None
+        self._indexes = OrderedDict()  # namespace -> (NamespaceIndex, version)
+        self._versions = {}  # namespace -> writes seen by this process (without a shared store)
+        self._too_large = set()  # only shrink through invalidate()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {"hits": 0, "loads": 0, "reloads": 0, "evictions": 0, "too_large": 0}
+
+    def _version(self, namespace):
+        # A write that lands while its namespace is loading leaves the new index one
+        # version behind, so the next query reloads it
+        if self._store is not None:
+            return self._store.version(LTM_NAMESPACE, namespace)
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def get(self, namespace: str):
+        """The loaded index for a namespace, loading it on a miss; None if it does not fit."""
+        version = self._version(namespace)
+        with self._lock:
+            if namespace in self._too_large:
+                self._stats["too_large"] += 1
+                return None
+            entry = self._indexes.get(namespace)
+            if entry is not None and entry[1] == version:
+                self._indexes.move_to_end(namespace)
+                self._stats["hits"] += 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(namespace, threading.Lock())
+
+        with load_lock:  # one load per namespace; concurrent callers wait for it
+            with self._lock:
+                entry = self._indexes.get(namespace)
+                if entry is not None and entry[1] == version:
+                    return entry[0]
+            with span("memory", "hot_load"):
+                rows = self.loader(namespace)
+            if rows is None:
+                with self._lock:
+                    self._too_large.add(namespace)
+                    self._stats["too_large"] += 1
+                return None
+            index = NamespaceIndex(namespace)
+            index.add(*rows)
+            with self._lock:
+                self._stats["reloads" if entry is not None else "loads"] += 1
+                self._drop(namespace)
+                self._indexes[namespace] = (index, version)
+                self._rows += len(index)
+                self._evict()
+            log.info(f"[Memory] Loaded {len(index)} memories for namespace '{namespace}'")
+            return index
+
+    def add(self, namespace: str, texts, vectors, created_at=None):
+        """Applies a write that already reached the vector store."""
+        version = self._store.set(LTM_NAMESPACE, namespace, time.time()) if self._store is not None else None
+        with self._lock:
+            if version is None:
+                version = self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            entry = self._indexes.get(namespace)
+            # Not loaded: the next query loads it with this write. Missed an earlier
+            # write: left stale, so the next query reloads it.
+            if entry is None or entry[1] != version - 1:
+                return
+            entry[0].add(texts, vectors, created_at)
+            self._indexes[namespace] = (entry[0], version)
+            self._rows += len(texts)
+            self._evict()
+
+    def invalidate(self, namespace: str):
+        """After rows were deleted or rewritten: every worker reloads the namespace."""
+        version = self._store.set(LTM_NAMESPACE, namespace, time.time()) if self._store is not None else None
+        with self._lock:
+            if version is None:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            self._too_large.discard(namespace)
+            self._drop(namespace)
+
+    def _drop(self, namespace):
+        entry = self._indexes.pop(namespace, None)
+        if entry is not None:
+            self._rows -= len(entry[0])
+        HOT_ROWS.set(self._rows)
+
+    def _evict(self):
+        while self._rows > self.max_rows and len(self._indexes) > 1:
+            namespace = next(iter(self._indexes))
+            self._drop(namespace)
+            self._stats["evictions"] += 1
+        HOT_ROWS.set(self._rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, namespaces=len(self._indexes), rows=self._rows)
+
+
+def search_namespaces(cache: HotMemoryCache, namespaces, query: str, query_vector, top_k: int, fallback=None):
+    """
+    Hybrid top-k over several namespaces. `fallback(namespace, query, k)`
+    returns [(text, cosine)] from the vector store, for namespaces too large to load.
+    """
+    candidates = []
+    now = time.time()
+    for namespace in namespaces:
+        index = cache.get(namespace)
+        if index is None:
+            if fallback is not None:
+                candidates.extend((score, text, None) for text, score in fallback(namespace, query, 4 * top_k))
+            continue
+        candidates.extend((score, index.texts[row], index.vector(row))
+                          for score, row, _ in index.search(query, query_vector, top_k, now))
+    return rerank(candidates, top_k)
+
+
+def namespaces_for(namespaces=None):
+    """The caller's namespaces, most specific first, then the global one."""
+    result = [ns for ns in dict.fromkeys(namespaces or ()) if ns]
+    if MEMORY_SEARCH_GLOBAL or not result:
+        if MEMORY_GLOBAL_NAMESPACE not in result:
+            result.append(MEMORY_GLOBAL_NAMESPACE)
+    return result
@@ -1,20 +1,70 @@
 # memory/llama_index_memory.py
 
 import os
-from llama_index.core import Document, VectorStoreIndex, StorageContext
-from llama_index.vector_stores.postgres import PGVectorStore
-from .local_embedding import LocalEmbedding
+import threading
+import time
+import uuid
+import numpy as np
+from llama_index.core import VectorStoreIndex, StorageContext
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import (SimpleVectorStore, MetadataFilters, MetadataFilter, FilterOperator,
+                                            VectorStoreQuery)
+from .local_embedding import embed_texts, embed_queries
+from .hybrid_retrieval import (HotMemoryCache, MEMORY_GLOBAL_NAMESPACE, namespaces_for, near_duplicates,
+                               search_namespaces)
+from utils.metrics import timed
+from utils.log import get_logger
+from utils.shared_state import get_shared_store
+
+log = get_logger("memory")
 
 # -----------------------
-# Load DATABASE_URL
+# Settings
 # -----------------------
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is missing! Must be set in Render environment variables.")
+# "postgres" (pgvector, default) or "simple" (in-process, not persisted)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "postgres").lower()
+MEMORY_TABLE_NAME = "llamaindex_memory"
+MEMORY_DB_POOL_SIZE = int(os.getenv("MEMORY_DB_POOL_SIZE", 5))
+# Cosine at or above which a new memory repeats a stored one and is skipped (0 = off)
+MEMORY_DEDUP_THRESHOLD = float(os.getenv("MEMORY_DEDUP_THRESHOLD", 0.95))
+EMBED_DIM = 384  # all-MiniLM-L6-v2 embedding dimension
+
+
+def _node_id(namespace: str, text: str, created_at: float) -> str:
+    """Deterministic node id, so a retried insert replaces rows instead of duplicating them."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{namespace}\x00{created_at!r}\x00{text}"))
+
+
+def _namespace_filters(namespace: str) -> MetadataFilters:
+    filters = [MetadataFilter(key="namespace", value=namespace)]
+    if namespace == MEMORY_GLOBAL_NAMESPACE:
+        # Rows stored before namespaces existed belong to the global one
+        filters.append(MetadataFilter(key="namespace", value=None, operator=FilterOperator.IS_EMPTY))
+    return MetadataFilters(filters=filters, condition="or")
 
 # -----------------------
 # Embedding model (CPU)
 # -----------------------
+class LocalEmbedding(BaseEmbedding):
+    """
+    llama-index adapter over memory.local_embedding, so the index shares the
+    process-wide model, embedding cache and batcher. The model itself is
+    only loaded when the first embedding is requested.
+    """
+
+    def _get_text_embedding(self, text: str):
+        return embed_texts([text])[0]
+
+    def _get_text_embeddings(self, texts):
+        return embed_texts(texts)
+
+    def _get_query_embedding(self, query: str):
+        return embed_queries([query])[0]
+
+    async def _aget_query_embedding(self, query: str):
+        return self._get_query_embedding(query)
+
 embed_model = LocalEmbedding()
 
 # -----------------------
@@ -23,44 +73,319 @@ embed_model = LocalEmbedding()
 def get_pg_vector_store():
     """
     Initialize PostgreSQL pgvector store using DATABASE_URL directly.
-    Compatible with Render Postgres.
+    Compatible with Render Postgres. The store keeps a pooled SQLAlchemy
+    engine, so build it once and reuse it (see MemoryService).
     """
+    from llama_index.vector_stores.postgres import PGVectorStore
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL is missing! Must be set in Render environment variables.")
+
     return PGVectorStore.from_params(
-        connection_string=DATABASE_URL,
-        table_name="llamaindex_memory",
-        embed_dim=384  # all-MiniLM-L6-v2 embedding dimension
+        connection_string=database_url,
+        table_name=MEMORY_TABLE_NAME,
+        embed_dim=EMBED_DIM,
+        create_engine_kwargs={"pool_size": MEMORY_DB_POOL_SIZE, "pool_pre_ping": True},
     )
 
 # -----------------------
 # Get or create index
 # -----------------------
-def get_index():
+def get_index(vector_store=None, model=None):
+    """Builds a VectorStoreIndex on top of an existing vector store."""
+    vector_store = vector_store if vector_store is not None else get_pg_vector_store()
+    model = model or embed_model
     try:
-        vector_store = get_pg_vector_store()
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        return VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
-
+        if vector_store.stores_text:
+            return VectorStoreIndex.from_vector_store(vector_store, embed_model=model)
     except Exception as e:
-        print(f"[LlamaIndex] Error loading index: {e}")
-        print("[LlamaIndex] Creating new index...")
+        log.warning(f"[LlamaIndex] Error loading index: {e}")
+        log.info("[LlamaIndex] Creating new index...")
 
-        vector_store = get_pg_vector_store()
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        return VectorStoreIndex([], storage_context=storage_context, embed_model=embed_model)
+    # In-process stores keep node text in the index docstore instead
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    return VectorStoreIndex([], storage_context=storage_context, embed_model=model)
+
+# -----------------------
+# Memory service
+# -----------------------
+class MemoryService:
+    """
+    Long-lived owner of the vector store and index for this process.
+
+    The store (and its connection pool) is created lazily on first use and
+    reused by every call. If an operation fails, the store is dropped and
+    rebuilt once before the error is surfaced.
+
+    Every memory is stored with its namespace and creation time in the node
+    metadata; retrieval is served by the hot cache (memory/hybrid_retrieval.py).
+    """
+
+    def __init__(self, backend: str = MEMORY_BACKEND, model=None):
+        self.backend = backend
+        self.embed_model = model or embed_model
+        self._vector_store = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduplicated": 0, "deleted": 0}
+        self.hot_cache = HotMemoryCache(self._load_namespace, store=get_shared_store())
+
+    def _create_vector_store(self):
+        if self.backend == "simple":
+            return SimpleVectorStore()
+        return get_pg_vector_store()
+
+    def get_index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    log.info(f"[Memory] Initializing {self.backend} vector store...")
+                    self._vector_store = self._create_vector_store()
+                    self._index = get_index(self._vector_store, self.embed_model)
+        return self._index
+
+    def health_check(self) -> bool:
+        """Returns True if the backing store answers a trivial query."""
+        try:
+            self.get_index()
+            engine = getattr(self._vector_store, "client", None)
+            if engine is not None and hasattr(engine, "connect"):
+                from sqlalchemy import text
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            log.warning(f"[Memory] Health check failed: {e}")
+            return False
+
+    def reconnect(self):
+        """Drops the current store/index; the next call rebuilds them."""
+        with self._lock:
+            engine = getattr(self._vector_store, "client", None)
+            if engine is not None and hasattr(engine, "dispose"):
+                engine.dispose()
+            self._vector_store = None
+            self._index = None
+
+    def _with_reconnect(self, operation, retry=None):
+        """Runs operation(index); on failure reconnects and runs `retry` (default: operation) once."""
+        try:
+            return operation(self.get_index())
+        except Exception as e:
+            log.warning(f"[Memory] Operation failed ({e}), reconnecting...")
+            self.reconnect()
+            return (retry or operation)(self.get_index())
+
+    @timed("vector_store", "store")
+    def store(self, summary: str, namespace: str = None):
+        self.store_many([summary], namespace=namespace)
+
+    @timed("vector_store", "store_many")
+    def store_many(self, texts, embeddings=None, namespace: str = None, created_at=None, replace: bool = False):
+        """
+        Bulk insert; precomputed embeddings skip the model entirely. Texts
+        within MEMORY_DEDUP_THRESHOLD cosine of a memory already in the
+        namespace (or earlier in the batch) are skipped. Returns the number stored.
+
+        Node ids derive from (namespace, created_at, text): a retry with the
+        same created_at and replace=True first deletes whatever an earlier,
+        failed attempt managed to insert.
+        """
+        if not texts:
+            return 0
+        namespace = namespace or MEMORY_GLOBAL_NAMESPACE
+        if embeddings is None or any(e is None for e in embeddings):
+            # Embedded here (not by the index) so the hot cache gets the vectors too
+            computed = iter(embed_texts([t for t, e in zip(texts, embeddings or [None] * len(texts)) if e is None]))
+            embeddings = [next(computed) if e is None else e for e in (embeddings or [None] * len(texts))]
+        now = time.time()
+        created_at = created_at or [now] * len(texts)
+
+        keep = self._new_memories(namespace, embeddings, created_at)
+        if len(keep) < len(texts):
+            self._count("deduplicated", len(texts) - len(keep))
+            texts = [texts[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+            created_at = [created_at[i] for i in keep]
+            if not texts:
+                return 0
+        nodes = [
+            TextNode(id_=_node_id(namespace, t, c), text=t, embedding=list(e),
+                     metadata={"namespace": namespace, "created_at": c},
+                     excluded_embed_metadata_keys=["namespace", "created_at"],
+                     excluded_llm_metadata_keys=["namespace", "created_at"])
+            for t, e, c in zip(texts, embeddings, created_at)
+        ]
+
+        def _replace(index):
+            # The failed attempt may have inserted some of the rows (ids not found are ignored)
+            self._vector_store.delete_nodes([n.node_id for n in nodes])
+            index.insert_nodes(nodes)
+
+        self._with_reconnect(_replace if replace else lambda index: index.insert_nodes(nodes), retry=_replace)
+        self.hot_cache.add(namespace, list(texts), embeddings, created_at)
+        self._count("stored", len(texts))
+        return len(texts)
+
+    def _new_memories(self, namespace, embeddings, created_at):
+        """Positions of the embeddings that are not near-duplicates of stored or batch memories."""
+        if MEMORY_DEDUP_THRESHOLD <= 0:
+            return list(range(len(embeddings)))
+        # The namespace's hot index doubles as the duplicate check; namespaces too large
+        # for it are checked with a filtered top-1 query in the store
+        index = self.hot_cache.get(namespace)
+        if index is not None:
+            similarity = index.max_similarity(embeddings)
+        else:
+            similarity = self._store_similarity(namespace, embeddings)
+        repeats = near_duplicates(embeddings, created_at, MEMORY_DEDUP_THRESHOLD) if len(embeddings) > 1 else {}
+        return [i for i in range(len(embeddings))
+                if i not in repeats and similarity[i] < MEMORY_DEDUP_THRESHOLD]
+
+    def _store_similarity(self, namespace, embeddings):
+        """Highest cosine of each embedding to a stored memory of the namespace (top-1 query per embedding)."""
+        filters = _namespace_filters(namespace)
+
+        def _query(_):
+            best = []
+            for embedding in embeddings:
+                result = self._vector_store.query(
+                    VectorStoreQuery(query_embedding=list(embedding), similarity_top_k=1, filters=filters))
+                best.append(max(result.similarities or [-1.0]))
+            return np.asarray(best, dtype=np.float32)
+        return self._with_reconnect(_query)
+
+    @timed("vector_store", "delete")
+    def delete(self, namespace: str, node_ids):
+        """Bulk delete by node id; every worker reloads the namespace afterwards."""
+        if not node_ids:
+            return
+        node_ids = list(node_ids)
+        self._with_reconnect(lambda index: index.delete_nodes(node_ids, delete_from_docstore=True))
+        self.hot_cache.invalidate(namespace)
+        self._count("deleted", len(node_ids))
+
+    @timed("vector_store", "retrieve")
+    def retrieve(self, query: str, top_k=5, namespaces=None):
+        """Hybrid top-k over the given namespaces (and the global one, see namespaces_for)."""
+        query_vector = embed_queries([query])[0]
+        return search_namespaces(self.hot_cache, namespaces_for(namespaces), query, query_vector, top_k,
+                                 fallback=self._retrieve_from_store)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, hot_cache=self.hot_cache.stats())
+
+    # -----------------------
+    # Reading rows back
+    # -----------------------
+    @staticmethod
+    def _in_namespace(metadata, namespace):
+        found = (metadata or {}).get("namespace")
+        # Rows stored before namespaces existed belong to the global one
+        return found == namespace or (found is None and namespace == MEMORY_GLOBAL_NAMESPACE)
+
+    def namespaces(self):
+        """Every namespace with at least one memory."""
+        index = self.get_index()
+        if self.backend == "simple":
+            return sorted({(n.metadata or {}).get("namespace") or MEMORY_GLOBAL_NAMESPACE
+                           for n in index.docstore.docs.values()})
+
+        def _namespaces(_):
+            from sqlalchemy import text
+            with self._pg_connect() as conn:
+                rows = conn.execute(text(f"SELECT DISTINCT metadata_->>'namespace' FROM {self._pg_table()}"))
+                return sorted({r[0] or MEMORY_GLOBAL_NAMESPACE for r in rows})
+        return self._with_reconnect(_namespaces)
+
+    def count(self) -> int:
+        """Rows in the memory table."""
+        index = self.get_index()
+        if self.backend == "simple":
+            return len(index.docstore.docs)
+
+        def _count(_):
+            from sqlalchemy import text
+            with self._pg_connect() as conn:
+                return conn.execute(text(f"SELECT count(*) FROM {self._pg_table()}")).scalar()
+        return self._with_reconnect(_count)
+
+    def load_rows(self, namespace: str, max_rows: int):
+        """(node ids, texts, vectors, created_at) of a namespace, or None if it has more than max_rows."""
+        index = self.get_index()
+        if self.backend == "simple":
+            embeddings = self._vector_store.data.embedding_dict
+            nodes = [n for n in index.docstore.docs.values() if self._in_namespace(n.metadata, namespace)]
+            if len(nodes) > max_rows:
+                return None
+            return ([n.node_id for n in nodes],
+                    [n.get_content() for n in nodes],
+                    [embeddings[n.node_id] for n in nodes],
+                    [n.metadata.get("created_at") for n in nodes])
+        return self._with_reconnect(lambda _: self._load_rows_pg(namespace, max_rows))
+
+    def _load_namespace(self, namespace: str):
+        """Hot cache loader: (texts, vectors, created_at), or None if it exceeds the cache."""
+        rows = self.load_rows(namespace, self.hot_cache.max_rows)
+        return rows[1:] if rows is not None else None
+
+    def _pg_table(self):
+        return f'"{self._vector_store.schema_name}"."data_{MEMORY_TABLE_NAME}"'
+
+    def _pg_connect(self):
+        self._vector_store._initialize()  # PGVectorStore connects lazily; no-op once connected
+        return self._vector_store.client.connect()
+
+    def _load_rows_pg(self, namespace: str, max_rows: int):
+        from sqlalchemy import text
+
+        where = "metadata_->>'namespace' = :namespace"
+        if namespace == MEMORY_GLOBAL_NAMESPACE:
+            where = f"({where} OR metadata_->>'namespace' IS NULL)"
+        with self._pg_connect() as conn:
+            count = conn.execute(text(f"SELECT count(*) FROM {self._pg_table()} WHERE {where}"),
+                                 {"namespace": namespace}).scalar()
+            if count > max_rows:
+                return None
+            rows = conn.execute(
+                text(f"SELECT node_id, text, embedding::real[], (metadata_->>'created_at')::float "
+                     f"FROM {self._pg_table()} WHERE {where}"),
+                {"namespace": namespace},
+            ).fetchall()
+        return ([r[0] for r in rows],
+                [r[1] for r in rows],
+                [r[2] for r in rows],
+                [r[3] for r in rows])
+
+    def _retrieve_from_store(self, namespace: str, query: str, top_k: int):
+        """Plain vector top-k in the store, for a namespace too large for the hot cache."""
+        retriever_filters = _namespace_filters(namespace)
+
+        def _retrieve(index):
+            retriever = index.as_retriever(similarity_top_k=top_k, filters=retriever_filters)
+            return [(d.text, d.score or 0.0) for d in retriever.retrieve(query)]
+        return self._with_reconnect(_retrieve)
+
+
+memory_service = MemoryService()
 
 # -----------------------
 # Store memory
 # -----------------------
-def store_memory(summary: str):
-    index = get_index()
-    doc = Document(text=summary)
-    index.insert(doc)
+def store_memory(summary: str, namespace: str = None):
+    memory_service.store(summary, namespace)
+
+def store_memories(texts, embeddings=None, namespace: str = None, created_at=None, replace: bool = False):
+    return memory_service.store_many(texts, embeddings, namespace, created_at, replace)
 
 # -----------------------
 # Retrieve memory
 # -----------------------
-def retrieve_relevant_memory(query: str, top_k=5):
-    index = get_index()
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    docs = retriever.retrieve(query)
-    return [d.text for d in docs]
+def retrieve_relevant_memory(query: str, top_k=5, namespaces=None):
+    return memory_service.retrieve(query, top_k=top_k, namespaces=namespaces)
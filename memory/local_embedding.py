@@ -1,38 +1,179 @@
 # In JARVIS-agentic-ai/memory/local_embedding.py
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.embeddings import BaseEmbedding
-from pydantic import PrivateAttr
-
-# Create one global model instance
-_embed_model_instance = HuggingFaceEmbedding(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    device="cpu"
+import os
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .embedding_cache import EmbeddingCache, content_key
+from utils.metrics import timed
+from utils.log import get_logger
+
+log = get_logger("embedding")
+
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", 32))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 5))
+
+# One global model instance, loaded on first use (importing torch and
+# sentence-transformers takes seconds, so it is kept off the import path).
+_embed_model_instance = None
+_embed_model_lock = threading.Lock()
+
+def get_embed_model():
+    """Returns the shared HuggingFace model, loading it on first call."""
+    global _embed_model_instance
+    if _embed_model_instance is None:
+        with _embed_model_lock:
+            if _embed_model_instance is None:
+                from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+                log.info("Loading local embedding model: sentence-transformers/all-MiniLM-L6-v2")
+                _embed_model_instance = HuggingFaceEmbedding(
+                    model_name="sentence-transformers/all-MiniLM-L6-v2",
+                    device="cpu",
+                    embed_batch_size=EMBED_BATCH_MAX_SIZE,
+                )
+    return _embed_model_instance
+
+def is_embed_model_loaded() -> bool:
+    return _embed_model_instance is not None
+
+def _embed_text_batch(texts):
+    return get_embed_model().get_text_embedding_batch(texts)
+
+def _embed_query_batch(queries):
+    model = get_embed_model()
+    return [model.get_query_embedding(q) for q in queries]
+
+# Content-hashed LRU cache in front of the model.
+# Set EMBEDDING_CACHE_PATH to keep it on disk across restarts.
+embedding_cache = EmbeddingCache(
+    capacity=int(os.getenv("EMBEDDING_CACHE_SIZE", 10000)),
+    dim=384,
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None,
 )
-print("Loading local embedding model: sentence-transformers/all-MiniLM-L6-v2")
 
-class LocalEmbedding(BaseEmbedding):
-    _embed_model: HuggingFaceEmbedding = PrivateAttr()
+class EmbeddingBatcher:
+    """
+    Collects embedding requests from many threads/coroutines and runs them
+    through the model as one batch.
+
+    A worker thread waits for the first request, then keeps collecting until
+    `max_batch_size` texts are queued or `max_wait_ms` has passed, and makes a
+    single `compute_batch` call for all of them.
+    """
+
+    def __init__(self, compute_batch, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.compute_batch = compute_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
 
-    def __init__(self):
-        super().__init__()
-        self._embed_model = _embed_model_instance # Use the global instance
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
 
-    # ... (rest of the class methods) ...
-    def _get_text_embedding(self, text: str):
-        return self._embed_model.get_text_embedding(text)
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
 
-    def _get_query_embedding(self, query: str):
-        return self._embed_model.get_query_embedding(query)
+    def _run(self):
+        while True:
+            # Drop requests whose caller already gave up; the rest can no
+            # longer be cancelled once marked running.
+            batch = [(t, f) for t, f in self._collect_batch() if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.compute_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
 
-    async def _aget_query_embedding(self, query: str):
-        return self._get_query_embedding(query)
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str):
+        """Blocking: returns the embedding for one text."""
+        return self.submit(text).result()
+
+    def embed_many(self, texts):
+        """Blocking: submits every text first so they can share a batch."""
+        futures = [self.submit(t) for t in texts]
+        return [f.result() for f in futures]
+
+    async def aembed(self, text: str):
+        """Awaitable: does not block the event loop while the batch runs."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+embedding_batcher = EmbeddingBatcher(
+    _embed_text_batch,
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+)
+
+def embed_texts(texts):
+    """Cached, micro-batched text embeddings (used by LocalEmbedding)."""
+    return embedding_cache.get_or_compute(texts, embedding_batcher.embed_many)
+
+def embed_queries(queries):
+    """Cached query embeddings (used by LocalEmbedding)."""
+    return embedding_cache.get_or_compute(queries, _embed_query_batch, kind="query")
 
 # Add this function for the graph to use
+@timed("embedding", "get_embedding")
 def get_embedding(text: str):
-    """Get embedding for text using the global model."""
+    """Get embedding for text using the global model (cached, micro-batched)."""
     if isinstance(text, str):
-        return _embed_model_instance.get_text_embedding(text)
+        return embedding_cache.get_or_compute([text], embedding_batcher.embed_many)[0]
     elif isinstance(text, list):
-        return _embed_model_instance.get_text_embeddings(text)
+        return embedding_cache.get_or_compute(text, _embed_text_batch)
     else:
-        raise TypeError("Input must be a string or a list of strings.")
\ No newline at end of file
+        raise TypeError("Input must be a string or a list of strings.")
+
+@timed("embedding", "aget_embedding")
+async def aget_embedding(text: str):
+    """Async get_embedding: cache hit returns immediately, misses join a batch."""
+    cached = embedding_cache.get(content_key(text))
+    if cached is not None:
+        return cached
+    embedding = await embedding_batcher.aembed(text)
+    embedding_cache.put(content_key(text), embedding)
+    return list(embedding)
+
+def get_embedding_cache_stats():
+    """Hit/miss counters for the embedding cache."""
+    return embedding_cache.stats()
@@ -1,12 +1,196 @@
 #short_term_memory.py
+import functools
+import os
+import threading
+
+import numpy as np
+
+from utils.config import STM_CONDENSE_THRESHOLD
+from utils.log import get_logger
+from utils.shared_state import get_shared_store
+
+log = get_logger("memory")
+
+STM_CAPACITY = int(os.getenv("STM_CAPACITY", 256))
+DEFAULT_SESSION = "default"
+
+
+class ShortTermMemory:
+    """
+    Per-session fact store. Embeddings are kept L2-normalised in one
+    contiguous float32 matrix, so a top-k cosine search is a single
+    matrix-vector product. Oldest facts are evicted once `capacity` is hit.
+
+    Every `condense_threshold` new facts are joined into one summary and
+    handed to `condense_fn` (long-term memory by default).
+    """
+
+    def __init__(self, capacity: int = STM_CAPACITY, condense_threshold: int = STM_CONDENSE_THRESHOLD,
+                 condense_fn=None):
+        self.capacity = capacity
+        self.condense_threshold = condense_threshold
+        self.condense_fn = condense_fn
+        self._matrix = None            # (capacity, dim), allocated on first add
+        self._facts = [None] * capacity
+        self._index = {}               # fact -> row
+        self._next = 0                 # ring-buffer write position
+        self._size = 0
+        self._pending = []             # facts not yet condensed into LTM
+        self._lock = threading.Lock()
+        self.version = 0               # shared-store version this copy reflects
+
+    def __len__(self):
+        return self._size
+
+    def add(self, fact: str, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+            row = self._index.get(fact)
+            if row is None:
+                row = self._next
+                evicted = self._facts[row]
+                if evicted is not None:
+                    del self._index[evicted]
+                self._next = (self._next + 1) % self.capacity
+                self._size = min(self._size + 1, self.capacity)
+                self._facts[row] = fact
+                self._index[fact] = row
+                self._pending.append(fact)
+            self._matrix[row] = vector
+
+            to_condense = None
+            if self.condense_threshold and len(self._pending) >= self.condense_threshold:
+                to_condense, self._pending = self._pending, []
+
+        if to_condense:
+            self._condense(to_condense)
+
+    def search(self, query_embedding, top_k: int = 3):
+        """Returns [(fact, cosine_similarity)] for the top_k closest facts."""
+        with self._lock:
+            if self._size == 0:
+                return []
+            query = np.asarray(query_embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+
+            scores = self._matrix[:self._size] @ query
+            k = min(top_k, self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._facts[i], float(scores[i])) for i in top]
+
+    def facts(self):
+        """Facts from oldest to newest."""
+        with self._lock:
+            if self._size < self.capacity:
+                return self._facts[:self._size]
+            return self._facts[self._next:] + self._facts[:self._next]
+
+    def snapshot(self) -> dict:
+        """Facts (oldest first), their vectors and the pending facts, for the shared store."""
+        with self._lock:
+            if self._size < self.capacity:
+                rows = list(range(self._size))
+            else:
+                rows = list(range(self._next, self.capacity)) + list(range(self._next))
+            return {
+                "facts": [self._facts[r] for r in rows],
+                "vectors": self._matrix[rows].copy() if rows else None,
+                "pending": list(self._pending),
+            }
+
+    def restore(self, state: dict):
+        """Replaces the contents with a snapshot (no condensation is triggered)."""
+        facts = state["facts"][-self.capacity:]
+        with self._lock:
+            self._facts = [None] * self.capacity
+            self._facts[:len(facts)] = facts
+            self._index = {fact: row for row, fact in enumerate(facts)}
+            self._size = len(facts)
+            self._next = len(facts) % self.capacity
+            self._pending = list(state["pending"])
+            if facts:
+                vectors = state["vectors"][-self.capacity:]
+                self._matrix = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+                self._matrix[:len(facts)] = vectors
+
+    def _condense(self, facts):
+        summary = "; ".join(facts)
+        condense = self.condense_fn or _store_in_long_term_memory
+        try:
+            condense(summary)
+            log.info(f"[STM] Condensed {len(facts)} facts into long-term memory.")
+        except Exception as e:
+            log.warning(f"[STM] Condensation failed: {e}")
+
+
+def _store_in_long_term_memory(summary: str, namespace: str = None):
+    # Imported lazily: llama-index/pgvector are slow to load
+    from memory.llama_index_memory import store_memory
+    store_memory(summary, namespace)
+
+
+# session_id -> ShortTermMemory. With a shared store (several workers) this is
+# a hot copy per session, reloaded when another worker has written a newer one.
 short_term_memory = {}
+_sessions_lock = threading.Lock()
+STM_NAMESPACE = "stm"
+
+
+def get_session_stm(session_id: str = DEFAULT_SESSION) -> ShortTermMemory:
+    stm = short_term_memory.get(session_id)
+    if stm is None:
+        with _sessions_lock:
+            # Condensed facts go to the session's long-term memory namespace
+            stm = short_term_memory.setdefault(session_id, ShortTermMemory(
+                condense_fn=functools.partial(_store_in_long_term_memory, namespace=session_id)))
+    store = get_shared_store()
+    if store.shared:
+        version = store.version(STM_NAMESPACE, session_id)
+        if version != stm.version:
+            state = store.get(STM_NAMESPACE, session_id)
+            if state is not None:
+                stm.restore(state)
+            stm.version = version
+    return stm
 
-def get_short_term_memory():
-    return short_term_memory
+def get_short_term_memory(session_id: str = DEFAULT_SESSION):
+    return get_session_stm(session_id)
 
-def update_short_term_memory(fact, embedding):
-    short_term_memory[fact] = embedding
+def update_short_term_memory(fact, embedding, session_id: str = DEFAULT_SESSION):
+    stm = get_session_stm(session_id)
+    stm.add(fact, embedding)
+    store = get_shared_store()
+    if store.shared:
+        # Last writer wins if two workers update one session at the same moment;
+        # session affinity (serve.py) keeps a session on one worker.
+        stm.version = store.set(STM_NAMESPACE, session_id, stm.snapshot())
 
-def get_short_term_memory_facts():
+def get_short_term_memory_facts(session_id: str = DEFAULT_SESSION):
     """Returns a list of facts stored in short-term memory."""
-    return list(short_term_memory.keys())
+    return get_session_stm(session_id).facts()
+
+def _existing_stm(session_id):
+    if get_shared_store().shared:
+        return get_session_stm(session_id)
+    return short_term_memory.get(session_id)
+
+def get_short_term_memory_size(session_id: str = DEFAULT_SESSION) -> int:
+    stm = _existing_stm(session_id)
+    return len(stm) if stm is not None else 0
+
+def search_short_term_memory(query_embedding, session_id: str = DEFAULT_SESSION, top_k: int = 3):
+    """Top-k facts for this session; no LLM call, at most one shared-store read."""
+    stm = _existing_stm(session_id)
+    if stm is None:
+        return []
+    return stm.search(query_embedding, top_k=top_k)
@@ -0,0 +1,263 @@
+# memory/write_behind.py
+"""
+Write-behind pipeline for memory persistence.
+
+Requests only enqueue work; a single worker drains the bounded queue in
+batches, embeds every pending text with one batched call, applies the STM
+updates and writes the long-term facts with one bulk insert per namespace.
+
+Failures are isolated: one bad STM update or namespace write does not drop
+the rest of the batch. Long-term facts whose write fails (the user has
+already been told they were saved) are re-queued after a backoff, up to
+MEMORY_QUEUE_MAX_RETRIES times, before they are given up.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from utils.log import get_logger
+
+log = get_logger("memory")
+
+STM_EXCHANGE = "stm_exchange"
+LTM_FACT = "ltm_fact"
+
+MEMORY_QUEUE_MAX_SIZE = int(os.getenv("MEMORY_QUEUE_MAX_SIZE", 1000))
+MEMORY_QUEUE_BATCH_SIZE = int(os.getenv("MEMORY_QUEUE_BATCH_SIZE", 32))
+MEMORY_QUEUE_MAX_WAIT_MS = float(os.getenv("MEMORY_QUEUE_MAX_WAIT_MS", 50))
+MEMORY_QUEUE_PUT_TIMEOUT = float(os.getenv("MEMORY_QUEUE_PUT_TIMEOUT", 0.05))
+MEMORY_QUEUE_MAX_RETRIES = int(os.getenv("MEMORY_QUEUE_MAX_RETRIES", 3))
+MEMORY_QUEUE_RETRY_SECONDS = float(os.getenv("MEMORY_QUEUE_RETRY_SECONDS", 1.0))  # doubles per attempt
+
+
+class MemoryWriteQueue:
+    def __init__(self, max_size: int = MEMORY_QUEUE_MAX_SIZE, batch_size: int = MEMORY_QUEUE_BATCH_SIZE,
+                 max_wait_ms: float = MEMORY_QUEUE_MAX_WAIT_MS, put_timeout: float = MEMORY_QUEUE_PUT_TIMEOUT,
+                 max_retries: int = MEMORY_QUEUE_MAX_RETRIES, retry_seconds: float = MEMORY_QUEUE_RETRY_SECONDS):
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue(maxsize=max_size)
+        self._retrying = 0  # facts waiting to be re-queued
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "rejected": 0,        # queue full after put_timeout
+            "failed": 0,          # dropped: STM updates, and facts out of retries
+            "retried": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "blocked_seconds": 0.0,  # time producers spent waiting on a full queue
+        }
+        atexit.register(self.flush, 10)
+
+    # -----------------------
+    # Producer side
+    # -----------------------
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+                    self._worker.start()
+
+    # Items: (kind, text, session id | namespace, user query | created_at, attempt)
+    def _put(self, item) -> bool:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: wait briefly for the worker, then give up
+            start = time.perf_counter()
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                self._count("rejected")
+                return False
+            finally:
+                self._count("blocked_seconds", time.perf_counter() - start)
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+        return True
+
+    def submit_exchange(self, user_query: str, summary: str, session_id: str) -> bool:
+        """Queue a finished turn for classification and STM. False if the queue is full."""
+        return self._put((STM_EXCHANGE, summary, session_id, user_query, 0))
+
+    def submit_fact(self, fact: str, namespace: str = None) -> bool:
+        """Queue a fact for long-term memory (in `namespace`). False if the queue is full."""
+        # created_at is fixed here, so a retried write reuses the same node ids
+        return self._put((LTM_FACT, fact, namespace, time.time(), 0))
+
+    def flush(self, timeout=None) -> bool:
+        """Waits until everything queued so far has been written."""
+        if self._worker is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._retrying:
+            if deadline is not None and time.monotonic() >= deadline:
+                log.warning(f"[Memory queue] Flush timed out with "
+                            f"{self._queue.unfinished_tasks + self._retrying} items pending.")
+                return False
+            time.sleep(0.01)
+        return True
+
+    # -----------------------
+    # Worker side
+    # -----------------------
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                failed, deferred = self._process(batch)
+            except Exception as e:  # a bug in _process itself; items are isolated below
+                log.error(f"[Memory queue] Batch of {len(batch)} failed: {e}")
+                failed, deferred = len(batch), 0
+            finally:
+                self._count("batches")
+                for _ in batch:
+                    self._queue.task_done()
+            self._count("processed", len(batch) - failed - deferred)
+            self._count("failed", failed)
+
+    def _embed(self, texts):
+        """One batched call; if it fails, item by item (None for the texts that still fail)."""
+        from memory.local_embedding import get_embedding
+
+        try:
+            return get_embedding(texts)
+        except Exception as e:
+            log.warning(f"[Memory queue] Batched embedding of {len(texts)} texts failed ({e}), embedding one by one.")
+        embeddings = []
+        for text in texts:
+            try:
+                embeddings.append(get_embedding([text])[0])
+            except Exception as e:
+                log.error(f"[Memory queue] Embedding failed: {e}")
+                embeddings.append(None)
+        return embeddings
+
+    def _retry_later(self, items):
+        """Re-queues failed facts after a backoff; returns (given up, re-queued)."""
+        given_up = 0
+        for item in items:
+            kind, text, namespace, created_at, attempt = item
+            if attempt >= self.max_retries:
+                log.error(f"[LTM] Giving up on fact after {attempt + 1} attempts: {text}")
+                given_up += 1
+                continue
+            with self._stats_lock:
+                self._retrying += 1
+                self._stats["retried"] += 1
+            timer = threading.Timer(self.retry_seconds * 2 ** attempt, self._requeue,
+                                    ((kind, text, namespace, created_at, attempt + 1),))
+            timer.daemon = True
+            timer.start()
+        return given_up, len(items) - given_up
+
+    def _requeue(self, item):
+        # Blocking put: a fact the user was told is saved is not dropped for a full queue
+        self._ensure_worker()
+        self._queue.put(item)
+        with self._stats_lock:
+            self._retrying -= 1
+
+    def _process(self, batch):
+        """Applies a batch; returns (items dropped, facts re-queued for a retry)."""
+        # Imported here so producers never pay for the model/vector store imports
+        from memory.short_term_memory import update_short_term_memory
+        from reasoning.memory_classifier import classify_by_rules, classify_memory
+
+        # Rules are free; only exchanges they don't settle need classifying
+        pending = []
+        for item in batch:
+            kind, text, session_id, user_query, _ = item
+            if kind == STM_EXCHANGE:
+                decision = classify_by_rules(user_query)
+                if decision == "IGNORE":
+                    log.info("[STM] Ignored trivial exchange (rules).")
+                    continue
+                pending.append((item, decision))
+            else:
+                pending.append((item, "SAVE"))
+        if not pending:
+            return 0, 0
+
+        # One batched embedding call for everything in this batch
+        embeddings = self._embed([item[1] for item, _ in pending])
+
+        failed, retry = 0, []
+        ltm = {}  # namespace -> [(item, embedding)]
+        for (item, decision), embedding in zip(pending, embeddings):
+            kind, text, session_id, user_query, _ = item
+            if kind == LTM_FACT:
+                if embedding is None:
+                    retry.append(item)
+                else:
+                    ltm.setdefault(session_id, []).append((item, embedding))  # a fact's namespace
+                continue
+            try:
+                if embedding is None:
+                    raise ValueError("no embedding")
+                if decision is None:
+                    decision, confidence, source = classify_memory(user_query, text, embedding)
+                    if decision != "SAVE":
+                        log.info(f"[STM] Ignored trivial exchange ({source}, {confidence:.2f}).")
+                        continue
+                update_short_term_memory(text, embedding, session_id)
+                log.info(f"[STM] Saved: {text}")
+            except Exception as e:
+                log.error(f"[STM] Update for session {session_id} failed: {e}")
+                failed += 1
+
+        if ltm:
+            from memory.llama_index_memory import store_memories
+            for namespace, facts in ltm.items():
+                try:
+                    store_memories([item[1] for item, _ in facts], [e for _, e in facts], namespace,
+                                   created_at=[item[3] for item, _ in facts],
+                                   replace=any(item[4] for item, _ in facts))
+                    log.info(f"[LTM] Stored {len(facts)} facts in namespace {namespace}.")
+                except Exception as e:
+                    log.error(f"[LTM] Write of {len(facts)} facts to namespace {namespace} failed: {e}")
+                    retry.extend(item for item, _ in facts)
+        given_up, deferred = self._retry_later(retry)
+        return failed + given_up, deferred
+
+    # -----------------------
+    # Metrics
+    # -----------------------
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["capacity"] = self._queue.maxsize
+        return stats
+
+
+memory_write_queue = MemoryWriteQueue()
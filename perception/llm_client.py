@@ -0,0 +1,377 @@
+# perception/llm_client.py
+"""
+Resilient HTTP client for the LLM provider, shared by the sync and async
+request paths.
+
+- Pooled connections: one requests.Session (sync) and one httpx.AsyncClient
+  (async, per event loop), both with connect/read timeouts.
+- Retries with exponential backoff and full jitter on connection errors,
+  timeouts, 429 and 5xx; a Retry-After header is honoured.
+- A token-bucket rate limiter shared by every thread and event loop in the
+  process, so bursts are smoothed before they reach the provider's limit.
+- A circuit breaker: after LLM_CIRCUIT_FAILURES consecutive failed attempts
+  calls fail fast with CircuitOpenError for LLM_CIRCUIT_RESET_SECONDS, then a
+  single trial call decides whether to close it again.
+
+Every call ends in a recorded success or failure, including calls that are
+cancelled or hit an unexpected client error (wrapped in LLMError), so a
+half-open trial can never be left pending.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import (
+    PERPLEXITY_API_KEY,
+    PERPLEXITY_API_URL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_RATE_LIMIT_RPS,
+    LLM_RATE_LIMIT_BURST,
+    LLM_CIRCUIT_FAILURES,
+    LLM_CIRCUIT_RESET_SECONDS,
+)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The LLM call failed after all retries."""
+
+
+class CircuitOpenError(LLMError):
+    """Upstream is considered down; the call was not attempted."""
+
+
+class TokenBucket:
+    """`rate` requests per second with bursts of up to `burst`; rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token; returns how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """Raises CircuitOpenError unless a call may go upstream now."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial:
+                raise CircuitOpenError("LLM upstream unavailable (circuit open)")
+            self._trial = True  # half-open: let exactly one call through
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold > 0:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+def _retry_after(headers) -> float:
+    try:
+        return max(0.0, float(headers.get("Retry-After", "")))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LLMClient:
+    def __init__(self, url: str = PERPLEXITY_API_URL, api_key: str = PERPLEXITY_API_KEY,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX, max_connections: int = LLM_MAX_CONNECTIONS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, rate_limiter: TokenBucket = None,
+                 breaker: CircuitBreaker = None):
+        self.url = url
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or TokenBucket(0)
+        self.breaker = breaker or CircuitBreaker(0, 0)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_client = None
+        self._semaphore = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    # --- shared plumbing ---
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, circuit=self.breaker.state)
+
+    def _backoff(self, attempt: int, retry_after: float = 0.0) -> float:
+        """Full jitter: uniform(0, min(max, base * 2^attempt)), at least Retry-After."""
+        return max(retry_after, random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def _start(self):
+        self._count("requests")
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+    def _failed_attempt(self, attempt, error, status=None, headers=None):
+        """Records a failed attempt; returns the backoff before the next one, or raises when out of retries."""
+        # 429 means upstream is up but throttling us: not a reason to open the circuit
+        if status == 429:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self._count("failures")
+            raise LLMError(f"LLM request failed after {attempt + 1} attempt(s): {error}")
+        try:
+            self.breaker.allow()
+        except CircuitOpenError:
+            self._count("failures")
+            raise
+        self._count("retries")
+        return self._backoff(attempt, _retry_after(headers or {}))
+
+    @contextmanager
+    def _settled(self, client_errors):
+        """
+        Records a failure when a call ends without a response or a counted
+        failed attempt (cancelled, or an unexpected client error, which is
+        re-raised as LLMError). Set outcome["recorded"] once the breaker has
+        been told about the call.
+        """
+        outcome = {"recorded": False}
+        try:
+            yield outcome
+        except LLMError:
+            raise
+        except client_errors as e:
+            if not outcome["recorded"]:
+                self.breaker.record_failure()
+                self._count("failures")
+            raise LLMError(f"LLM request failed: {e!r}") from e
+        except BaseException:
+            if not outcome["recorded"]:
+                self.breaker.record_failure()
+            raise
+
+    @staticmethod
+    def _decode(response):
+        try:
+            return response.json()
+        except ValueError:
+            raise LLMError(f"HTTP {response.status_code}: response is not JSON: {response.text[:200]}")
+
+    # --- sync ---
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def post(self, payload: dict) -> dict:
+        """POSTs a completion request; returns the decoded JSON body (of the last response)."""
+        self._start()
+        attempt = 0
+        with self._settled(requests.RequestException) as outcome:
+            while True:
+                self.rate_limiter.acquire()
+                self._count("attempts")
+                try:
+                    response = self._get_session().post(
+                        self.url, json=payload, headers=self.headers,
+                        timeout=(self.connect_timeout, self.read_timeout),
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    time.sleep(self._failed_attempt(attempt, e))
+                    attempt += 1
+                    continue
+                if response.status_code in RETRY_STATUSES:
+                    time.sleep(self._failed_attempt(attempt, f"HTTP {response.status_code}",
+                                                    response.status_code, response.headers))
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                outcome["recorded"] = True
+                return self._decode(response)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    # --- async ---
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """The pooled AsyncClient (bound to the event loop that first used it)."""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._async_client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def apost(self, payload: dict) -> dict:
+        """Async post(); at most max_concurrency requests are in flight."""
+        self._start()
+        attempt = 0
+        with self._settled(httpx.HTTPError) as outcome:
+            while True:
+                await self.rate_limiter.aacquire()
+                self._count("attempts")
+                try:
+                    async with self._get_semaphore():
+                        response = await self.get_async_client().post(self.url, json=payload, headers=self.headers)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    await asyncio.sleep(self._failed_attempt(attempt, e))
+                    attempt += 1
+                    continue
+                if response.status_code in RETRY_STATUSES:
+                    await asyncio.sleep(self._failed_attempt(attempt, f"HTTP {response.status_code}",
+                                                             response.status_code, response.headers))
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                outcome["recorded"] = True
+                return self._decode(response)
+
+    @asynccontextmanager
+    async def astream(self, payload: dict):
+        """
+        Opens a streamed request and yields the httpx response once its
+        status is known. Retries only happen before anything was yielded.
+        """
+        self._start()
+        attempt = 0
+        with self._settled(httpx.HTTPError) as outcome:
+            while True:
+                await self.rate_limiter.aacquire()
+                self._count("attempts")
+                retry_delay = None
+                async with self._get_semaphore():
+                    try:
+                        async with self.get_async_client().stream(
+                                "POST", self.url, json=payload, headers=self.headers) as response:
+                            if response.status_code in RETRY_STATUSES:
+                                retry_delay = self._failed_attempt(attempt, f"HTTP {response.status_code}",
+                                                                   response.status_code, response.headers)
+                            else:
+                                self.breaker.record_success()
+                                outcome["recorded"] = True
+                                yield response
+                                return
+                    except (httpx.TransportError, httpx.TimeoutException) as e:
+                        if outcome["recorded"]:
+                            raise
+                        retry_delay = self._failed_attempt(attempt, e)
+                await asyncio.sleep(retry_delay)
+                attempt += 1
+
+    async def aclose(self):
+        """Closes the async pool (it is recreated on the next call, on the current loop)."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+        self._async_client = None
+        self._semaphore = None
+
+
+# One client per process: the rate limit and circuit state are shared by every caller
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    rate_limiter=TokenBucket(LLM_RATE_LIMIT_RPS, LLM_RATE_LIMIT_BURST),
+                    breaker=CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET_SECONDS),
+                )
+    return _client
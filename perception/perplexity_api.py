@@ -1,14 +1,26 @@
 # perception/perplexity_api.py
-import requests
-from utils.config import PERPLEXITY_API_KEY
+import json
+import time
 
-def perplexity_search(query, context=None):
-    url = "https://api.perplexity.ai/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
-        "Content-Type": "application/json"
-    }
+import httpx
+from perception.llm_client import get_llm_client, LLMError
+from utils.log import get_logger
+from utils.metrics import span, observe
+from utils.single_flight import SingleFlight
+
+log = get_logger("llm")
+
+# Identical completions in flight at the same time (e.g. the same question
+# from several sessions) share one upstream call. Streams are not coalesced.
+llm_flight = SingleFlight("llm")
+
+
+def _flight_key(data):
+    return json.dumps(data, sort_keys=True)
 
+
+def _build_request(query, context=None):
+    """Returns the payload for a Perplexity chat completion (auth headers come from the client)."""
     # ✅ Merge context and query into a single user message
     if context:
         user_prompt = f"Use the following context to answer:\n{context}\n\nUser query: {query}"
@@ -22,11 +34,87 @@ def perplexity_search(query, context=None):
             {"role": "user", "content": user_prompt}
         ]
     }
+    return data
 
-    response = requests.post(url, json=data, headers=headers)
-    response_json = response.json()
 
+def _parse_response(response_json):
     try:
         return response_json["choices"][0]["message"]["content"]
-    except (KeyError, IndexError):
+    except (KeyError, IndexError, TypeError):
         return f"Error: {response_json}"
+
+
+def perplexity_search(query, context=None):
+    data = _build_request(query, context)
+    try:
+        with span("llm", "completion"):
+            return _parse_response(llm_flight.do(_flight_key(data), lambda: get_llm_client().post(data)))
+    except LLMError as e:
+        log.warning(f"LLM error: {e}")
+        return f"Error: {e}"
+
+
+# ============================================================
+# ================== ASYNC CLIENT (POOLED) ===================
+# ============================================================
+
+# Pooling, timeouts, retries, rate limiting and the circuit breaker live in
+# perception/llm_client.py; one client per process serves every session.
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient, creating it on first use."""
+    return get_llm_client().get_async_client()
+
+
+async def aperplexity_search(query, context=None):
+    """
+    Async version of perplexity_search. Reuses pooled connections and caps
+    the number of in-flight upstream calls at LLM_MAX_CONCURRENCY.
+    """
+    data = _build_request(query, context)
+    try:
+        with span("llm", "completion"):
+            return _parse_response(await llm_flight.ado(_flight_key(data), lambda: get_llm_client().apost(data)))
+    except LLMError as e:
+        log.warning(f"LLM error: {e}")
+        return f"Error: {e}"
+
+
+async def aperplexity_stream(query, context=None):
+    """
+    Streams the completion as it is generated (stream=True, server-sent
+    events), yielding content deltas.
+    """
+    data = _build_request(query, context)
+    data["stream"] = True
+
+    start, first = time.perf_counter(), True
+    try:
+        async with get_llm_client().astream(data) as response:
+            if response.status_code != 200:
+                yield f"Error: {(await response.aread()).decode(errors='replace')}"
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta:
+                    if first:
+                        observe("llm", "stream_first_token", time.perf_counter() - start)
+                        first = False
+                    yield delta
+    except LLMError as e:
+        log.warning(f"LLM error: {e}")
+        yield f"Error: {e}"
+    observe("llm", "stream", time.perf_counter() - start)
+
+
+async def close_async_client():
+    """Closes the shared async pool. Call on application shutdown."""
+    await get_llm_client().aclose()
@@ -0,0 +1,189 @@
+# reasoning/fast_router.py
+"""
+Local pre-router in front of the planner LLM.
+
+Obvious requests ("what's my RAM", "play Bohemian Rhapsody") are matched to
+a tool by regex rules that also extract the arguments. Requests no rule
+catches are compared by embedding against example utterances per tool
+(nearest neighbour); tools whose only argument is the query itself can be
+dispatched that way when the match is clear. Chit-chat examples form a
+"none" class so greetings and capability questions stay with the planner.
+
+A routed request runs the tool directly and the result is formatted with a
+template, skipping both planner round trips.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+from memory.local_embedding import get_embedding
+
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
+FAST_ROUTER_MIN_SIMILARITY = float(os.getenv("FAST_ROUTER_MIN_SIMILARITY", 0.75))
+FAST_ROUTER_MIN_MARGIN = float(os.getenv("FAST_ROUTER_MIN_MARGIN", 0.05))
+
+NONE = "none"
+
+# (tool, pattern); named groups become the tool's arguments. First match wins.
+RULES = [(tool, re.compile(pattern, re.IGNORECASE)) for tool, pattern in [
+    # Only about this machine: "my"/"do I have"/"left"... somewhere, or the resource ends the
+    # query ("check disk space"); "what is the price of 16GB RAM" goes to the planner
+    ("get_system_stats",
+     r"^\s*(?:what(?:'s| is)|how much|check|show)\b"
+     r"(?=.*\b(?:my|do i have|i have|left|available|in use|free (?:disk|space|ram|memory|storage)|"
+     r"this (?:machine|computer|pc|laptop|system))\b)"
+     r".*\b(?:ram|disk(?: space)?|free space|storage|system stats|memory usage)\b"),
+    ("get_system_stats",
+     r"^\s*(?:(?:how much|check|show)(?:\s+(?:the|current|total|free|used|available))*"
+     r"|what(?:'s| is)(?:\s+(?:the|current|total|free|used|available))+)"
+     r"\s+(?:system stats|ram(?: usage)?|disk(?: space| usage)?|free space|storage|memory usage)\W*$"),
+    ("get_system_stats", r"^\s*(?:system stats|ram|disk space)\W*$"),
+    ("play_song_on_youtube", r"^\s*play\s+(?:the song\s+|me\s+)?(?P<song_query>.+?)(?:\s+on youtube)?\s*[.!]*$"),
+    ("list_files",
+     r"^\s*(?:list|show)(?: me)?(?: the| all)? (?:files|contents|folders)(?: (?:in|of|inside) (?P<directory>[~/.]?\S+))?\s*[.?!]*$"),
+    ("open_path", r"^\s*open\s+(?P<path>[~/.][^\s]*)\s*[.!]*$"),
+    ("find_file",
+     r"^\s*(?:find|locate|where is|search for)\s+(?:the |my )?(?:file\s+)?(?P<filename>[\w\-. ]+\.\w{1,5})\s*[?.!]*$"),
+    ("save_memory", r"^\s*(?:please\s+)?remember\s+(?:that\s+)?(?P<fact>.+?)\s*[.!]*$"),
+    ("retrieve_memory",
+     r"^\s*(?:what(?:'s| is| are)|do you (?:know|remember)|who(?:'s| is))\s+my\s+\w[\w' ]*\?*$"),
+]]
+
+# Example utterances per tool for the nearest-neighbour fallback
+TOOL_EXAMPLES = {
+    "search_web": [
+        "who won the world cup in 2022",
+        "what is the capital of australia",
+        "latest news about the stock market",
+        "how tall is mount everest",
+        "when did the first moon landing happen",
+        "what is the population of japan",
+    ],
+    "retrieve_memory": [
+        "what is my name",
+        "do you remember my favourite colour",
+        "what did I tell you about my sister",
+        "where do I live",
+    ],
+    "get_system_stats": [
+        "how much ram do I have",
+        "how much free disk space is left",
+        "check my system memory",
+    ],
+    NONE: [
+        "hello",
+        "how are you",
+        "thank you",
+        "what can you do",
+        "tell me a joke",
+        "write a poem about the sea",
+        "explain this to me in simpler words",
+        "can you help me plan my day",
+    ],
+}
+
+# Tools the embedding route may dispatch: their argument is the query itself
+_QUERY_ARGS = {"search_web": "query", "retrieve_memory": "query", "get_system_stats": None}
+
+TEMPLATES = {
+    "get_system_stats": "Here are your system stats: {result}",
+    "save_memory": "Got it, I'll remember that.",
+    "retrieve_memory": "Here's what I remember: {result}",
+}
+
+_examples = None
+_examples_lock = threading.Lock()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _get_examples():
+    """(labels, normalised example matrix), embedded once per process."""
+    global _examples
+    if _examples is None:
+        with _examples_lock:
+            if _examples is None:
+                labels = [tool for tool, texts in TOOL_EXAMPLES.items() for _ in texts]
+                texts = [text for texts in TOOL_EXAMPLES.values() for text in texts]
+                _examples = (labels, _normalize(get_embedding(texts)))
+    return _examples
+
+
+def route_by_rules(query: str):
+    """Returns (tool, args) when a rule matches, else None."""
+    for tool, pattern in RULES:
+        match = pattern.search(query)
+        if match:
+            args = {k: v.strip() for k, v in match.groupdict().items() if v}
+            if tool == "list_files":
+                args.setdefault("directory", ".")
+            if tool == "retrieve_memory":
+                args = {"query": query.strip()}
+            return tool, args
+    return None
+
+
+def route_by_embedding(query: str, embedding):
+    """
+    Returns (tool, args, similarity) when the nearest example belongs to a
+    dispatchable tool, is close enough, and beats every other class by the
+    margin; else None.
+    """
+    labels, matrix = _get_examples()
+    scores = matrix @ _normalize(embedding)
+    best = {}
+    for label, score in zip(labels, scores):
+        best[label] = max(best.get(label, -1.0), float(score))
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    (tool, similarity), runner_up = ranked[0], ranked[1][1] if len(ranked) > 1 else -1.0
+
+    if tool not in _QUERY_ARGS or similarity < FAST_ROUTER_MIN_SIMILARITY:
+        return None
+    if similarity - runner_up < FAST_ROUTER_MIN_MARGIN:
+        return None
+    arg = _QUERY_ARGS[tool]
+    return tool, ({arg: query.strip()} if arg else {}), similarity
+
+
+def fast_route(query: str, embedding=None, available_tools=None):
+    """
+    Decides whether a request can skip the planner.
+    Returns (tool, args, source) with source "rules" or "embedding", or None.
+    `embedding` is the query's embedding if already computed.
+    """
+    if not FAST_ROUTER_ENABLED or not query or not query.strip():
+        return None
+
+    routed = route_by_rules(query)
+    if routed is not None:
+        tool, args = routed
+        source = "rules"
+    else:
+        if embedding is None:
+            embedding = get_embedding(query)
+        routed = route_by_embedding(query, embedding)
+        if routed is None:
+            return None
+        tool, args, _ = routed
+        source = "embedding"
+
+    if available_tools is not None and tool not in available_tools:
+        return None
+    return tool, args, source
+
+
+def format_tool_result(tool: str, result) -> str:
+    """User-facing answer for a fast-path tool result."""
+    result = str(result)
+    if tool == "retrieve_memory":
+        if result.startswith("No relevant information"):
+            return "I don't have anything about that in memory yet."
+        result = result.replace("Found relevant facts in memory: ", "")
+    template = TEMPLATES.get(tool, "{result}")
+    return template.format(result=result)
@@ -0,0 +1,242 @@
+# reasoning/history_manager.py
+"""
+Bounded, incrementally built conversation history for the planner prompt.
+
+Each session keeps the formatted lines of its recent turns within a token
+budget. Messages already seen are never re-formatted: between compactions
+the checkpointed history only grows, so each planner step formats just the
+new tail. Turns that fall out of the window are folded into a short rolling
+summary, which is itself capped (oldest summary lines are dropped first).
+
+The stored history is bounded too: once a thread holds more than
+HISTORY_STORED_MAX_TURNS turns, compact_history() replaces all but the last
+HISTORY_STORED_KEEP_TURNS with one summary message (the same one-line turn
+summaries), so checkpoints stop growing with the conversation.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import RemoveMessage, SystemMessage
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 3000))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", 500))
+HISTORY_MAX_MESSAGE_CHARS = int(os.getenv("HISTORY_MAX_MESSAGE_CHARS", 2000))
+HISTORY_CACHE_SESSIONS = int(os.getenv("HISTORY_CACHE_SESSIONS", 1024))
+# Stored (checkpointed) turns before older ones are folded into a summary message (0 = keep all)
+HISTORY_STORED_MAX_TURNS = int(os.getenv("HISTORY_STORED_MAX_TURNS", 40))
+HISTORY_STORED_KEEP_TURNS = int(os.getenv("HISTORY_STORED_KEEP_TURNS", 20))
+
+SUMMARY_MESSAGE_NAME = "history_summary"
+
+_SUMMARY_SNIPPET_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), no tokenizer needed."""
+    return len(text) // 4 + 1
+
+
+def _truncate(text, limit):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def format_message(msg) -> str:
+    """One history line, in the format the planner prompt has always used."""
+    if msg.type == "human":
+        return f"User: {_truncate(msg.content, HISTORY_MAX_MESSAGE_CHARS)}"
+    if msg.type == "ai":
+        if len(msg.tool_calls) == 1:
+            tool_call = msg.tool_calls[0]
+            return f"JARVIS: (Calling tool: {tool_call['name']} with args: {tool_call['args']})"
+        if msg.tool_calls:
+            calls = "; ".join(f"{tc['name']} with args: {tc['args']}" for tc in msg.tool_calls)
+            return f"JARVIS: (Calling tools in parallel: {calls})"
+        return f"JARVIS: {_truncate(msg.content, HISTORY_MAX_MESSAGE_CHARS)}"
+    if msg.type == "tool":
+        return f"Tool Result: {_truncate(msg.content, HISTORY_MAX_MESSAGE_CHARS)}"
+    return None
+
+
+def summarize_turn(messages) -> str:
+    """Extractive one-line summary of a turn: the question, tools used, the answer."""
+    question, answer, tools = "", "", []
+    for msg in messages:
+        if msg.type == "human":
+            question = msg.content
+        elif msg.type == "ai" and msg.tool_calls:
+            tools.extend(tc["name"] for tc in msg.tool_calls)
+        elif msg.type == "ai":
+            answer = msg.content
+    line = f"User asked: {_truncate(question, _SUMMARY_SNIPPET_CHARS)}"
+    if tools:
+        line += f" (tools: {', '.join(tools)})"
+    if answer:
+        line += f" → JARVIS: {_truncate(answer, _SUMMARY_SNIPPET_CHARS)}"
+    return line
+
+
+def is_summary_message(msg) -> bool:
+    return msg.type == "system" and getattr(msg, "name", None) == SUMMARY_MESSAGE_NAME
+
+
+def _split_turns(messages):
+    turns = []
+    for msg in messages:
+        if msg.type == "human" or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+def compact_history(messages, max_turns: int = HISTORY_STORED_MAX_TURNS,
+                    keep_turns: int = HISTORY_STORED_KEEP_TURNS,
+                    summary_tokens: int = HISTORY_SUMMARY_TOKENS):
+    """
+    State update (for the add_messages reducer) that folds all but the last
+    keep_turns turns into one summary message at the head of the history, once
+    there are more than max_turns; [] while there is nothing to compact.
+    """
+    summary = messages[0] if messages and is_summary_message(messages[0]) else None
+    turns = _split_turns(messages[1:] if summary else messages)
+    if max_turns <= 0 or len(turns) <= max_turns or any(m.id is None for m in messages):
+        return []
+    old = turns[:-max(keep_turns, 1)]
+
+    lines = summary.content.splitlines() if summary else []
+    dropped = summary.additional_kwargs.get("dropped_turns", 0) if summary else 0
+    lines.extend(summarize_turn(turn) for turn in old)
+    tokens = sum(estimate_tokens(line) + 1 for line in lines)
+    while tokens > summary_tokens and len(lines) > 1:
+        tokens -= estimate_tokens(lines.pop(0)) + 1
+        dropped += 1
+
+    # The summary takes the id of the first message, so it replaces it in place;
+    # the rest of the compacted turns are removed
+    head = messages[0]
+    removed = [m for turn in old for m in turn if m is not head]
+    new_summary = SystemMessage(content="\n".join(lines), id=head.id, name=SUMMARY_MESSAGE_NAME,
+                                additional_kwargs={"dropped_turns": dropped})
+    return [new_summary] + [RemoveMessage(id=m.id) for m in removed]
+
+
+class HistoryWindow:
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_tokens: int = HISTORY_SUMMARY_TOKENS, summarize_fn=summarize_turn):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarize_fn = summarize_fn
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._seen = 0                 # messages of the history consumed so far
+        self._first = None             # (type, content) of the first message
+        self._last = None              # (type, content) of the last consumed message
+        self._turns = []               # [[messages], [lines], tokens], oldest first
+        self._window_tokens = 0
+        self._summary = []             # (line, tokens), oldest first
+        self._summary_tokens = 0
+        self._dropped = 0              # turns dropped from the summary as well
+        self._text = None              # cached formatted history
+
+    def _append(self, msg):
+        if is_summary_message(msg):
+            # Turns compacted out of the stored history: they start the rolling summary
+            self._dropped += msg.additional_kwargs.get("dropped_turns", 0)
+            for line in msg.content.splitlines():
+                self._add_summary_line(line)
+            return
+        line = format_message(msg)
+        if msg.type == "human" or not self._turns:
+            self._turns.append([[], [], 0])
+        turn = self._turns[-1]
+        turn[0].append(msg)
+        if line is not None:
+            tokens = estimate_tokens(line) + 1
+            turn[1].append(line)
+            turn[2] += tokens
+            self._window_tokens += tokens
+
+    def _evict(self):
+        # Always keep the current turn, even if it alone exceeds the budget
+        while self._window_tokens > self.token_budget and len(self._turns) > 1:
+            messages, _, tokens = self._turns.pop(0)
+            self._window_tokens -= tokens
+            self._add_summary_line(self.summarize_fn(messages))
+
+    def _add_summary_line(self, line):
+        line_tokens = estimate_tokens(line) + 1
+        self._summary.append((line, line_tokens))
+        self._summary_tokens += line_tokens
+        while self._summary_tokens > self.summary_tokens and len(self._summary) > 1:
+            _, old_tokens = self._summary.pop(0)
+            self._summary_tokens -= old_tokens
+            self._dropped += 1
+
+    def update(self, history):
+        """Consumes messages not seen yet; returns the formatted history."""
+        with self._lock:
+            # A shorter history, or a different first or last message, means this
+            # is not the history we cached (compacted, or a reused thread id): start over
+            if len(history) < self._seen or self._seen and (
+                    (history[0].type, history[0].content) != self._first
+                    or (history[self._seen - 1].type, history[self._seen - 1].content) != self._last):
+                self._reset()
+
+            if len(history) > self._seen:
+                for msg in history[self._seen:]:
+                    self._append(msg)
+                self._seen = len(history)
+                self._first = (history[0].type, history[0].content)
+                self._last = (history[-1].type, history[-1].content)
+                self._evict()
+                self._text = None
+
+            if self._text is None:
+                parts = []
+                if self._summary:
+                    parts.append("Earlier in this conversation (summarised):")
+                    if self._dropped:
+                        parts.append(f"- ({self._dropped} older turns omitted)")
+                    parts.extend(f"- {line}" for line, _ in self._summary)
+                    parts.append("")
+                for _, lines, _ in self._turns:
+                    parts.extend(lines)
+                self._text = "\n".join(parts)
+            return self._text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "messages_seen": self._seen,
+                "window_turns": len(self._turns),
+                "window_tokens": self._window_tokens,
+                "summary_lines": len(self._summary),
+                "summary_tokens": self._summary_tokens,
+                "dropped_turns": self._dropped,
+            }
+
+
+# session_id -> HistoryWindow, least recently used evicted first
+_windows = OrderedDict()
+_windows_lock = threading.Lock()
+
+
+def get_history_window(session_id: str) -> HistoryWindow:
+    with _windows_lock:
+        window = _windows.get(session_id)
+        if window is None:
+            window = _windows[session_id] = HistoryWindow()
+            while len(_windows) > HISTORY_CACHE_SESSIONS:
+                _windows.popitem(last=False)
+        else:
+            _windows.move_to_end(session_id)
+        return window
+
+
+def format_history(history: list, session_id: str = None) -> str:
+    """Windowed history text; cached per session when session_id is given."""
+    window = get_history_window(session_id) if session_id is not None else HistoryWindow()
+    return window.update(history)
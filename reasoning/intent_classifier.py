@@ -1,10 +1,22 @@
 from perception.perplexity_api import perplexity_search
 import re
 import json
-# Import the tool descriptions so the classifier knows what's possible
-from tools.tool_registry import TOOL_DESCRIPTIONS
+# The tool catalog tells the classifier what's possible
+from tools.tool_registry import tool_catalog
+from reasoning.history_manager import estimate_tokens
+
+_ROUTE_INTENTS = {"save_memory": "NEW_FACT", "retrieve_memory": "MEMORY_QUERY"}
 
 def classify_intent(query: str, retrieved_memory: str = None):
+    # Local routing first (rules + example embeddings); the LLM only sees
+    # what the fast router cannot place.
+    from reasoning.fast_router import fast_route
+    route = fast_route(query)
+    if route is not None:
+        tool, args, source = route
+        return {"intent": _ROUTE_INTENTS.get(tool, "TOOL_USE"), "tool": tool, "args": args, "source": source}
+
+    tools_text = tool_catalog.prompt_for(query)
     prompt = f"""
 You are JARVIS, an intelligent AI assistant.
 Your goal is to classify the user's intent.
@@ -12,7 +24,7 @@ User input: "{query}"
 Memory context: "{retrieved_memory or 'No memory yet.'}"
 
 Here are the available tools you can use:
-{TOOL_DESCRIPTIONS}
+{tools_text}
 
 Classify the user's intent into one of the following:
 - "NEW_FACT": User is providing new info to remember (e.g., "my name is...", "my favorite color is...").
@@ -25,6 +37,7 @@ Return JSON like:
     "intent": "<NEW_FACT|MEMORY_QUERY|TOOL_USE|GENERAL>"
 }}
 """
+    tool_catalog.record_prompt("intent", estimate_tokens(prompt), estimate_tokens(tools_text))
     response = perplexity_search(prompt)
     match = re.search(r'\{.*\}', response, re.DOTALL) # Added re.DOTALL
     if match:
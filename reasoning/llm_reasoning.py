@@ -1,5 +1,6 @@
 # reasoning/llm_reasoning.py
-from perception.perplexity_api import perplexity_search
+from perception.perplexity_api import perplexity_search, aperplexity_search, aperplexity_stream
+from reasoning.history_manager import format_history
 
 def llm_reasoning(query, context):
     """
@@ -14,38 +15,41 @@ def llm_reasoning(query, context):
     response = perplexity_search(prompt)
     return response
 
-# --- NEW FUNCTION for our Looping Agent ---
-def llm_reasoning_with_history(system_prompt: str, history: list):
+def build_prompt_with_history(system_prompt: str, history: list, session_id: str = None) -> str:
     """
-    Generates a response using the Perplexity API with a full
-    conversation history.
+    Converts LangChain messages to a simple string format
+    that Perplexity can understand, prefixed by the system prompt.
+    Only a token-budgeted window of recent turns is included (older turns
+    are summarised); with a session_id the formatted history is cached and
+    only new messages are formatted.
     """
-    
-    # Convert LangChain messages to a simple string format
-    # that Perplexity can understand.
-    formatted_history = []
-    for msg in history:
-        if msg.type == "human":
-            formatted_history.append(f"User: {msg.content}")
-        elif msg.type == "ai":
-            if msg.tool_calls:
-                # Get the tool call info
-                tool_call = msg.tool_calls[0]
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
-                formatted_history.append(f"JARVIS: (Calling tool: {tool_name} with args: {tool_args})")
-            else:
-                formatted_history.append(f"JARVIS: {msg.content}")
-        elif msg.type == "tool":
-            formatted_history.append(f"Tool Result: {msg.content}")
-            
-    # Combine the system prompt with the history
-    full_prompt = system_prompt + "\n\n**Conversation History:**\n" + "\n".join(formatted_history)
-    
+    full_prompt = system_prompt + "\n\n**Conversation History:**\n" + format_history(history, session_id)
+
     # Add a final prompt for JARVIS to respond
     full_prompt += "\n\nJARVIS: "
+    return full_prompt
+
+# --- NEW FUNCTION for our Looping Agent ---
+def llm_reasoning_with_history(system_prompt: str, history: list, session_id: str = None):
+    """
+    Generates a response using the Perplexity API with the
+    (windowed) conversation history.
+    """
+    full_prompt = build_prompt_with_history(system_prompt, history, session_id)
     
     # Call the Perplexity API
     response = perplexity_search(full_prompt)
     
-    return response.strip()
\ No newline at end of file
+    return response.strip()
+
+async def allm_reasoning_with_history(system_prompt: str, history: list, session_id: str = None):
+    """Async version of llm_reasoning_with_history (non-blocking HTTP)."""
+    full_prompt = build_prompt_with_history(system_prompt, history, session_id)
+    response = await aperplexity_search(full_prompt)
+    return response.strip()
+
+async def allm_reasoning_stream(system_prompt: str, history: list, session_id: str = None):
+    """Streaming version: yields the response text as the LLM generates it."""
+    full_prompt = build_prompt_with_history(system_prompt, history, session_id)
+    async for token in aperplexity_stream(full_prompt):
+        yield token
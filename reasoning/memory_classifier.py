@@ -0,0 +1,149 @@
+# reasoning/memory_classifier.py
+"""
+Local SAVE/IGNORE decision for the memory filter, replacing the per-turn
+Perplexity call. Keyword rules handle the obvious cases; otherwise a
+nearest-centroid classifier over the exchange's embedding decides, and the
+LLM is only consulted (optionally) when that is not confident.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+from memory.local_embedding import get_embedding
+
+MEMORY_FILTER_LLM_FALLBACK = os.getenv("MEMORY_FILTER_LLM_FALLBACK", "0") == "1"
+MEMORY_FILTER_MIN_CONFIDENCE = float(os.getenv("MEMORY_FILTER_MIN_CONFIDENCE", 0.5))
+# Centroid score difference that counts as fully confident
+_MARGIN_SCALE = 0.15
+
+SAVE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r"\bmy (name|favou?rite|birthday|age|wife|husband|partner|son|daughter|mom|mother|dad|father|"
+    r"brother|sister|friend|dog|cat|job|email|phone|address|hometown)\b",
+    r"\bi(?: am|'m) (?:a |an )?(?:from|allergic|vegetarian|vegan|\d+ years)",
+    r"\bi (?:like|love|hate|prefer|enjoy|live|work|study|was born)\b",
+    r"\bcall me\b",
+]]
+
+# Asking to remember something saves it, even phrased as a question ("can you remember that ...?")
+REMEMBER_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r"(?<!do you )(?<!did you )\bremember (?:that|this|my)\b",  # not "do you remember my name?"
+    r"\bdon'?t forget\b",
+]]
+
+IGNORE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|nice|bye|goodbye|good (morning|night|evening))\W*$",
+    r"^\s*(what'?s|what is|how much|check) (my )?(ram|memory usage|disk|cpu|battery)\b",
+    r"^\s*(play|open|list|find|search|show)\b",
+    r"^\s*(what is|who is|who was|when did|where is|how do|how does|why does)\b",
+]]
+
+# A clause asking something ("what's yours?", "do you know my name?") states no fact
+_CLAUSE = re.compile(r"[^,;.!?]+")
+_QUESTION_CLAUSE = re.compile(
+    r"^\s*(what|what'?s|who|whose|where|when|why|how|which|do|does|did|can|could|would|will|should|"
+    r"is|are|am|was|were|have|has|any)\b", re.IGNORECASE)
+
+SAVE_EXAMPLES = [
+    "User: \"my name is Alex\" | JARVIS: \"Nice to meet you, Alex.\"",
+    "User: \"my favorite color is blue\" | JARVIS: \"Got it, blue it is.\"",
+    "User: \"I live in Chennai\" | JARVIS: \"Noted, you live in Chennai.\"",
+    "User: \"I am allergic to peanuts\" | JARVIS: \"I'll remember that.\"",
+    "User: \"I work as a data engineer\" | JARVIS: \"Great, noted.\"",
+    "User: \"my sister's birthday is on March 3\" | JARVIS: \"I'll remember it.\"",
+    "User: \"I prefer short answers\" | JARVIS: \"Understood.\"",
+]
+
+IGNORE_EXAMPLES = [
+    "User: \"hello\" | JARVIS: \"Hello! How can I help?\"",
+    "User: \"thanks\" | JARVIS: \"You're welcome!\"",
+    "User: \"what is the capital of France\" | JARVIS: \"Paris.\"",
+    "User: \"play Bohemian Rhapsody\" | JARVIS: \"Opened YouTube search.\"",
+    "User: \"how much RAM do I have\" | JARVIS: \"RAM: 7.5GB available.\"",
+    "User: \"who won the game last night\" | JARVIS: \"The home team won.\"",
+    "User: \"list files in Downloads\" | JARVIS: \"Contents of Downloads: ...\"",
+]
+
+_centroids = None
+_centroids_lock = threading.Lock()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _get_centroids():
+    """(save_centroid, ignore_centroid), embedded once per process."""
+    global _centroids
+    if _centroids is None:
+        with _centroids_lock:
+            if _centroids is None:
+                save = _normalize(get_embedding(SAVE_EXAMPLES)).mean(axis=0)
+                ignore = _normalize(get_embedding(IGNORE_EXAMPLES)).mean(axis=0)
+                _centroids = (_normalize(save), _normalize(ignore))
+    return _centroids
+
+
+def _statements(user_query: str):
+    return [clause for clause in _CLAUSE.findall(user_query) if not _QUESTION_CLAUSE.match(clause)]
+
+
+def classify_by_rules(user_query: str):
+    """Returns "SAVE", "IGNORE" or None when no rule fires."""
+    # Commands and leading questions first: "what is my name?" mentions a fact but adds none
+    if any(p.search(user_query) for p in IGNORE_PATTERNS):
+        return "IGNORE"
+    if any(p.search(user_query) for p in REMEMBER_PATTERNS):
+        return "SAVE"
+    # A fact stated alongside a question still counts: "I'm vegetarian, any dinner ideas?"
+    if any(p.search(clause) for clause in _statements(user_query) for p in SAVE_PATTERNS):
+        return "SAVE"
+    if user_query.strip().endswith("?"):
+        return "IGNORE"
+    return None
+
+
+def classify_by_embedding(embedding):
+    """Returns (decision, confidence in [0, 1]) from the centroid margin."""
+    save_centroid, ignore_centroid = _get_centroids()
+    vector = _normalize(embedding)
+    margin = float(vector @ save_centroid - vector @ ignore_centroid)
+    decision = "SAVE" if margin > 0 else "IGNORE"
+    return decision, min(1.0, abs(margin) / _MARGIN_SCALE)
+
+
+def _ask_llm(summary: str):
+    from perception.perplexity_api import perplexity_search
+
+    prompt = f"""
+Memory filter:
+"{summary}"
+
+Return ONLY: SAVE or IGNORE.
+"""
+    try:
+        return "SAVE" if perplexity_search(prompt).strip().upper().startswith("SAVE") else "IGNORE"
+    except Exception:
+        return "SAVE"
+
+
+def classify_memory(user_query: str, summary: str, embedding=None):
+    """
+    Decides whether an exchange is worth saving.
+    Returns (decision, confidence, source) with source "rules", "embedding"
+    or "llm". `embedding` is the summary's embedding if already computed.
+    """
+    decision = classify_by_rules(user_query)
+    if decision is not None:
+        return decision, 1.0, "rules"
+
+    if embedding is None:
+        embedding = get_embedding(summary)
+    decision, confidence = classify_by_embedding(embedding)
+
+    if confidence < MEMORY_FILTER_MIN_CONFIDENCE and MEMORY_FILTER_LLM_FALLBACK:
+        return _ask_llm(summary), confidence, "llm"
+    return decision, confidence, "embedding"
@@ -0,0 +1,364 @@
+# reasoning/tool_call_parser.py
+"""
+Tool-call parsing for the planner output.
+
+The planner replies either with the answer or with JSON tool call(s):
+{"tool_name": "...", "parameters": {...}}, a list of those, or
+{"tool_calls": [...]}. Instead of a greedy regex, a string-aware
+balanced-bracket scanner finds each complete top-level JSON value, so
+braces in prose or inside JSON strings do not confuse it. Candidate calls
+are validated against the tool schemas (unknown tool, missing required
+argument, argument types) and arguments are coerced where that is safe.
+
+ToolCallScanner works incrementally on a streamed reply: it decides from
+the first key of a leading JSON value whether the reply is a tool call, and
+otherwise releases answer text as it arrives, holding back only a JSON
+value that might still turn out to be a tool call.
+"""
+import ast
+import json
+import re
+import threading
+
+TOOL_KEYS = ("tool_name", "tool_calls")
+
+_FENCE = re.compile(r"^```[\w-]*[ \t]*\n?")
+_FIRST_KEY = re.compile(r'^[\[\s]*\{\s*"([^"\\]*)"')
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Outcome counters, reported by /stats
+_stats_lock = threading.Lock()
+_stats = {"parsed": 0, "tool_calls": 0, "answers": 0, "invalid": 0, "repaired": 0, "repair_failed": 0}
+
+
+def count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] = _stats.get(outcome, 0) + 1
+
+
+def parser_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def scan_json_values(text: str):
+    """(start, end) of every complete top-level {...} or [...] in text."""
+    spans, depth, start, in_string, escape = [], 0, 0, False, False
+    for i, c in enumerate(text):
+        if not depth:
+            if c in "{[":
+                depth, start = 1, i
+            continue
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if not depth:
+                spans.append((start, i + 1))
+    return spans
+
+
+def _loads(raw: str):
+    """json.loads, tolerating trailing commas and Python dict syntax (single quotes, True/None)."""
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        error = e
+    fixed = _TRAILING_COMMA.sub(r"\1", raw)
+    try:
+        return json.loads(fixed)
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = ast.literal_eval(fixed)
+        if isinstance(value, (dict, list)):
+            return value
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        pass
+    raise error
+
+
+def _close_open_value(text: str):
+    """The last unterminated top-level value in text with its missing closers added, or None."""
+    stack, start, in_string, escape = [], None, False, False
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"' and stack:
+            in_string = True
+        elif c in "{[":
+            if not stack:
+                start = i
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]" and stack:
+            stack.pop()
+    if not stack:
+        return None
+    return text[start:] + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def _as_calls(value):
+    """The list of raw call dicts a JSON value denotes, or None if it is not a tool call."""
+    if isinstance(value, dict):
+        if isinstance(value.get("tool_calls"), list):
+            value = value["tool_calls"]
+        elif "tool_name" in value:
+            return [value]
+        else:
+            return None
+    if isinstance(value, list) and value and all(isinstance(v, dict) and "tool_name" in v for v in value):
+        return value
+    return None
+
+
+def _mentions_tool_keys(raw: str) -> bool:
+    return any(f'"{key}"' in raw or f"'{key}'" in raw for key in TOOL_KEYS)
+
+
+def _coerce(value, type_name):
+    """Safe conversions only; raises ValueError otherwise."""
+    if type_name == "str":
+        if isinstance(value, (dict, list)):
+            raise ValueError("expected a string")
+        return value if isinstance(value, str) else str(value)
+    if type_name == "int":
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError("expected an integer")
+        return int(value)
+    if type_name == "float":
+        if isinstance(value, bool):
+            raise ValueError("expected a number")
+        return float(value)
+    if type_name == "bool":
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        if not isinstance(value, bool):
+            raise ValueError("expected true or false")
+    return value
+
+
+def validate_call(call: dict, schemas: dict):
+    """Returns ({"name", "args"}, None) or (None, error message)."""
+    name = call.get("tool_name")
+    schema = schemas.get(name) if isinstance(name, str) else None
+    if schema is None:
+        return None, f"unknown tool {name!r}"
+    args = call.get("parameters", call.get("args", {}))
+    if args is None:
+        args = {}
+    if not isinstance(args, dict):
+        return None, f"{name}: parameters must be a JSON object"
+
+    params = {p["name"]: p for p in schema["params"]}
+    clean = {}
+    for key, value in args.items():
+        if key not in params:
+            continue  # extra arguments would make the call fail; drop them
+        try:
+            clean[key] = _coerce(value, params[key]["type"])
+        except (TypeError, ValueError) as e:
+            return None, f"{name}: argument {key!r} {e}"
+    missing = [p for p, spec in params.items() if spec["required"] and p not in clean]
+    if missing:
+        return None, f"{name}: missing required argument(s) {', '.join(missing)}"
+    return {"name": name, "args": clean}, None
+
+
+class ParseResult:
+    """kind is "tool_calls", "answer" or "invalid" (looked like a tool call but could not be used)."""
+
+    def __init__(self, kind, calls=None, answer="", errors=None):
+        self.kind = kind
+        self.calls = calls or []
+        self.answer = answer
+        self.errors = errors or []
+
+    def __repr__(self):
+        return f"ParseResult({self.kind!r}, calls={self.calls!r}, errors={self.errors!r})"
+
+
+def parse_tool_calls(text: str, schemas: dict) -> ParseResult:
+    """Classifies a complete planner reply and validates any tool calls in it."""
+    text = (text or "").strip()
+    body = _FENCE.sub("", text).rstrip("`").strip()
+    errors = []
+
+    for start, end in scan_json_values(body):
+        raw = body[start:end]
+        try:
+            calls = _as_calls(_loads(raw))
+        except json.JSONDecodeError as e:
+            if _mentions_tool_keys(raw):
+                errors.append(f"invalid JSON ({e.msg} at character {e.pos})")
+            continue
+        if calls is None:
+            continue
+
+        valid = []
+        for call in calls:
+            checked, error = validate_call(call, schemas)
+            if error:
+                errors.append(error)
+            else:
+                valid.append(checked)
+        if valid and not errors:
+            return ParseResult("tool_calls", calls=valid)
+
+    if not errors and _mentions_tool_keys(body):
+        # Truncated call (e.g. a missing closing brace): complete it locally
+        completed = _close_open_value(body)
+        if completed is not None:
+            try:
+                calls = _as_calls(_loads(completed))
+            except json.JSONDecodeError:
+                calls = None
+            checked = [validate_call(call, schemas) for call in calls or []]
+            if checked and all(error is None for _, error in checked):
+                return ParseResult("tool_calls", calls=[call for call, _ in checked])
+            errors.extend(error for _, error in checked if error)
+            if not errors:
+                errors.append("unterminated JSON")
+    if errors:
+        return ParseResult("invalid", answer=_prose(body), errors=errors)
+    return ParseResult("answer", answer=text)
+
+
+def _prose(body: str) -> str:
+    """The reply with its JSON values cut out (what is left to show as an answer)."""
+    parts, last = [], 0
+    for start, end in scan_json_values(body):
+        parts.append(body[last:start])
+        last = end
+    parts.append(body[last:] if "{" not in body[last:] else body[last:body.index("{", last)])
+    return " ".join(" ".join(parts).split())
+
+
+class ToolCallScanner:
+    """
+    Incremental view of a streamed planner reply.
+    feed() returns the text that can be shown to the user now; is_tool_call
+    becomes True or False as soon as that is known (None until then).
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.is_tool_call = None
+        self._pos = 0          # characters scanned
+        self._released = 0     # characters handed out as answer text
+        self._depth = 0
+        self._start = 0        # start of the open top-level value
+        self._in_string = False
+        self._escape = False
+        self._undecided = []   # values that closed before is_tool_call was known
+
+    def _decide_head(self):
+        head = self.text.lstrip()
+        if not head or "```".startswith(head[:3]) and len(head) < 3:
+            return None
+        if head.startswith("```"):
+            if "\n" not in head:
+                return None
+            head = _FENCE.sub("", head).lstrip()
+            if not head:
+                return None
+        if head[0] not in "{[":
+            return False
+        match = _FIRST_KEY.match(head)
+        if match:
+            return match.group(1) in TOOL_KEYS
+        stripped = head.lstrip("[ \t\r\n")
+        if len(stripped) > 1 and stripped[0] == "{" and stripped[1:].lstrip()[:1] not in ("", '"'):
+            return False
+        if head[0] == "[" and stripped[:1] not in ("", "{"):
+            return False
+        return None
+
+    def _scan(self):
+        for i in range(self._pos, len(self.text)):
+            c = self.text[i]
+            if not self._depth:
+                if c in "{[":
+                    self._depth, self._start = 1, i
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if not self._depth:
+                    self._close_value(self._start, i + 1)
+        self._pos = len(self.text)
+
+    def _close_value(self, start, end):
+        if self.is_tool_call is None:
+            self._undecided.append((start, end))
+            return
+        # A tool call after some prose: stop releasing text from here on
+        if self.is_tool_call is False:
+            try:
+                if _as_calls(_loads(self.text[start:end])) is not None:
+                    self.is_tool_call = True
+                    self._released = max(self._released, start)
+            except json.JSONDecodeError:
+                pass
+
+    def _decide(self):
+        if self.is_tool_call is None:
+            self.is_tool_call = self._decide_head()
+            if self.is_tool_call is not None:
+                undecided, self._undecided = self._undecided, []
+                for start, end in undecided:
+                    self._close_value(start, end)
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        # Decide on the head first, so a call that closes in this same chunk
+        # is checked against it
+        self._decide()
+        self._scan()
+        if self.is_tool_call is not False:
+            return ""
+        # Hold back an open JSON value until it closes: it might be a tool call
+        return self._release(self._start if self._depth else len(self.text))
+
+    def _release(self, limit):
+        if limit <= self._released:
+            return ""
+        out = self.text[self._released:limit]
+        self._released = limit
+        return out
+
+    def finish(self) -> str:
+        """Any held-back answer text, once the stream has ended."""
+        if self.is_tool_call:
+            return ""
+        if self.is_tool_call is None:
+            self.is_tool_call = False
+            undecided, self._undecided = self._undecided, []
+            for start, end in undecided:
+                self._close_value(start, end)
+            if self.is_tool_call:
+                return ""
+        return self._release(len(self.text))
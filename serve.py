@@ -0,0 +1,253 @@
+# serve.py
+"""
+Production entry point for the API (main.py is the interactive CLI).
+
+    WEB_CONCURRENCY=4 python serve.py
+    WEB_CONCURRENCY=4 SESSION_AFFINITY=1 python serve.py
+
+WEB_CONCURRENCY=1 (default) runs api:app in one uvicorn process. With more
+workers, state every worker must agree on (short-term memory, the tool
+result cache) goes through the shared store: SHARED_STATE_BACKEND defaults
+to "sqlite" here (see utils/shared_state.py).
+
+SESSION_AFFINITY=0: uvicorn's own workers share the listening socket, so any
+worker may serve any turn of a session.
+
+SESSION_AFFINITY=1: each worker listens on a private port (PORT + 1 + i) and
+a small router on PORT sends every request of a session (the X-Session-Id
+header, else "session_id" in the JSON body) to the same worker, so its hot
+state (STM copy, history window, caches) stays in one process. With the
+SQLite checkpointer each worker then also gets its own checkpoint file,
+which removes write contention on a single file; keep WEB_CONCURRENCY fixed,
+since it decides which worker (and file) owns a session.
+
+Requests without a session go to any worker, except the service-wide views,
+which the router answers itself from every worker: /metrics concatenates
+their samples with a worker="<i>" label (sum over it in Prometheus), /stats
+lists each worker's stats, and /ready is 200 only when every worker is
+ready. (With SESSION_AFFINITY=0 these endpoints describe whichever worker
+answered.)
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import zlib
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+SESSION_AFFINITY = os.getenv("SESSION_AFFINITY", "0") == "1"
+WORKER_STARTUP_TIMEOUT = float(os.getenv("WORKER_STARTUP_TIMEOUT", 120))
+
+# Never forwarded: they describe one hop, not the request / response
+_HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"host", b"content-length"}
+# The router's own server adds these to every response
+_RESPONSE_SKIP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"date", b"server"}
+# Answered by the router from every worker instead of forwarded to one
+AGGREGATED_PATHS = {"/metrics", "/stats", "/ready"}
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?(\s.*)$")
+
+
+def _worker_checkpoint_path(path: str, worker_id: int) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.worker{worker_id}{ext or '.sqlite'}"
+
+
+def run_worker(worker_id: int, port: int):
+    """One API worker behind the affinity router (runs in a child process)."""
+    import uvicorn
+    import utils.config as config
+
+    if config.CHECKPOINT_BACKEND == "sqlite":
+        # Read by the checkpointer when api imports it; this worker owns its sessions' file
+        config.CHECKPOINT_DB_PATH = _worker_checkpoint_path(config.CHECKPOINT_DB_PATH, worker_id)
+    # workers=1: uvicorn would otherwise take WEB_CONCURRENCY from the environment
+    uvicorn.run("api:app", host="127.0.0.1", port=port, workers=1, log_level="warning")
+
+
+class AffinityRouter:
+    """ASGI app forwarding each request to the worker that owns its session."""
+
+    def __init__(self, upstreams):
+        self.upstreams = upstreams
+        self._round_robin = itertools.count()
+        self._client = None
+
+    def pick(self, session_id) -> str:
+        if session_id is None:
+            return self.upstreams[next(self._round_robin) % len(self.upstreams)]
+        return self.upstreams[zlib.crc32(session_id.encode("utf-8")) % len(self.upstreams)]
+
+    @staticmethod
+    def session_of(headers, body):
+        session_id = headers.get(b"x-session-id")
+        if session_id:
+            return session_id.decode("latin-1")
+        if body[:1] == b"{":
+            try:
+                value = json.loads(body).get("session_id")
+            except (ValueError, AttributeError):
+                return None
+            return str(value) if value is not None else None
+        return None
+
+    @staticmethod
+    def merge_metrics(texts) -> str:
+        """One Prometheus exposition from every worker's, each sample labelled worker="<i>"."""
+        families = {}  # metric name -> ([HELP / TYPE lines], [samples]), in first-seen order
+        for worker, text in enumerate(texts):
+            family = None
+            for line in text.splitlines():
+                parts = line.split(maxsplit=3)
+                if line.startswith("#"):
+                    if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                        family = parts[2]
+                        comments = families.setdefault(family, ([], []))[0]
+                        if line not in comments:
+                            comments.append(line)
+                    continue
+                match = _SAMPLE.match(line)
+                if not match:
+                    continue
+                name, labels, rest = match.groups()
+                labels = f'worker="{worker}"' + (f",{labels}" if labels else "")
+                # Histogram samples (_bucket, _sum, _count) belong to the family above them
+                key = family if family and name.startswith(family) else name
+                families.setdefault(key, ([], []))[1].append(f"{name}{{{labels}}}{rest}")
+        return "".join("\n".join(comments + samples) + "\n" for comments, samples in families.values())
+
+    async def _aggregate(self, path):
+        """(status, content type, body) for a service-wide endpoint, from every worker."""
+        responses = await asyncio.gather(*(self._client.get(upstream + path) for upstream in self.upstreams),
+                                         return_exceptions=True)
+        if path == "/metrics":
+            texts = [r.text for r in responses if not isinstance(r, Exception) and r.status_code == 200]
+            status = 200 if len(texts) == len(responses) else 502
+            return status, b"text/plain; version=0.0.4", self.merge_metrics(texts).encode()
+
+        workers, ok = {}, True
+        for upstream, response in zip(self.upstreams, responses):
+            if isinstance(response, Exception):
+                workers[upstream], ok = {"error": str(response)}, False
+                continue
+            try:
+                workers[upstream] = response.json()
+            except ValueError:
+                workers[upstream] = {"error": response.text[:200]}
+            ok = ok and response.status_code == 200
+        if path == "/ready":
+            body = {"status": "ready" if ok else "loading", "workers": workers}
+            return (200 if ok else 503), b"application/json", json.dumps(body).encode()
+        return (200 if ok else 502), b"application/json", json.dumps({"workers": workers}).encode()
+
+    async def _wait_for_workers(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WORKER_STARTUP_TIMEOUT
+        for upstream in self.upstreams:
+            while True:
+                try:
+                    if (await self._client.get(f"{upstream}/health")).status_code == 200:
+                        break
+                except Exception:
+                    pass
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Worker at {upstream} did not start")
+                await asyncio.sleep(0.2)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        if scope["method"] == "GET" and scope["path"] in AGGREGATED_PATHS:
+            status, content_type, payload = await self._aggregate(scope["path"])
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", content_type)]})
+            await send({"type": "http.response.body", "body": payload})
+            return
+
+        headers = dict(scope["headers"])
+        upstream = self.pick(self.session_of(headers, body))
+        url = upstream + scope["path"] + (f"?{scope['query_string'].decode()}" if scope["query_string"] else "")
+        request = self._client.build_request(
+            scope["method"], url, content=body,
+            headers=[(k, v) for k, v in scope["headers"] if k not in _HOP_HEADERS])
+        try:
+            response = await self._client.send(request, stream=True)
+        except Exception as e:
+            await send({"type": "http.response.start", "status": 502,
+                        "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": f"Upstream error: {e}".encode()})
+            return
+        try:
+            await send({"type": "http.response.start", "status": response.status_code,
+                        "headers": [(k, v) for k, v in response.headers.raw
+                                    if k.lower() not in _RESPONSE_SKIP_HEADERS]})
+            # Raw chunks as they arrive, so /chat/stream events are not buffered
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    async def _lifespan(self, receive, send):
+        import httpx
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0),
+                                                 limits=httpx.Limits(max_connections=None))
+                try:
+                    await self._wait_for_workers()
+                except RuntimeError as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self._client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def main():
+    import uvicorn
+
+    if WEB_CONCURRENCY > 1:
+        # Inherited by every worker: one view of STM and the tool cache
+        os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+
+    if WEB_CONCURRENCY <= 1:
+        uvicorn.run("api:app", host=HOST, port=PORT)
+    elif not SESSION_AFFINITY:
+        uvicorn.run("api:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        ports = [PORT + 1 + i for i in range(WEB_CONCURRENCY)]
+        workers = [ctx.Process(target=run_worker, args=(i, port), daemon=True) for i, port in enumerate(ports)]
+        for worker in workers:
+            worker.start()
+        try:
+            router = AffinityRouter([f"http://127.0.0.1:{port}" for port in ports])
+            uvicorn.run(router, host=HOST, port=PORT, workers=1)
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
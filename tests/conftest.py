@@ -0,0 +1,16 @@
+# tests/conftest.py
+"""
+Offline settings for the test suite: the in-process vector store, no real
+LLM endpoint, and checkpoints in a temporary file. They are set here, before
+any project module reads its settings at import time.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="jarvis_tests_")
+
+os.environ.setdefault("MEMORY_BACKEND", "simple")
+os.environ.setdefault("PERPLEXITY_API_KEY", "offline")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(_workdir, "checkpoints.sqlite"))
+os.environ.setdefault("SHARED_STATE_PATH", os.path.join(_workdir, "shared_state.sqlite"))
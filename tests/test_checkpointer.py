@@ -0,0 +1,53 @@
+# tests/test_checkpointer.py
+"""Concurrent checkpoint chains on the local backends (see benchmarks/bench_checkpointer.py)."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_checkpointer import write_chain, awrite_chain, verify, averify
+from graph.checkpointer import create_checkpointer, create_async_checkpointer
+
+THREADS = 8
+WRITES = 10
+BACKENDS = ["memory", "sqlite"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sync_chains(backend, tmp_path):
+    saver, close = create_checkpointer(backend, path=os.path.join(tmp_path, "checkpoints.sqlite"))
+    try:
+        threads = [f"sync_{i}" for i in range(THREADS)]
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            last_ids = dict(zip(threads, pool.map(lambda t: write_chain(saver, t, WRITES), threads)))
+        assert verify(saver, last_ids, WRITES) == 0
+    finally:
+        close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_async_chains(backend, tmp_path):
+    async def run():
+        saver, aclose = await create_async_checkpointer(backend, path=os.path.join(tmp_path, "checkpoints.sqlite"))
+        try:
+            threads = [f"async_{i}" for i in range(THREADS)]
+            results = await asyncio.gather(*(awrite_chain(saver, t, WRITES) for t in threads))
+            return await averify(saver, dict(zip(threads, results)), WRITES)
+        finally:
+            await aclose()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_sqlite_chains_survive_reopen(tmp_path):
+    path = os.path.join(tmp_path, "checkpoints.sqlite")
+    saver, close = create_checkpointer("sqlite", path=path)
+    last_ids = {"reopened": write_chain(saver, "reopened", WRITES)}
+    close()
+
+    saver, close = create_checkpointer("sqlite", path=path)
+    try:
+        assert verify(saver, last_ids, WRITES) == 0
+    finally:
+        close()
@@ -0,0 +1,32 @@
+# tests/test_cli.py
+"""The CLI prints the answer itself instead of relying on a log record."""
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_run_ai_prints_the_answer_with_logging_silenced():
+    script = textwrap.dedent("""
+        import os
+        from benchmarks.stub_llm import StubLLMServer
+        from benchmarks.bench_replay import HashEmbeddingModel
+        server = StubLLMServer(delay=0, reply=lambda prompt: "Paris is the capital of France.").start()
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import memory.local_embedding as local_embedding
+        local_embedding._embed_model_instance = HashEmbeddingModel()
+        from main import run_ai
+        from graph.main_graph import wait_for_memory_saves
+        returned = run_ai("what is the capital of France?", "cli")
+        wait_for_memory_saves()
+        print("returned:", returned)
+        server.stop()
+    """)
+    env = dict(os.environ, CHECKPOINT_BACKEND="memory", FAST_ROUTER_ENABLED="0", LOG_LEVEL="CRITICAL")
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True,
+                         timeout=120)
+    assert out.returncode == 0, out.stderr[-2000:]
+    assert "🤖 JARVIS: Paris is the capital of France." in out.stdout.splitlines()
+    assert "returned: Paris is the capital of France." in out.stdout.splitlines()
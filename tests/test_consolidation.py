@@ -0,0 +1,82 @@
+# tests/test_consolidation.py
+"""Consolidation drops repeats and memories whose facts were updated, and keeps the rest."""
+import numpy as np
+import pytest
+
+import memory.llama_index_memory as llama_index_memory
+from memory.consolidation import consolidate_namespace, fact_slots
+from memory.llama_index_memory import MemoryService
+
+
+def axis(i, noise=0.0):
+    vector = np.zeros(16, dtype=np.float32)
+    vector[i] = 1.0
+    vector[(i + 1) % 16] = noise
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def summary(user, reply="Noted."):
+    return f'User: "{user}" | JARVIS: "{reply}"'
+
+
+@pytest.fixture
+def service():
+    service = MemoryService(backend="simple")
+    service.get_index()
+    return service
+
+
+def remaining(service, namespace):
+    return sorted(service.load_rows(namespace, 1000)[1])
+
+
+@pytest.mark.parametrize("text, slots", [
+    (summary("I live in Paris", "Noted, you live in Paris."), {"home city"}),
+    ("I moved to Berlin last month", {"home city"}),
+    ("my favourite color is now green", {"favorite color"}),
+    ("My dog is called Rex", {"dog's name"}),
+    ("my dog's name is Max and I work at Globex", {"dog's name", "employer"}),
+    ("what is my name?", set()),
+    ("user asked about kubernetes, ticket 5", set()),
+])
+def test_fact_slots(text, slots):
+    assert fact_slots(text) == slots
+
+
+def test_updated_fact_supersedes_the_old_value(service):
+    texts = [summary("I live in Paris"), summary("my favorite color is blue"), summary("I live in Berlin")]
+    # Unrelated directions: cosine similarity alone would keep all three
+    service.store_many(texts, [axis(0), axis(1), axis(2)], "ns", created_at=[1000.0, 2000.0, 3000.0])
+
+    assert consolidate_namespace(service, "ns")["deleted"] == 1
+    assert remaining(service, "ns") == sorted(texts[1:])
+
+
+def test_memory_is_kept_while_one_of_its_facts_is_current(service):
+    texts = ["my dog's name is Rex and I work at Initech", "I work at Globex now", "my dog is called Bella"]
+    service.store_many(texts[:2], [axis(0), axis(1)], "ns", created_at=[1000.0, 2000.0])
+    assert consolidate_namespace(service, "ns")["deleted"] == 0
+
+    service.store_many(texts[2:], [axis(2)], "ns", created_at=[3000.0])
+    assert consolidate_namespace(service, "ns")["deleted"] == 1
+    assert remaining(service, "ns") == sorted(texts[1:])
+
+
+def test_paraphrases_still_collapse_and_other_namespaces_are_untouched(service, monkeypatch):
+    monkeypatch.setattr(llama_index_memory, "MEMORY_DEDUP_THRESHOLD", 0)  # let the repeat reach the store
+    service.store_many(["my dog is called Rex"], [axis(0)], "ns", created_at=[1000.0])
+    service.store_many(["I adore hiking"], [axis(3)], "ns", created_at=[1500.0])
+    service.store_many(["I really adore hiking!"], [axis(3, noise=0.05)], "ns", created_at=[2000.0])
+    service.store_many(["I live in Lyon"], [axis(4)], "other", created_at=[500.0])
+    service.store_many(["I live in Quito"], [axis(5)], "ns", created_at=[2500.0])
+
+    assert consolidate_namespace(service, "ns")["deleted"] == 1
+    assert remaining(service, "ns") == ["I live in Quito", "I really adore hiking!", "my dog is called Rex"]
+    assert remaining(service, "other") == ["I live in Lyon"]
+
+
+def test_dry_run_deletes_nothing(service):
+    service.store_many(["I live in Paris", "I live in Berlin"], [axis(0), axis(1)], "ns",
+                       created_at=[1000.0, 2000.0])
+    assert consolidate_namespace(service, "ns", dry_run=True)["deleted"] == 1
+    assert len(remaining(service, "ns")) == 2
@@ -0,0 +1,74 @@
+# tests/test_embedding_cache.py
+"""The on-disk embedding cache across restarts, crashes and several processes."""
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+
+from memory.embedding_cache import EmbeddingCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def vector(i, dim=8):
+    return np.full(dim, float(i), dtype=np.float32).tolist()
+
+
+def test_survives_a_restart(tmp_path):
+    path = os.path.join(tmp_path, "cache")
+    cache = EmbeddingCache(capacity=4, dim=8, path=path)
+    cache.put("a", vector(1))
+    cache.close()
+
+    cache = EmbeddingCache(capacity=4, dim=8, path=path)
+    assert cache.get("a") == vector(1)
+    cache.close()
+
+
+def test_rows_reused_after_the_last_flush_are_not_served(tmp_path):
+    path = os.path.join(tmp_path, "cache")
+    # Fill the cache and flush, then evict "k0" and "k1" into rows the index
+    # still maps to them, and die before the next flush
+    crash = textwrap.dedent(f"""
+        import os, numpy as np
+        from memory.embedding_cache import EmbeddingCache
+        cache = EmbeddingCache(capacity=4, dim=8, path={path!r}, flush_every=1000)
+        for i in range(4):
+            cache.put(f"k{{i}}", np.full(8, float(i)))
+        cache.flush()
+        cache.put("new0", np.full(8, 100.0))
+        cache.put("new1", np.full(8, 101.0))
+        os._exit(0)
+    """)
+    subprocess.run([sys.executable, "-c", crash], cwd=ROOT, check=True)
+
+    cache = EmbeddingCache(capacity=4, dim=8, path=path)
+    assert cache.get("k0") is None and cache.get("k1") is None
+    assert cache.get("k2") == vector(2) and cache.get("k3") == vector(3)
+    cache.close()
+
+
+def test_second_process_falls_back_to_memory(tmp_path):
+    path = os.path.join(tmp_path, "cache")
+    owner = EmbeddingCache(capacity=4, dim=8, path=path)
+    try:
+        other = textwrap.dedent(f"""
+            from memory.embedding_cache import EmbeddingCache
+            print(EmbeddingCache(capacity=4, dim=8, path={path!r}).path)
+        """)
+        out = subprocess.run([sys.executable, "-c", other], cwd=ROOT, capture_output=True, text=True, check=True)
+        assert out.stdout.strip().splitlines()[-1] == "None"
+    finally:
+        owner.close()
+
+
+def test_zero_capacity_disables_the_cache(tmp_path):
+    cache = EmbeddingCache(capacity=0, dim=8, path=os.path.join(tmp_path, "cache"))
+    cache.put("a", vector(1))
+    assert cache.get("a") is None
+    assert cache.get_or_compute(["x", "y"], lambda texts: [vector(len(t)) for t in texts]) == [vector(1)] * 2
+    assert cache.stats()["size"] == 0
+    assert os.listdir(tmp_path) == []  # nothing allocated on disk
+    cache.close()
@@ -0,0 +1,30 @@
+# tests/test_fast_router.py
+"""Fast-path tool routing rules."""
+import pytest
+
+from benchmarks.bench_fast_router import LABELLED_QUERIES
+from reasoning.fast_router import route_by_rules
+
+
+@pytest.mark.parametrize("query, tool, args", LABELLED_QUERIES)
+def test_rules_never_pick_the_wrong_tool(query, tool, args):
+    routed = route_by_rules(query)
+    if routed is not None:  # no rule: the embedding fallback or the planner decides
+        assert routed == (tool, args)
+
+
+@pytest.mark.parametrize("query", [
+    "what's my RAM", "how much disk space do I have left", "check my memory usage", "check disk space",
+    "how much free space is available on this machine", "system stats",
+])
+def test_system_stats_about_this_machine(query):
+    assert route_by_rules(query) == ("get_system_stats", {})
+
+
+@pytest.mark.parametrize("query", [
+    "what is the price of 16GB RAM", "what's the best cloud storage", "show me how SSD storage works",
+    "how much RAM does a MacBook Pro have", "check the reviews of this disk",
+])
+def test_system_stats_not_for_general_questions(query):
+    routed = route_by_rules(query)
+    assert routed is None or routed[0] != "get_system_stats"
@@ -0,0 +1,110 @@
+# tests/test_history.py
+"""The planner's history window and the compaction of the stored history."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph.message import add_messages
+
+from reasoning.history_manager import HistoryWindow, compact_history, is_summary_message
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_turn(i):
+    return [
+        HumanMessage(content=f"question {i}"),
+        AIMessage(content="", tool_calls=[{"id": f"tool_{i}", "name": "search_web", "args": {"query": f"q{i}"}}]),
+        ToolMessage(content=f"result {i}", tool_call_id=f"tool_{i}"),
+        AIMessage(content=f"answer {i}"),
+    ]
+
+
+def history(start, end):
+    return [m for i in range(start, end) for m in make_turn(i)]
+
+
+def compacted(messages, **kwargs):
+    return add_messages(messages, compact_history(messages, **kwargs))
+
+
+def test_nothing_to_compact_below_the_limit():
+    messages = add_messages([], history(0, 4))
+    assert compact_history(messages, max_turns=4, keep_turns=2) == []
+    assert compact_history(add_messages([], history(0, 10)), max_turns=0, keep_turns=2) == []
+
+
+def test_old_turns_become_one_summary_message():
+    messages = compacted(add_messages([], history(0, 6)), max_turns=4, keep_turns=2)
+
+    assert is_summary_message(messages[0])
+    assert messages[0].content.splitlines() == [
+        f"User asked: question {i} (tools: search_web) → JARVIS: answer {i}" for i in range(4)]
+    assert len(messages) == 1 + 2 * 4
+    assert [m.content for m in messages[1:] if m.type == "human"] == ["question 4", "question 5"]
+
+
+def test_compaction_extends_the_existing_summary():
+    messages = compacted(add_messages([], history(0, 6)), max_turns=4, keep_turns=2)
+    messages = compacted(add_messages(messages, history(6, 9)), max_turns=4, keep_turns=2)
+
+    assert sum(is_summary_message(m) for m in messages) == 1
+    assert len(messages[0].content.splitlines()) == 7
+    assert [m.content for m in messages if m.type == "human"] == ["question 7", "question 8"]
+
+
+def test_summary_is_capped_and_counts_dropped_turns():
+    messages = compacted(add_messages([], history(0, 30)), max_turns=4, keep_turns=2, summary_tokens=60)
+    summary = messages[0]
+    assert summary.additional_kwargs["dropped_turns"] + len(summary.content.splitlines()) == 28
+
+
+def test_window_shows_the_stored_summary():
+    messages = compacted(add_messages([], history(0, 6)), max_turns=4, keep_turns=2)
+    text = HistoryWindow().update(messages)
+    assert text.startswith("Earlier in this conversation (summarised):\n- User asked: question 0")
+    assert "User: question 5" in text
+
+
+def test_window_resets_after_compaction():
+    window = HistoryWindow()
+    messages = add_messages([], history(0, 6))
+    window.update(messages)
+    messages = compacted(add_messages(messages, history(6, 8)), max_turns=6, keep_turns=2)
+    text = window.update(messages)
+    assert "User: question 1" not in text and "- User asked: question 1" in text
+    assert text.count("question 7") == 1
+
+
+def test_graph_checkpoint_stays_bounded(tmp_path):
+    # A real graph run, against the stub LLM, with hashed embeddings
+    script = textwrap.dedent("""
+        import json, os
+        from benchmarks.stub_llm import StubLLMServer
+        from benchmarks.bench_replay import HashEmbeddingModel
+        server = StubLLMServer(delay=0).start()
+        os.environ["PERPLEXITY_API_URL"] = server.url
+        import memory.local_embedding as local_embedding
+        local_embedding._embed_model_instance = HashEmbeddingModel()
+        from langchain_core.messages import HumanMessage
+        from graph.main_graph import get_graph, wait_for_memory_saves
+        graph = get_graph()
+        config = {"configurable": {"thread_id": "long"}}
+        for i in range(12):
+            graph.invoke({"messages": [HumanMessage(content=f"tell me a story, part {i}")]}, config=config)
+        wait_for_memory_saves()
+        messages = graph.get_state(config).values["messages"]
+        print(json.dumps([m.type for m in messages]))
+        server.stop()
+    """)
+    env = dict(os.environ, CHECKPOINT_BACKEND="memory", FAST_ROUTER_ENABLED="0",
+               HISTORY_STORED_MAX_TURNS="4", HISTORY_STORED_KEEP_TURNS="2")
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True,
+                         timeout=120)
+    assert out.returncode == 0, out.stderr[-2000:]
+    types = json.loads(out.stdout.strip().splitlines()[-1])
+    assert types[0] == "system"
+    assert types.count("human") <= 4
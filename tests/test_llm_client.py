@@ -0,0 +1,92 @@
+# tests/test_llm_client.py
+"""Retries and the circuit breaker of the LLM client, against mocked transports."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from perception.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMError
+
+COMPLETION = {"choices": [{"message": {"content": "hi"}}]}
+
+
+def make_client(handler, **kwargs):
+    client = LLMClient(url="http://llm.test/chat", api_key="offline", backoff_base=0, **kwargs)
+    client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def open_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    breaker = open_breaker()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    time.sleep(0.06)
+    breaker.allow()  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_apost_retries_server_errors():
+    statuses = iter([503, 502, 200])
+
+    def handler(request):
+        status = next(statuses)
+        return httpx.Response(status, json=COMPLETION if status == 200 else {})
+
+    client = make_client(handler, max_retries=2)
+    assert asyncio.run(client.apost({})) == COMPLETION
+    assert client.stats()["retries"] == 2
+
+
+def test_unexpected_client_error_is_an_llm_error_and_ends_the_trial():
+    def handler(request):
+        raise httpx.DecodingError("bad gzip")  # an httpx.HTTPError that is not retried
+
+    breaker = open_breaker()
+    client = make_client(handler, breaker=breaker)
+    time.sleep(0.06)
+    with pytest.raises(LLMError):
+        asyncio.run(client.apost({}))
+    assert breaker.state == "open"  # the failed trial reopened it
+    time.sleep(0.06)
+    breaker.allow()  # and a later trial is possible
+
+
+def test_cancelled_trial_does_not_leave_the_circuit_stuck():
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=COMPLETION)
+
+    breaker = open_breaker()
+    client = make_client(handler, breaker=breaker)
+    time.sleep(0.06)
+
+    async def run():
+        call = asyncio.create_task(client.apost({}))
+        await asyncio.sleep(0.01)
+        call.cancel()  # e.g. the request timed out
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(run())
+    time.sleep(0.06)
+    breaker.allow()
+
+
+def test_sync_client_error_is_an_llm_error():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = LLMClient(url="http://", api_key="offline", breaker=breaker)  # requests.InvalidURL
+    with pytest.raises(LLMError):
+        client.post({})
+    assert breaker.state == "open"
+    assert client.stats()["failures"] == 1
@@ -0,0 +1,23 @@
+# tests/test_memory_classifier.py
+"""Rule layer of the memory filter."""
+import pytest
+
+from reasoning.memory_classifier import classify_by_rules
+
+
+@pytest.mark.parametrize("query, decision", [
+    ("my name is Alice", "SAVE"),
+    ("I'm vegetarian, any dinner ideas?", "SAVE"),
+    ("I live in Oslo, what's the weather like?", "SAVE"),
+    ("can you remember that my dog is called Rex?", "SAVE"),
+    ("don't forget I have a meeting on Friday", "SAVE"),
+    ("what is my name?", "IGNORE"),
+    ("do you remember my name?", "IGNORE"),
+    ("do you know my birthday?", "IGNORE"),
+    ("is it going to rain tomorrow?", "IGNORE"),
+    ("thanks", "IGNORE"),
+    ("play some jazz", "IGNORE"),
+    ("tell me a joke about cats", None),
+])
+def test_memory_rules(query, decision):
+    assert classify_by_rules(query) == decision
@@ -0,0 +1,67 @@
+# tests/test_memory_store.py
+"""Long-term memory writes: dedup without the hot cache, idempotent retries, the job lease."""
+import time
+
+import numpy as np
+import pytest
+from llama_index.core.vector_stores import SimpleVectorStore
+
+import memory.llama_index_memory as llama_index_memory
+from memory.llama_index_memory import MemoryService, _node_id
+from utils.shared_state import InProcessStore, SqliteStore
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@pytest.fixture
+def service():
+    service = MemoryService(backend="simple")
+    service.get_index()
+    return service
+
+
+def test_dedup_in_a_namespace_too_large_for_the_hot_cache(service):
+    service.store_many(["my dog is called Rex"], [unit(1, 0)], "big")
+    service.hot_cache.max_rows = 0
+    service.hot_cache.invalidate("big")
+    assert service.hot_cache.get("big") is None  # now answered by the store
+
+    assert service.store_many(["My dog is called Rex."], [unit(1, 0.01)], "big") == 0
+    assert service.store_many(["my cat is called Tom"], [unit(0, 1)], "big") == 1
+    # Only the namespace's own memories count as duplicates
+    assert service.store_many(["my dog is called Rex"], [unit(1, 0)], "other") == 1
+
+
+def test_retry_replaces_the_rows_of_the_failed_attempt(service, monkeypatch):
+    monkeypatch.setattr(llama_index_memory, "MEMORY_DEDUP_THRESHOLD", 0)
+    service.store_many(["my dog is called Rex"], [unit(1, 0)], "ns", created_at=[1000.0])
+
+    deleted = []
+    delete_nodes = SimpleVectorStore.delete_nodes
+    monkeypatch.setattr(SimpleVectorStore, "delete_nodes",
+                        lambda store, ids, **kwargs: deleted.extend(ids) or delete_nodes(store, ids, **kwargs))
+    service.store_many(["my dog is called Rex"], [unit(1, 0)], "ns", created_at=[1000.0], replace=True)
+
+    assert deleted == [_node_id("ns", "my dog is called Rex", 1000.0)]
+    assert service.count() == 1
+
+
+def test_node_ids_are_deterministic():
+    assert _node_id("ns", "fact", 1.5) == _node_id("ns", "fact", 1.5)
+    assert _node_id("ns", "fact", 1.5) != _node_id("ns", "fact", 2.5)
+    assert _node_id("ns", "fact", 1.5) != _node_id("other", "fact", 1.5)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_lease_has_one_owner_until_it_expires(backend, tmp_path):
+    store = InProcessStore() if backend == "memory" else SqliteStore(str(tmp_path / "shared.sqlite"))
+    assert store.acquire("jobs", "consolidation", "worker-1", ttl=0.1)
+    assert not store.acquire("jobs", "consolidation", "worker-2", ttl=0.1)
+    assert store.acquire("jobs", "consolidation", "worker-1", ttl=0.1)  # renewal
+    time.sleep(0.15)
+    assert store.acquire("jobs", "consolidation", "worker-2", ttl=0.1)
+    assert not store.acquire("jobs", "consolidation", "worker-1", ttl=0.1)
@@ -0,0 +1,31 @@
+# tests/test_replay.py
+"""A short bench_replay run (stub LLM, hashed embeddings: nothing is downloaded), with its regression limits."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous for a shared CI machine; a regression (a serialized stage, an extra
+# LLM call per turn) shows up well above these
+MAX_P95_MS = 2000
+MAX_LLM_CALLS_PER_TURN = 1.5
+
+
+def test_short_replay_within_limits(tmp_path):
+    results_path = os.path.join(tmp_path, "replay.json")
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_replay", "--sessions", "12", "--long-turns", "4",
+         "--rounds", "1", "--delay", "0.01", "--tool-delay", "0.005",
+         "--max-p95-ms", str(MAX_P95_MS), "--max-llm-calls-per-turn", str(MAX_LLM_CALLS_PER_TURN),
+         "--json", results_path],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    assert out.returncode == 0, out.stdout[-2000:] + out.stderr[-2000:]
+
+    with open(results_path) as f:
+        results = json.load(f)
+    assert results["turns"] > 0
+    # Only planner calls: the memory filter and tool-call repair must not need the LLM here
+    assert set(results["llm_calls_by_purpose"]) <= {"planner"}
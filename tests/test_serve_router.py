@@ -0,0 +1,100 @@
+# tests/test_serve_router.py
+"""The SESSION_AFFINITY=1 router: session hashing and the service-wide endpoints."""
+import asyncio
+import json
+import zlib
+from collections import Counter
+
+import httpx
+
+from serve import AffinityRouter
+
+UPSTREAMS = [f"http://127.0.0.1:{8001 + i}" for i in range(4)]
+
+
+def test_pick_is_stable_per_session():
+    router = AffinityRouter(UPSTREAMS)
+    # crc32, not hash(): every router process (and restart) must agree
+    for i in range(50):
+        session = f"session_{i}"
+        assert router.pick(session) == UPSTREAMS[zlib.crc32(session.encode()) % len(UPSTREAMS)]
+        assert router.pick(session) == AffinityRouter(UPSTREAMS).pick(session)
+
+
+def test_pick_spreads_sessions():
+    router = AffinityRouter(UPSTREAMS)
+    counts = Counter(router.pick(f"user-{i}") for i in range(400))
+    assert set(counts) == set(UPSTREAMS)
+    assert min(counts.values()) > 400 / len(UPSTREAMS) / 2
+
+
+def test_pick_round_robins_without_a_session():
+    router = AffinityRouter(UPSTREAMS)
+    assert [router.pick(None) for _ in range(8)] == UPSTREAMS * 2
+
+
+def test_session_of():
+    assert AffinityRouter.session_of({b"x-session-id": b"abc"}, b'{"session_id": "xyz"}') == "abc"
+    assert AffinityRouter.session_of({}, b'{"session_id": "xyz", "query": "hi"}') == "xyz"
+    assert AffinityRouter.session_of({}, b'{"session_id": 7}') == "7"
+    assert AffinityRouter.session_of({}, b"{not json") is None
+    assert AffinityRouter.session_of({}, b"[1, 2]") is None
+    assert AffinityRouter.session_of({}, b"") is None
+
+
+def test_merge_metrics_labels_each_worker():
+    text = ("# HELP jarvis_requests_total Requests.\n"
+            "# TYPE jarvis_requests_total counter\n"
+            'jarvis_requests_total{path="/chat"} 3\n'
+            "# HELP jarvis_latency_seconds Latency.\n"
+            "# TYPE jarvis_latency_seconds histogram\n"
+            'jarvis_latency_seconds_bucket{le="0.1"} 1\n'
+            "jarvis_latency_seconds_sum 0.05\n"
+            "jarvis_latency_seconds_count 1\n")
+    merged = AffinityRouter.merge_metrics([text, text]).splitlines()
+
+    assert merged.count("# TYPE jarvis_requests_total counter") == 1
+    assert merged.count("# TYPE jarvis_latency_seconds histogram") == 1
+    assert 'jarvis_requests_total{worker="0",path="/chat"} 3' in merged
+    assert 'jarvis_requests_total{worker="1",path="/chat"} 3' in merged
+    assert 'jarvis_latency_seconds_count{worker="1"} 1' in merged
+    # Each family's samples follow its own HELP / TYPE lines
+    latency_type = merged.index("# TYPE jarvis_latency_seconds histogram")
+    assert all(i > latency_type for i, line in enumerate(merged) if line.startswith("jarvis_latency"))
+    assert all(i < latency_type for i, line in enumerate(merged) if line.startswith("jarvis_requests"))
+
+
+def _aggregate(router, path, handler):
+    async def run():
+        router._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await router._aggregate(path)
+        finally:
+            await router._client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_ready_needs_every_worker():
+    router = AffinityRouter(UPSTREAMS[:2])
+
+    def handler(request):
+        ready = request.url.port == 8001
+        return httpx.Response(200 if ready else 503, json={"status": "ready" if ready else "loading"})
+
+    status, _, body = _aggregate(router, "/ready", handler)
+    assert status == 503
+    body = json.loads(body)
+    assert body["status"] == "loading"
+    assert set(body["workers"]) == set(UPSTREAMS[:2])
+
+    status, _, body = _aggregate(router, "/ready", lambda request: httpx.Response(200, json={"status": "ready"}))
+    assert status == 200 and json.loads(body)["status"] == "ready"
+
+
+def test_stats_lists_every_worker():
+    router = AffinityRouter(UPSTREAMS[:2])
+    status, _, body = _aggregate(router, "/stats",
+                                 lambda request: httpx.Response(200, json={"port": request.url.port}))
+    assert status == 200
+    assert json.loads(body)["workers"] == {UPSTREAMS[0]: {"port": 8001}, UPSTREAMS[1]: {"port": 8002}}
@@ -0,0 +1,81 @@
+# tests/test_session_scheduler.py
+"""Per-session turn ordering in the API."""
+import asyncio
+
+import pytest
+
+from api import SessionBusyError, SessionScheduler
+
+
+def test_turns_of_a_session_run_one_at_a_time_in_order():
+    scheduler, log = SessionScheduler(), []
+
+    async def turn(session, i, delay):
+        async with scheduler.turn(session):
+            log.append((session, i, "start"))
+            await asyncio.sleep(delay)
+            log.append((session, i, "end"))
+
+    async def run():
+        # Later turns are faster: without the scheduler they would overtake
+        await asyncio.gather(*(turn("a", i, 0.03 - i * 0.01) for i in range(3)))
+
+    asyncio.run(run())
+    assert log == [("a", i, step) for i in range(3) for step in ("start", "end")]
+    assert scheduler.stats()["sessions"] == 0
+
+
+def test_different_sessions_run_concurrently():
+    scheduler, running, peak = SessionScheduler(), [0], [0]
+
+    async def turn(session):
+        async with scheduler.turn(session):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.02)
+            running[0] -= 1
+
+    async def run():
+        await asyncio.gather(*(turn(f"s{i}") for i in range(4)))
+
+    asyncio.run(run())
+    assert peak[0] == 4
+
+
+def test_full_queue_is_rejected():
+    scheduler = SessionScheduler(max_queued=1)
+
+    async def turn():
+        async with scheduler.turn("a"):
+            await asyncio.sleep(0.05)
+
+    async def run():
+        return await asyncio.gather(*(turn() for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, SessionBusyError) for r in results) == 2
+    assert scheduler.stats()["rejected"] == 2
+
+
+def test_cancelled_waiter_does_not_block_the_session():
+    scheduler, log = SessionScheduler(), []
+
+    async def turn(i):
+        async with scheduler.turn("a"):
+            log.append(i)
+            await asyncio.sleep(0.02)
+
+    async def run():
+        first = asyncio.create_task(turn(0))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(turn(1))
+        third = asyncio.create_task(turn(2))
+        await asyncio.sleep(0.005)
+        second.cancel()  # client went away while queued
+        await asyncio.gather(first, third)
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+    asyncio.run(run())
+    assert log == [0, 2]
+    assert scheduler.stats()["sessions"] == 0
@@ -0,0 +1,90 @@
+# tests/test_single_flight.py
+"""Coalescing of identical in-flight calls, across threads and coroutines."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_do_coalesces_threads():
+    flight, calls = SingleFlight("test"), []
+    started = threading.Event()
+
+    def fn():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "key", fn)
+        started.wait()
+        followers = [pool.submit(flight.do, "key", fn) for _ in range(3)]
+        results = [leader.result()] + [f.result() for f in followers]
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 4, "coalesced": 3, "in_flight": 0}
+
+
+def test_ado_shares_the_exception():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flight.ado("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["coalesced"] == 2
+
+
+def test_cancelled_leader_leaves_the_followers_their_result():
+    flight, calls = SingleFlight("test"), []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def run():
+        leader = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.ado("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()  # e.g. the leader's tool timed out
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(run()) == ["result", "result"]
+    assert len(calls) == 1
+
+
+def test_call_is_cancelled_once_every_caller_gave_up():
+    flight = SingleFlight("test")
+
+    async def run():
+        finished = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                finished.set()
+
+        callers = [asyncio.create_task(flight.ado("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(finished.wait(), 1)
+        return flight.stats()["in_flight"]
+
+    assert asyncio.run(run()) == 0
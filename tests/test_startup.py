@@ -0,0 +1,58 @@
+# tests/test_startup.py
+"""Import-time budget of the entry points, and /ready's view of the warm-up."""
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import MODULES, import_time
+from utils import warmup
+
+IMPORT_BUDGET_S = 3.0
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_within_budget(module):
+    assert min(import_time(module) for _ in range(2)) <= IMPORT_BUDGET_S
+
+
+def test_api_import_does_not_load_the_model():
+    code = "import api, sys; print('torch' in sys.modules or 'sentence_transformers' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "False"
+
+
+@pytest.fixture
+def components(monkeypatch):
+    """Replaces the real components with one that fails `failures` times before loading."""
+    state = {"failures": 0, "calls": 0, "loaded": False}
+
+    def loader():
+        state["calls"] += 1
+        if state["calls"] <= state["failures"]:
+            raise ConnectionError("database not up yet")
+        state["loaded"] = True
+
+    monkeypatch.setattr(warmup, "COMPONENTS", {"store": (loader, lambda: state["loaded"])})
+    monkeypatch.setattr(warmup, "_status", {"store": {"state": "pending"}})
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0.01)
+    return state
+
+
+def test_warm_up_retries_a_failed_component(components):
+    components["failures"] = 2
+    asyncio.run(warmup.warm_up())
+    assert components["calls"] == 3
+    assert warmup.is_ready()
+
+
+def test_readiness_follows_a_lazy_load(components, monkeypatch):
+    components["failures"] = 1
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0)  # no retries: only a request can load it now
+    asyncio.run(warmup.warm_up())
+    assert warmup.readiness()["store"]["state"] == "failed"
+    assert not warmup.is_ready()
+
+    components["loaded"] = True  # loaded on first use by a request
+    assert warmup.is_ready()
@@ -0,0 +1,79 @@
+# tests/test_stream_repair.py
+"""A repaired planner reply must not leave the broken reply's prose in the streamed answer."""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = textwrap.dedent("""
+    import asyncio, json, os, sys
+    from benchmarks.stub_llm import StubLLMServer
+    from benchmarks.bench_replay import HashEmbeddingModel
+
+    REPAIRED = sys.argv[1] == "repaired"
+    BROKEN_CALL = '{"tool_name": "launch_rocket", "parameters": {}}'
+
+    def reply(prompt):
+        if "Memory filter" in prompt:
+            return "IGNORE"
+        if "could not be used" in prompt:
+            return "The capital of France is Paris." if REPAIRED else BROKEN_CALL
+        return "Let me look that up for you. " + BROKEN_CALL
+
+    server = StubLLMServer(delay=0, reply=reply).start()
+    os.environ["PERPLEXITY_API_URL"] = server.url
+    import memory.local_embedding as local_embedding
+    local_embedding._embed_model_instance = HashEmbeddingModel()
+    from api import stream_events
+    from graph.main_graph import wait_for_memory_saves
+
+    async def collect():
+        events = []
+        async for frame in stream_events("what is the capital of France?", "stream-repair"):
+            lines = frame.strip().splitlines()
+            events.append([lines[0][len("event: "):], json.loads(lines[1][len("data: "):])])
+        return events
+
+    events = asyncio.run(collect())
+    wait_for_memory_saves()
+    server.stop()
+    print(json.dumps(events))
+""")
+
+
+def run_stream(case):
+    env = dict(os.environ, CHECKPOINT_BACKEND="memory", FAST_ROUTER_ENABLED="0")
+    out = subprocess.run([sys.executable, "-c", SCRIPT, case], cwd=ROOT, env=env, capture_output=True,
+                         text=True, timeout=120)
+    assert out.returncode == 0, out.stderr[-2000:]
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def shown_text(events):
+    """What a client that honours reset events ends up displaying."""
+    text = ""
+    for event, data in events:
+        if event == "reset":
+            text = ""
+        elif event == "token":
+            text += data["text"]
+    return text
+
+
+def test_repair_resets_the_streamed_prose():
+    events = run_stream("repaired")
+    names = [event for event, _ in events]
+    # The broken reply's prose went out before the repair was known to be needed
+    assert names.index("token") < names.index("reset")
+    assert shown_text(events) == "The capital of France is Paris."
+    assert events[-1] == ["done", {"response": "The capital of France is Paris."}]
+
+
+def test_failed_repair_keeps_the_streamed_prose():
+    events = run_stream("failed")
+    assert "reset" not in [event for event, _ in events]
+    assert shown_text(events).strip() == "Let me look that up for you."
+    assert events[-1][1]["response"] == "Let me look that up for you."
@@ -0,0 +1,55 @@
+# tests/test_tool_cache.py
+"""Tool result cache: entries shared between workers keep their original expiry."""
+import time
+
+import pytest
+
+from tools.tool_cache import ToolResultCache
+from utils.shared_state import SqliteStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Moves time.time and time.monotonic forward together."""
+    offset = [0.0]
+    real_time, real_monotonic = time.time, time.monotonic
+    monkeypatch.setattr(time, "time", lambda: real_time() + offset[0])
+    monkeypatch.setattr(time, "monotonic", lambda: real_monotonic() + offset[0])
+    return offset
+
+
+def test_shared_hit_is_cached_locally_for_the_remaining_ttl(tmp_path, clock):
+    store = SqliteStore(str(tmp_path / "shared.db"))
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        return f"result for {query}"
+
+    worker_a = ToolResultCache({"search": 60}, store=store)
+    worker_b = ToolResultCache({"search": 60}, store=store)
+
+    assert worker_a.call("search", search, {"query": "oslo"}) == "result for oslo"
+    clock[0] = 50
+    assert worker_b.call("search", search, {"query": "oslo"}) == "result for oslo"
+    assert worker_b.stats()["tools"]["search"]["shared_hits"] == 1
+    assert len(calls) == 1
+
+    # 61s after worker A ran the tool the result is stale everywhere, including worker B's copy
+    clock[0] = 61
+    worker_b.call("search", search, {"query": "oslo"})
+    assert len(calls) == 2
+
+
+def test_own_results_keep_the_full_ttl(tmp_path, clock):
+    cache = ToolResultCache({"search": 60}, store=SqliteStore(str(tmp_path / "shared.db")))
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        return "result"
+
+    cache.call("search", search, {"query": "oslo"})
+    clock[0] = 59
+    cache.call("search", search, {"query": "oslo"})
+    assert len(calls) == 1
@@ -0,0 +1,72 @@
+# tests/test_tool_call_parser.py
+"""Planner-output parsing, and the streaming scanner's agreement with it."""
+import random
+
+import pytest
+
+from benchmarks.bench_tool_call_parser import SCHEMAS, make_case
+from reasoning.tool_call_parser import ToolCallScanner, parse_tool_calls
+
+CALL = '{"tool_name": "search_web", "parameters": {"query": "weather in Oslo"}}'
+
+
+def scan(text, size):
+    scanner = ToolCallScanner()
+    released = "".join(scanner.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return scanner, released + scanner.finish()
+
+
+@pytest.mark.parametrize("text", [
+    CALL,
+    f"```json\n{CALL}\n```",
+    f"Sure, let me check that.\n{CALL}",
+    "{'tool_name': 'search_web', 'parameters': {'query': 'weather in Oslo',},}",
+    CALL[:-1],  # truncated
+])
+def test_parse_tool_call_variants(text):
+    result = parse_tool_calls(text, SCHEMAS)
+    assert result.kind == "tool_calls"
+    assert result.calls == [{"name": "search_web", "args": {"query": "weather in Oslo"}}]
+
+
+def test_parse_answer_with_braces():
+    text = 'In Python a dict looks like {"a": 1, "b": 2}.'
+    result = parse_tool_calls(text, SCHEMAS)
+    assert result.kind == "answer" and result.answer == text
+
+
+def test_parse_unknown_tool_is_invalid():
+    result = parse_tool_calls('{"tool_name": "launch_rocket", "parameters": {}}', SCHEMAS)
+    assert result.kind == "invalid" and result.errors
+
+
+@pytest.mark.parametrize("size", [10_000, 4, 1])
+def test_scanner_prose_then_call(size):
+    # In one chunk the call closes in the same feed() that decides the head:
+    # it must still be recognised and not released as answer text
+    scanner, released = scan(f"Sure, let me check that.\n{CALL}", size)
+    assert scanner.is_tool_call is True
+    assert CALL not in released
+
+
+@pytest.mark.parametrize("size", [10_000, 4])
+def test_scanner_answer_is_released_whole(size):
+    text = 'In Python a dict looks like {"a": 1, "b": 2}.'
+    scanner, released = scan(text, size)
+    assert scanner.is_tool_call is False
+    assert released == text
+
+
+@pytest.mark.parametrize("size", [10_000, 4])
+def test_scanner_agrees_with_parser(size):
+    r = random.Random(0)
+    disagree = []
+    for _ in range(500):
+        text, _, _ = make_case(r)
+        result = parse_tool_calls(text, SCHEMAS)
+        if result.kind == "invalid":
+            continue
+        scanner, _ = scan(text, size)
+        if scanner.is_tool_call != (result.kind == "tool_calls"):
+            disagree.append(text)
+    assert disagree == []
@@ -0,0 +1,55 @@
+# tests/test_write_behind.py
+"""Failure isolation and retries in the memory write-behind queue."""
+import pytest
+
+import memory.llama_index_memory
+import memory.local_embedding
+from memory.write_behind import MemoryWriteQueue
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Records store_memories calls; namespaces in `failing` fail that many more times."""
+    state = {"calls": [], "failing": {}}
+
+    def store_memories(texts, embeddings, namespace, created_at=None, replace=False):
+        state["calls"].append((namespace, list(texts), list(created_at), replace))
+        if state["failing"].get(namespace, 0) > 0:
+            state["failing"][namespace] -= 1
+            raise ConnectionError("vector store unavailable")
+
+    monkeypatch.setattr(memory.llama_index_memory, "store_memories", store_memories)
+    monkeypatch.setattr(memory.local_embedding, "get_embedding", lambda texts: [[0.0] * 4 for _ in texts])
+    return state
+
+
+def make_queue(**kwargs):
+    return MemoryWriteQueue(batch_size=8, max_wait_ms=20, retry_seconds=0.01, **kwargs)
+
+
+def test_failed_namespace_is_retried_without_dropping_the_others(writes):
+    writes["failing"]["bad"] = 1
+    q = make_queue()
+    q.submit_fact("my dog is called Rex", "good")
+    q.submit_fact("my cat is called Tom", "bad")
+    assert q.flush(timeout=5)
+
+    good = [c for c in writes["calls"] if c[0] == "good"]
+    bad = [c for c in writes["calls"] if c[0] == "bad"]
+    assert len(good) == 1
+    assert len(bad) == 2
+    # The retry replaces whatever the failed insert left behind, with the same node ids
+    assert bad[1][3] is True and bad[1][2] == bad[0][2]
+    stats = q.stats()
+    assert stats["retried"] == 1 and stats["failed"] == 0 and stats["processed"] == 2
+
+
+def test_fact_is_given_up_after_max_retries(writes):
+    writes["failing"]["bad"] = 100
+    q = make_queue(max_retries=2)
+    q.submit_fact("my cat is called Tom", "bad")
+    assert q.flush(timeout=5)
+
+    assert len(writes["calls"]) == 3
+    stats = q.stats()
+    assert stats["retried"] == 2 and stats["failed"] == 1 and stats["processed"] == 0
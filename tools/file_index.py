@@ -0,0 +1,286 @@
+# tools/file_index.py
+"""
+Persistent filename index for find_file.
+
+The directory tree is listed once and cached per directory together with its
+mtime; a refresh only re-lists directories whose mtime changed (stat'ing the
+rest). Lookups use a trigram index over the lower-cased file names, held as
+numpy arrays in CSR form, and rank candidates with fuzzy matching over the
+whole index rather than the first 100 hits of a walk.
+"""
+import difflib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.log import get_logger
+
+log = get_logger("tools")
+
+SKIP_DIRS = {
+    'Library', 'Application Support', 'node_modules', '.git',
+    '.cache', '.venv', 'venv', 'anaconda3', 'miniconda3',
+    'Applications', 'System', 'Pictures', 'Music', 'Movies', 'Public'
+}
+
+FILE_INDEX_PATH = os.getenv("FILE_INDEX_PATH", os.path.expanduser("~/.cache/jarvis/file_index.json"))
+FILE_INDEX_REFRESH_SECONDS = float(os.getenv("FILE_INDEX_REFRESH_SECONDS", 60))
+
+_SEPARATOR = ord("\n")
+
+
+def _fold(text: str) -> bytes:
+    """Lower-case, one byte per character (non-ASCII becomes '?')."""
+    return text.lower().encode("ascii", "replace")
+
+
+def _trigram_codes(data: np.ndarray) -> np.ndarray:
+    """21-bit code for every 3-byte window of a uint8 array."""
+    data = data.astype(np.int32) & 0x7F
+    return (data[:-2] << 14) | (data[1:-1] << 7) | data[2:]
+
+
+class FileIndex:
+    def __init__(self, root: str = None, path: str = FILE_INDEX_PATH,
+                 refresh_seconds: float = FILE_INDEX_REFRESH_SECONDS, skip_dirs=SKIP_DIRS):
+        self.root = os.path.realpath(os.path.expanduser(root or "~"))
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.skip_dirs = set(skip_dirs)
+
+        self._dirs = {}            # dir -> (mtime_ns, [files], [subdirs])
+        self._paths = []           # file id -> full path
+        self._names = []           # file id -> lower-cased basename
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._codes = np.zeros(0, dtype=np.int32)     # sorted trigram codes
+        self._offsets = np.zeros(1, dtype=np.int64)   # CSR offsets into _ids
+        self._ids = np.zeros(0, dtype=np.int32)
+        self._last_refresh = 0.0
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+
+    # -----------------------
+    # Directory scan
+    # -----------------------
+    def _scan(self):
+        """Walks the tree, re-listing only directories whose mtime changed."""
+        old, new = self._dirs, {}
+        relisted = 0
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = old.get(directory)
+            if cached is not None and cached[0] == mtime:
+                entry = cached
+            else:
+                files, subdirs = [], []
+                try:
+                    with os.scandir(directory) as it:
+                        for e in it:
+                            try:
+                                if e.is_dir(follow_symlinks=False):
+                                    if e.name not in self.skip_dirs and not e.name.startswith('.'):
+                                        subdirs.append(e.name)
+                                else:
+                                    files.append(e.name)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+                entry = (mtime, files, subdirs)
+                relisted += 1
+
+            new[directory] = entry
+            stack.extend(os.path.join(directory, d) for d in entry[2])
+        return new, relisted
+
+    def _build_postings(self, dirs):
+        paths, names = [], []
+        for directory, (_, files, _) in dirs.items():
+            for name in files:
+                paths.append(os.path.join(directory, name))
+                names.append(name.lower())
+
+        lengths = np.fromiter((len(n) for n in names), dtype=np.int64, count=len(names))
+        if not names:
+            return paths, names, lengths, np.zeros(0, np.int32), np.zeros(1, np.int64), np.zeros(0, np.int32)
+
+        # All names in one byte buffer, "\n"-separated, so every trigram is
+        # computed in a single vectorised pass.
+        blob = np.frombuffer(_fold("\n".join(names)) + b"\n", dtype=np.uint8)
+        owner = np.repeat(np.arange(len(names), dtype=np.int64), lengths + 1)
+
+        codes = _trigram_codes(blob)
+        valid = (blob[:-2] != _SEPARATOR) & (blob[1:-1] != _SEPARATOR) & (blob[2:] != _SEPARATOR)
+        # (code, id) pairs packed in one int64; sort + dedupe, then CSR by code
+        keys = np.sort((codes[valid].astype(np.int64) << 32) | owner[:-2][valid])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+        all_codes = (keys >> 32).astype(np.int32)
+        ids = (keys & 0xFFFFFFFF).astype(np.int32)
+        starts = np.flatnonzero(np.concatenate(([True], all_codes[1:] != all_codes[:-1])))
+        unique_codes = all_codes[starts]
+        offsets = np.append(starts, len(ids)).astype(np.int64)
+        return paths, names, lengths, unique_codes, offsets, ids
+
+    def _install(self, index):
+        (self._paths, self._names, self._lengths,
+         self._codes, self._offsets, self._ids) = index
+
+    def refresh(self):
+        """Rescans (incrementally) and swaps in a rebuilt index if anything changed."""
+        with self._build_lock:
+            start = time.perf_counter()
+            dirs, relisted = self._scan()
+            if relisted or not self._paths:
+                index = self._build_postings(dirs)
+                # Swap everything at once so concurrent lookups see a consistent index
+                self._dirs = dirs
+                self._install(index)
+                self._save()
+            else:
+                self._dirs = dirs
+            self._last_refresh = time.monotonic()
+            log.info(f"[FileIndex] {len(self._paths)} files, {relisted} dirs re-listed "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+    def _refresh_in_background(self):
+        if self._refreshing:
+            return
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        self._refreshing = True
+        threading.Thread(target=run, name="file-index-refresh", daemon=True).start()
+
+    def ensure_fresh(self):
+        """First call builds (or loads) the index; later calls refresh in the background."""
+        if not self._paths and not self._dirs:
+            if self._load():
+                self._refresh_in_background()
+            else:
+                self.refresh()
+        elif time.monotonic() - self._last_refresh > self.refresh_seconds:
+            self._refresh_in_background()
+
+    # -----------------------
+    # Persistence
+    # -----------------------
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"root": self.root, "dirs": self._dirs}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning(f"[FileIndex] Could not save index: {e}")
+
+    def _load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"[FileIndex] Could not load index: {e}")
+            return False
+        if data.get("root") != self.root:
+            return False
+        dirs = {d: (entry[0], entry[1], entry[2]) for d, entry in data["dirs"].items()}
+        index = self._build_postings(dirs)
+        with self._build_lock:
+            self._dirs = dirs
+            self._install(index)
+        return True
+
+    # -----------------------
+    # Lookup
+    # -----------------------
+    def _postings(self, code, codes, offsets, ids):
+        i = np.searchsorted(codes, code)
+        if i < len(codes) and codes[i] == code:
+            return ids[offsets[i]:offsets[i + 1]]
+        return np.zeros(0, dtype=np.int32)
+
+    def search(self, query: str, limit: int = 10, max_candidates: int = 64):
+        """Returns [(path, score)] best first."""
+        self.ensure_fresh()
+        # Local references: a background refresh may swap the index mid-search
+        paths, names, lengths = self._paths, self._names, self._lengths
+        codes, offsets, ids = self._codes, self._offsets, self._ids
+
+        q = query.lower().strip()
+        if not q or not names:
+            return []
+
+        folded = np.frombuffer(_fold(q), dtype=np.uint8)
+        if len(folded) >= 3:
+            query_codes = np.unique(_trigram_codes(folded))
+            postings = [self._postings(c, codes, offsets, ids) for c in query_codes]
+            # Shared-trigram counts per name (typo tolerant), pre-ranked by
+            # trigram Jaccard so difflib only scores the best few
+            counts = np.bincount(np.concatenate(postings), minlength=len(names))
+            found = np.flatnonzero(counts >= max(1, int(len(query_codes) * 0.4)))
+            if len(found) == 0:
+                return []
+            shared = counts[found]
+            jaccard = shared / (len(query_codes) + np.maximum(lengths[found] - 2, 1) - shared)
+            if len(found) > max_candidates:
+                top = np.argpartition(-jaccard, max_candidates - 1)[:max_candidates]
+                found = found[top]
+            candidates = found.tolist()
+        else:
+            # Too short for trigrams: substring scan over the names
+            candidates = [i for i, name in enumerate(names) if q in name][:max_candidates]
+
+        # The query is seq2 so difflib indexes it once for all candidates
+        matcher = difflib.SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(q)
+        scored = []
+        for i in candidates:
+            name = names[i]
+            stem = os.path.splitext(name)[0]
+            matcher.set_seq1(name)
+            score = matcher.ratio()
+            if q == name or q == stem:
+                score += 1.0
+            elif name.startswith(q):
+                score += 0.5
+            elif q in name:
+                score += 0.3
+            scored.append((score, -len(paths[i]), paths[i]))
+
+        scored.sort(reverse=True)
+        return [(path, round(score, 3)) for score, _, path in scored[:limit]]
+
+    def __len__(self):
+        return len(self._paths)
+
+
+_file_index = None
+_file_index_lock = threading.Lock()
+
+
+def get_file_index() -> FileIndex:
+    """Shared index over the user's home directory."""
+    global _file_index
+    if _file_index is None:
+        with _file_index_lock:
+            if _file_index is None:
+                _file_index = FileIndex()
+    return _file_index
@@ -0,0 +1,214 @@
+# tools/tool_cache.py
+"""
+Result cache for tool calls, keyed on tool name + normalized arguments.
+
+Each tool has its own TTL (0 disables caching for it). Entries are evicted
+LRU once `max_entries` is reached. Tools listed in `semantic_args` can also
+reuse a cached answer when a new query's embedding is close enough to a
+cached one (cosine >= `semantic_threshold`).
+
+With a shared store (several workers), exact-match results are also written
+there, so a result computed by one worker is a hit for all of them; semantic
+matching stays per worker. Shared entries carry their wall-clock expiry, and
+a worker that copies one keeps it only for the time it has left.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_args(args: dict) -> str:
+    """Case/whitespace-insensitive, order-independent argument key."""
+    def norm(value):
+        if isinstance(value, str):
+            return re.sub(r"\s+", " ", value.strip().lower()).rstrip("?!. ")
+        return value
+    return json.dumps({k: norm(v) for k, v in sorted(args.items())}, sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    def __init__(self, ttls: dict, max_entries: int = 1000, semantic_args: dict = None,
+                 semantic_threshold: float = 0.92, embed_fn=None, store=None):
+        self.ttls = ttls
+        self.store = store if store is not None and store.shared else None
+        self.max_entries = max_entries
+        self.semantic_args = semantic_args or {}
+        self.semantic_threshold = semantic_threshold
+        self.embed_fn = embed_fn
+        # (tool, arg_key) -> (expires_at, result, call_seconds, unit embedding or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _tool_stats(self, name):
+        return self._stats.setdefault(name, {"hits": 0, "semantic_hits": 0, "shared_hits": 0, "misses": 0,
+                                             "saved_seconds": 0.0})
+
+    @staticmethod
+    def _store_key(key):
+        return f"{key[0]}\x00{key[1]}"
+
+    def _lookup_shared(self, name, key, ttl):
+        """Result another worker cached (copied into this worker's cache), or None."""
+        if self.store is None:
+            return None
+        shared = self.store.get("tool_cache", self._store_key(key))
+        if shared is None:
+            return None
+        result, elapsed, expires_at = shared if len(shared) == 3 else (*shared, time.time() + ttl)
+        # Wall clock across workers; the local entry gets only what is left of the TTL
+        remaining = min(expires_at - time.time(), ttl)
+        if remaining <= 0:
+            return None
+        with self._lock:
+            stats = self._tool_stats(name)
+            stats["shared_hits"] += 1
+            stats["saved_seconds"] += elapsed
+            self._entries[key] = (time.monotonic() + remaining, result, elapsed, None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def _embed(self, text):
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _lookup_exact(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _lookup_semantic(self, name, vector, now):
+        best, best_score = None, self.semantic_threshold
+        for key, entry in self._entries.items():
+            if key[0] != name or entry[3] is None or entry[0] < now:
+                continue
+            score = float(entry[3] @ vector)
+            if score >= best_score:
+                best, best_score = key, score
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        return self._entries[best]
+
+    def _lookup(self, name, key, vector, now):
+        """Cached entry for the call (exact, then semantic when vector is given)."""
+        with self._lock:
+            stats = self._tool_stats(name)
+            entry = self._lookup_exact(key, now)
+            if entry is not None:
+                stats["hits"] += 1
+            elif vector is not None:
+                entry = self._lookup_semantic(name, vector, now)
+                if entry is not None:
+                    stats["semantic_hits"] += 1
+            if entry is None:
+                return None
+            stats["saved_seconds"] += entry[2]
+            return entry
+
+    def _miss(self, name):
+        with self._lock:
+            self._tool_stats(name)["misses"] += 1
+
+    def _store(self, key, ttl, result, elapsed, vector):
+        # Don't remember failures
+        if isinstance(result, str) and result.startswith("Error"):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result, elapsed, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.store is not None:
+            self.store.set("tool_cache", self._store_key(key), (result, elapsed, time.time() + ttl), ttl=ttl)
+
+    def _semantic_text(self, name, args):
+        semantic_arg = self.semantic_args.get(name) if self.embed_fn else None
+        if semantic_arg and isinstance(args.get(semantic_arg), str):
+            return args[semantic_arg]
+        return None
+
+    def call(self, name: str, func, args: dict):
+        """Runs func(**args) unless a fresh cached result exists."""
+        ttl = self.ttls.get(name, 0)
+        if ttl <= 0:
+            return func(**args)
+
+        key = (name, normalize_args(args))
+        now = time.monotonic()
+        entry = self._lookup(name, key, None, now)
+        if entry is not None:
+            return entry[1]
+        shared = self._lookup_shared(name, key, ttl)
+        if shared is not None:
+            return shared
+
+        vector = None
+        text = self._semantic_text(name, args)
+        if text is not None:
+            vector = self._embed(text)
+            entry = self._lookup(name, key, vector, now)
+            if entry is not None:
+                return entry[1]
+
+        self._miss(name)
+        start = time.perf_counter()
+        result = func(**args)
+        self._store(key, ttl, result, time.perf_counter() - start, vector)
+        return result
+
+    async def acall(self, name: str, afunc, args: dict):
+        """Async variant of call() for coroutine tools."""
+        ttl = self.ttls.get(name, 0)
+        if ttl <= 0:
+            return await afunc(**args)
+
+        key = (name, normalize_args(args))
+        now = time.monotonic()
+        entry = self._lookup(name, key, None, now)
+        if entry is not None:
+            return entry[1]
+        shared = self._lookup_shared(name, key, ttl)
+        if shared is not None:
+            return shared
+
+        vector = None
+        text = self._semantic_text(name, args)
+        if text is not None:
+            vector = await asyncio.to_thread(self._embed, text)
+            entry = self._lookup(name, key, vector, now)
+            if entry is not None:
+                return entry[1]
+
+        self._miss(name)
+        start = time.perf_counter()
+        result = await afunc(**args)
+        self._store(key, ttl, result, time.perf_counter() - start, vector)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            per_tool = {name: dict(s) for name, s in self._stats.items()}
+            size = len(self._entries)
+        for s in per_tool.values():
+            hits = s["hits"] + s["semantic_hits"] + s["shared_hits"]
+            lookups = hits + s["misses"]
+            s["hit_rate"] = hits / lookups if lookups else 0.0
+        return {"size": size, "max_entries": self.max_entries, "tools": per_tool}
@@ -5,23 +5,43 @@ import os
 import subprocess
 import shlex
 import psutil
-import difflib
-from perception.perplexity_api import perplexity_search
-from memory.llama_index_memory import store_memory, retrieve_relevant_memory
+import asyncio
+import inspect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from contextvars import ContextVar
+from perception.perplexity_api import perplexity_search, aperplexity_search
+from memory.write_behind import memory_write_queue
+from tools.tool_cache import ToolResultCache, normalize_args
+from tools.file_index import get_file_index
+from reasoning.history_manager import estimate_tokens
+from utils.log import get_logger
+from utils.metrics import span
+from utils.shared_state import get_shared_store
+from utils.single_flight import SingleFlight
+
+log = get_logger("tools")
 
 # --- Tool 1: Web Search ---
 def search_web(query: str):
     """search_web(query: str): Searches the web for an answer to a user's query. Use this for facts, news, or general knowledge."""
-    print(f"🤖 [Tool] Searching web for: {query}")
+    log.info(f"🤖 [Tool] Searching web for: {query}")
     return perplexity_search(query)
 
+async def asearch_web(query: str):
+    """Non-blocking search_web, used when tools run on the event loop."""
+    log.info(f"🤖 [Tool] Searching web for: {query}")
+    return await aperplexity_search(query)
+
 # --- Tool 2: Play Music ---
 def play_song_on_youtube(song_query: str):
     """play_song_on_youtube(song_query: str): Opens a YouTube search in a web browser for the requested song. Use this when a user asks to play a song."""
     search_query = re.sub(r'\s+', '+', song_query)
     url = f"https://www.youtube.com/results?search_query={search_query}"
     try:
-        print(f"🤖 [Tool] Opening browser to search for: {song_query}")
+        log.info(f"🤖 [Tool] Opening browser to search for: {song_query}")
         webbrowser.open(url)
         return f"Successfully opened YouTube search for '{song_query}'."
     except Exception as e:
@@ -30,7 +50,7 @@ def play_song_on_youtube(song_query: str):
 # --- Tool 3: List Files ---
 def list_files(directory: str = "."):
     """list_files(directory: str): Lists files and folders in a specified directory. The default is the current directory ('.')."""
-    print(f"🤖 [Tool] Listing files in: {directory}")
+    log.info(f"🤖 [Tool] Listing files in: {directory}")
     safe_path = os.path.realpath(os.path.expanduser(directory))
     if not os.path.isdir(safe_path):
         return f"Error: '{directory}' is not a valid directory."
@@ -43,7 +63,7 @@ def list_files(directory: str = "."):
 # --- Tool 4: Open Path ---
 def open_path(path: str):
     """open_path(path: str): Opens a specific file or directory using the system's default application (e.g., '~/Downloads/file.pdf')."""
-    print(f"🤖 [Tool] Opening path: {path}")
+    log.info(f"🤖 [Tool] Opening path: {path}")
     safe_path = os.path.realpath(os.path.expanduser(path))
     if not os.path.exists(safe_path):
         return f"Error: Path '{path}' does not exist."
@@ -58,7 +78,7 @@ def open_path(path: str):
 # --- Tool 5: Get System Stats ---
 def get_system_stats():
     """get_system_stats(): Gets system RAM and disk space."""
-    print("🤖 [Tool] Getting system stats")
+    log.info("🤖 [Tool] Getting system stats")
     mem = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
     return f"RAM: {mem.available / (1024**3):.2f}GB available. Disk: {disk.free / (1024**3):.2f}GB free."
@@ -66,58 +86,48 @@ def get_system_stats():
 # --- Tool 6: Find File ---
 def find_file(filename: str):
     """find_file(filename: str): Searches the user's home directory for a file by name. Returns the path of the closest match."""
-    print(f"🤖 [Tool] Searching for file: {filename}")
-    start_dir = os.path.expanduser('~')
-    matches = []
-    
-    # Folders to skip for speed
-    skip_dirs = {
-        'Library', 'Application Support', 'node_modules', '.git', 
-        '.cache', '.venv', 'venv', 'anaconda3', 'miniconda3',
-        'Applications', 'System', 'Pictures', 'Music', 'Movies', 'Public'
-    }
-
-    for root, dirs, files in os.walk(start_dir, topdown=True):
-        # Prune search by removing skipped directories
-        dirs[:] = [d for d in dirs if d not in skip_dirs and not d.startswith('.')]
-        
-        for file in files:
-            if filename.lower() in file.lower():
-                matches.append(os.path.join(root, file))
-            # Limit matches to avoid searching forever
-            if len(matches) > 100:
-                break
-        if len(matches) > 100:
-            break
+    log.info(f"🤖 [Tool] Searching for file: {filename}")
+    # Persistent index, refreshed incrementally; no full walk per call
+    matches = get_file_index().search(filename, limit=1)
 
     if not matches:
         return "Error: No file found matching that name."
 
-    # Find the best match using text similarity
-    best_match = max(matches, key=lambda x: difflib.SequenceMatcher(None, filename, os.path.basename(x)).ratio())
-    print(f"Found best match: {best_match}")
+    best_match = matches[0][0]
+    log.debug(f"Found best match: {best_match}")
     return f"Found file at: {best_match}"
 
+# Long-term memory namespaces of the turn running this tool (most specific
+# first), set by run_tool / arun_tool; None = the global namespace only.
+memory_namespaces = ContextVar("memory_namespaces", default=None)
+
 def save_memory(fact: str):
     """save_memory(fact: str): Saves a personal fact, user preference, or important detail to long-term memory. Use this when the user states a new piece of information about themselves (e.g., "my name is...", "my favorite color is blue")."""
-    print(f"🤖 [Tool] Saving to LTM: {fact}")
+    log.info(f"🤖 [Tool] Saving to LTM: {fact}")
     try:
-        store_memory(fact)  # This calls your LlamaIndex function
+        namespace = (memory_namespaces.get() or (None,))[0]
+        # Written in the background; store inline only if the queue is full
+        if memory_write_queue.submit_fact(fact, namespace):
+            return "Successfully saved fact to long-term memory."
+        # Imported on first use: llama-index and pgvector are slow to load
+        from memory.llama_index_memory import store_memory
+        store_memory(fact, namespace)
         return "Successfully saved fact to long-term memory."
     except Exception as e:
-        print(f"Error saving memory: {e}")
+        log.error(f"Error saving memory: {e}")
         return "Error: Could not save fact to memory."
     
 def retrieve_memory(query: str):
     """retrieve_memory(query: str): Retrieves relevant facts from long-term memory based on a query. Use this *first* for any personal questions (e.g., "what is my name?")."""
-    print(f"🤖 [Tool] Retrieving from LTM for query: {query}")
+    log.info(f"🤖 [Tool] Retrieving from LTM for query: {query}")
     try:
-        results = retrieve_relevant_memory(query, top_k=3)
+        from memory.llama_index_memory import retrieve_relevant_memory
+        results = retrieve_relevant_memory(query, top_k=3, namespaces=memory_namespaces.get())
         if not results:
             return "No relevant information found in long-term memory."
         return f"Found relevant facts in memory: {'; '.join(results)}"
     except Exception as e:
-        print(f"Error retrieving memory: {e}")
+        log.error(f"Error retrieving memory: {e}")
         return "Error: Could not retrieve facts from memory."
 
 
@@ -133,15 +143,247 @@ AVAILABLE_TOOLS = {
     "retrieve_memory": retrieve_memory,
 }
 
-# --- DYNAMIC PROMPT GENERATION ---
-def generate_tool_descriptions():
-    """Reads the docstring of each tool in AVAILABLE_TOOLS to build the prompt."""
-    descriptions = []
-    for func in AVAILABLE_TOOLS.values():
-        if func.__doc__:
-            doc = func.__doc__.strip()
-            descriptions.append(f'- "{doc}"')
-    return "\n".join(descriptions)
-
-# This variable is now *dynamically generated*
-TOOL_DESCRIPTIONS = generate_tool_descriptions()
\ No newline at end of file
+# --- Result caching ---
+# Seconds a tool result may be reused (0 = never cached).
+# Override per tool with e.g. TOOL_CACHE_TTL_SEARCH_WEB=600.
+DEFAULT_TOOL_CACHE_TTLS = {
+    "search_web": 3600,
+    "list_files": 5,
+    "find_file": 60,
+    "play_song_on_youtube": 0,
+    "open_path": 0,
+    "get_system_stats": 0,
+    "save_memory": 0,
+    "retrieve_memory": 0,
+}
+TOOL_CACHE_TTLS = {
+    name: float(os.getenv(f"TOOL_CACHE_TTL_{name.upper()}", ttl))
+    for name, ttl in DEFAULT_TOOL_CACHE_TTLS.items()
+}
+
+def _embed_for_cache(text):
+    from memory.local_embedding import get_embedding
+    return get_embedding(text)
+
+# Semantic reuse: "who won the 2022 world cup" can answer
+# "who was the winner of the 2022 world cup". Off unless TOOL_CACHE_SEMANTIC=1.
+tool_cache = ToolResultCache(
+    TOOL_CACHE_TTLS,
+    max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 1000)),
+    semantic_args={"search_web": "query"},
+    semantic_threshold=float(os.getenv("TOOL_CACHE_SEMANTIC_THRESHOLD", 0.92)),
+    embed_fn=_embed_for_cache if os.getenv("TOOL_CACHE_SEMANTIC", "0") == "1" else None,
+    store=get_shared_store(),
+)
+
+# Read-only tools whose identical in-flight calls share one execution
+COALESCE_TOOLS = [n.strip() for n in os.getenv("COALESCE_TOOLS", "search_web").split(",") if n.strip()]
+tool_flights = {name: SingleFlight(name) for name in COALESCE_TOOLS}
+
+def run_tool(name: str, args: dict, namespaces=None):
+    """Calls a registered tool through the result cache."""
+    token = memory_namespaces.set(namespaces)
+    try:
+        with span("tool", name):
+            flight = tool_flights.get(name)
+            if flight is None:
+                return tool_cache.call(name, AVAILABLE_TOOLS[name], args)
+            return flight.do(normalize_args(args), lambda: tool_cache.call(name, AVAILABLE_TOOLS[name], args))
+    finally:
+        memory_namespaces.reset(token)
+
+# --- Concurrent execution ---
+# Coroutine versions of tools that do network I/O; everything else is
+# blocking and runs on the tool thread pool.
+ASYNC_TOOLS = {
+    "search_web": asearch_web,
+}
+
+# Seconds before a tool call is abandoned with an error ToolMessage.
+# Override per tool with e.g. TOOL_TIMEOUT_SEARCH_WEB=45.
+TOOL_TIMEOUT_DEFAULT = float(os.getenv("TOOL_TIMEOUT_DEFAULT", 30))
+DEFAULT_TOOL_TIMEOUTS = {
+    "search_web": 60,
+    "find_file": 60,
+    "get_system_stats": 10,
+    "list_files": 10,
+    "open_path": 10,
+    "play_song_on_youtube": 10,
+}
+TOOL_TIMEOUTS = {
+    name: float(os.getenv(f"TOOL_TIMEOUT_{name.upper()}", DEFAULT_TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_DEFAULT)))
+    for name in AVAILABLE_TOOLS
+}
+
+tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", 8)), thread_name_prefix="tool")
+
+def get_tool_timeout(name: str) -> float:
+    return TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_DEFAULT)
+
+async def arun_tool(name: str, args: dict, namespaces=None):
+    """run_tool for the event loop: coroutine tools directly, blocking ones on tool_pool."""
+    if name in ASYNC_TOOLS:
+        with span("tool", name):
+            flight = tool_flights.get(name)
+            if flight is None:
+                return await tool_cache.acall(name, ASYNC_TOOLS[name], args)
+            return await flight.ado(normalize_args(args), lambda: tool_cache.acall(name, ASYNC_TOOLS[name], args))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(tool_pool, run_tool, name, args, namespaces)
+
+# --- Tool catalog ---
+# Structured schemas are derived once from each tool's signature and
+# docstring, and the prompt lines are rendered once. When the registry is
+# larger than TOOL_SELECT_MIN_TOOLS, prompts list only the TOOL_SELECT_TOP_K
+# tools closest to the query by embedding (plus ALWAYS_INCLUDE_TOOLS).
+TOOL_SELECT_TOP_K = int(os.getenv("TOOL_SELECT_TOP_K", 8))
+TOOL_SELECT_MIN_TOOLS = int(os.getenv("TOOL_SELECT_MIN_TOOLS", 16))
+ALWAYS_INCLUDE_TOOLS = [
+    name.strip() for name in os.getenv("ALWAYS_INCLUDE_TOOLS", "search_web,save_memory,retrieve_memory").split(",")
+    if name.strip()
+]
+_PROMPT_CACHE_SIZE = 256
+
+def _type_name(annotation):
+    if annotation is inspect.Parameter.empty:
+        return "str"
+    return getattr(annotation, "__name__", str(annotation).replace("typing.", ""))
+
+def tool_schema(name: str, func) -> dict:
+    """{"name", "description", "params": [{"name", "type", "required", "default"}]} from the signature."""
+    params = []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        params.append({
+            "name": param.name,
+            "type": _type_name(param.annotation),
+            "required": param.default is inspect.Parameter.empty,
+            "default": None if param.default is inspect.Parameter.empty else param.default,
+        })
+    doc = " ".join((func.__doc__ or "").split())
+    # Docstrings start with the call signature ("name(arg: str): ..."), which the schema already has
+    doc = re.sub(rf"^{re.escape(name)}\(.*?\):\s*", "", doc)
+    return {"name": name, "description": doc, "params": params}
+
+def render_tool(schema: dict) -> str:
+    """One compact prompt line: - name(arg: type, opt: type = default): description"""
+    args = ", ".join(
+        f"{p['name']}: {p['type']}" + ("" if p["required"] else f" = {p['default']!r}")
+        for p in schema["params"]
+    )
+    line = f"- {schema['name']}({args})"
+    return f"{line}: {schema['description']}" if schema["description"] else line
+
+class ToolCatalog:
+    def __init__(self, tools=None, top_k: int = TOOL_SELECT_TOP_K, min_tools: int = TOOL_SELECT_MIN_TOOLS,
+                 always_include=ALWAYS_INCLUDE_TOOLS, embed_fn=None):
+        self.top_k = top_k
+        self.min_tools = min_tools
+        self.always_include = list(always_include)
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self.schemas = {}              # name -> schema, registry order
+        self._lines = {}               # name -> rendered prompt line
+        self._line_tokens = {}
+        self._vectors = None           # (names, normalised description embeddings)
+        self._prompts = OrderedDict()  # tuple(names) -> rendered prompt
+        self._prompt_stats = {}        # kind -> {"calls", "prompt_tokens", "tool_tokens"}
+        for name, func in (tools or {}).items():
+            self.add(name, func)
+
+    def add(self, name: str, func):
+        schema = tool_schema(name, func)
+        with self._lock:
+            self.schemas[name] = schema
+            self._lines[name] = render_tool(schema)
+            self._line_tokens[name] = estimate_tokens(self._lines[name])
+            self._vectors = None
+            self._prompts.clear()
+        return schema
+
+    def __len__(self):
+        return len(self.schemas)
+
+    @property
+    def selects(self) -> bool:
+        """True when prompts list a per-query subset of the tools."""
+        return self.embed_fn is not None and len(self.schemas) > self.min_tools
+
+    def _get_vectors(self):
+        with self._lock:
+            if self._vectors is None:
+                names = list(self.schemas)
+                texts = [f"{name.replace('_', ' ')}: {self.schemas[name]['description']}" for name in names]
+                vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                self._vectors = (names, vectors)
+            return self._vectors
+
+    def select(self, query: str = None, embedding=None, k: int = None) -> list:
+        """Names of the tools to offer for this query, in registry order."""
+        if not self.selects or (not query and embedding is None):
+            return list(self.schemas)
+        if embedding is None:
+            embedding = self.embed_fn(query)
+        names, vectors = self._get_vectors()
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ (query_vector / max(float(np.linalg.norm(query_vector)), 1e-12))
+        k = min(k or self.top_k, len(names))
+        chosen = {names[i] for i in np.argpartition(-scores, k - 1)[:k]}
+        chosen.update(name for name in self.always_include if name in self.schemas)
+        return [name for name in self.schemas if name in chosen]
+
+    def render(self, names=None) -> str:
+        """Prompt text for the given tools (all by default), cached per tool set."""
+        key = tuple(self.schemas) if names is None else tuple(names)
+        with self._lock:
+            text = self._prompts.get(key)
+            if text is None:
+                text = "\n".join(self._lines[name] for name in key if name in self._lines)
+                self._prompts[key] = text
+                while len(self._prompts) > _PROMPT_CACHE_SIZE:
+                    self._prompts.popitem(last=False)
+            else:
+                self._prompts.move_to_end(key)
+            return text
+
+    @property
+    def prompt(self) -> str:
+        return self.render()
+
+    def prompt_for(self, query: str = None, embedding=None) -> str:
+        return self.render(self.select(query, embedding))
+
+    def record_prompt(self, kind: str, prompt_tokens: int, tool_tokens: int = 0):
+        """Adds one LLM call's prompt size to the per-kind totals."""
+        with self._lock:
+            stats = self._prompt_stats.setdefault(kind, {"calls": 0, "prompt_tokens": 0, "tool_tokens": 0})
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["tool_tokens"] += tool_tokens
+
+    def prompt_stats(self) -> dict:
+        """Per kind: calls, total and mean prompt tokens, and the share spent on tool descriptions."""
+        with self._lock:
+            return {
+                kind: dict(stats, mean_prompt_tokens=stats["prompt_tokens"] / stats["calls"],
+                           mean_tool_tokens=stats["tool_tokens"] / stats["calls"])
+                for kind, stats in self._prompt_stats.items()
+            }
+
+def _embed_tool_text(text):
+    from memory.local_embedding import get_embedding
+    return get_embedding(text)
+
+tool_catalog = ToolCatalog(AVAILABLE_TOOLS, embed_fn=_embed_tool_text)
+
+def register_tool(name: str, func, timeout: float = None, cache_ttl: float = 0):
+    """Adds a tool to the registry, the catalog, and the timeout/cache settings."""
+    AVAILABLE_TOOLS[name] = func
+    TOOL_TIMEOUTS[name] = float(timeout if timeout is not None else TOOL_TIMEOUT_DEFAULT)
+    TOOL_CACHE_TTLS[name] = float(cache_ttl)
+    tool_catalog.add(name, func)
+
+# Every tool, rendered at import time
+TOOL_DESCRIPTIONS = tool_catalog.prompt
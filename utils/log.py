@@ -0,0 +1,59 @@
+# utils/log.py
+"""
+Leveled logging for the agent.
+
+LOG_FORMAT=plain (default) prints just the message, so the console looks as
+it always has; LOG_FORMAT=json prints one JSON object per line with the
+timestamp, level, logger and any `extra=` fields, for log shippers.
+LOG_LEVEL sets the threshold (DEBUG also shows every timing span).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "plain").lower()
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger("jarvis")
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter("%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger "jarvis.<name>", sharing one handler configured from LOG_LEVEL / LOG_FORMAT."""
+    if not _configured:
+        _configure()
+    return logging.getLogger(f"jarvis.{name}")
@@ -0,0 +1,219 @@
+# utils/metrics.py
+"""
+In-process latency metrics, exported in the Prometheus text format.
+
+Every instrumented operation is a span with a kind (request, node, llm,
+tool, embedding, vector_store) and a name; its duration goes into the
+jarvis_span_seconds histogram and failures into jarvis_span_errors_total.
+
+    with span("tool", "search_web"):
+        ...
+
+    @timed("node", "planner_llm")
+    def call_planner_llm(state, config): ...
+
+METRICS_ENABLED=0 turns spans into no-ops. Spans are also logged at DEBUG.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from utils.log import get_logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+log = get_logger("metrics")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> dict:
+        """label values -> {"count", "sum", "buckets": [(le, cumulative count)]}"""
+        with self._lock:
+            items = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._series.items()]
+        result = {}
+        for labels, counts, total, n in items:
+            cumulative, running = [], 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                cumulative.append((le, running))
+            result[labels] = {"count": n, "sum": total, "buckets": cumulative}
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            for le, c in series["buckets"]:
+                le_text = "+Inf" if le == float("inf") else repr(le)
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames + ('le',), labels + (le_text,))} {c}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series['sum']}")
+            lines.append(f"{self.name}_count{label_text} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, description: str, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def value(self, labels=()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+SPAN_SECONDS = REGISTRY.histogram("jarvis_span_seconds", "Duration of instrumented operations.", ("kind", "name"))
+SPAN_ERRORS = REGISTRY.counter("jarvis_span_errors_total", "Instrumented operations that raised.", ("kind", "name"))
+
+
+def observe(kind: str, name: str, seconds: float):
+    """Records a duration measured elsewhere (e.g. time to first token)."""
+    if METRICS_ENABLED:
+        SPAN_SECONDS.observe(seconds, (kind, name))
+
+
+class span:
+    """Context manager timing one operation."""
+    __slots__ = ("labels", "start")
+
+    def __init__(self, kind: str, name: str):
+        self.labels = (kind, name)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not METRICS_ENABLED:
+            return False
+        elapsed = time.perf_counter() - self.start
+        SPAN_SECONDS.observe(elapsed, self.labels)
+        if exc_type is not None:
+            SPAN_ERRORS.inc(self.labels)
+        if log.isEnabledFor(10):  # DEBUG
+            log.debug(f"[Span] {self.labels[0]}/{self.labels[1]} {elapsed * 1000:.1f} ms",
+                      extra={"span_kind": self.labels[0], "span_name": self.labels[1],
+                             "duration_ms": round(elapsed * 1000, 3), "error": exc_type is not None})
+        return False
+
+
+def timed(kind: str, name: str = None):
+    """Decorator form of span for sync and async functions."""
+    def decorator(func):
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,180 @@
+# utils/shared_state.py
+"""
+Key-value store for state that every worker process must see the same way
+(short-term memory, the tool result cache), selected by SHARED_STATE_BACKEND.
+
+  memory  a dict in this process: the default, for a single worker.
+  sqlite  one WAL-mode SQLite file (SHARED_STATE_PATH) that every worker on
+          the host opens; a local stand-in for a networked store.
+
+Values are pickled. Every write bumps a per-key version, so a worker that
+keeps a hot copy of an entry can ask for the version (one indexed read) and
+reload only when another worker changed it. acquire() is an expiring lease,
+for jobs that only one worker should run.
+"""
+import os
+import pickle
+import threading
+import time
+
+from utils.log import get_logger
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.sqlite")
+
+log = get_logger("shared_state")
+
+
+class InProcessStore:
+    shared = False  # nothing outside this process can change an entry
+
+    def __init__(self):
+        self._data = {}  # (namespace, key) -> (version, expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str, default=None):
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                return default
+            if entry[1] is not None and entry[1] < time.time():
+                del self._data[(namespace, key)]
+                return default
+            return entry[2]
+
+    def version(self, namespace: str, key: str) -> int:
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            return entry[0] if entry else 0
+
+    def set(self, namespace: str, key: str, value, ttl: float = None) -> int:
+        """Stores value (expiring after ttl seconds if given); returns the new version."""
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            version = (entry[0] if entry else 0) + 1
+            self._data[(namespace, key)] = (version, time.time() + ttl if ttl else None, value)
+            return version
+
+    def acquire(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        """Takes or renews a lease on key for ttl seconds; False while another owner holds it."""
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is not None and entry[2] != owner and entry[1] is not None and entry[1] >= time.time():
+                return False
+            self._data[(namespace, key)] = ((entry[0] if entry else 0) + 1, time.time() + ttl, owner)
+            return True
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return sum(1 for ns, _ in self._data if ns == namespace)
+
+
+class SqliteStore:
+    shared = True
+    PURGE_EVERY = 1000  # writes between sweeps of expired rows
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        import sqlite3
+
+        self.path = path
+        self._writes = 0
+        self._local = threading.local()  # one connection per thread
+        self._sqlite3 = sqlite3
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                expires_at REAL,
+                value BLOB NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        log.info(f"[SharedState] SQLite (WAL) at {path}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, default=None):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def version(self, namespace: str, key: str) -> int:
+        row = self._conn().execute(
+            "SELECT version FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set(self, namespace: str, key: str, value, ttl: float = None) -> int:
+        row = self._conn().execute(
+            """
+            INSERT INTO shared_state (namespace, key, version, expires_at, value) VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                version = version + 1, expires_at = excluded.expires_at, value = excluded.value
+            RETURNING version
+            """,
+            (namespace, key, time.time() + ttl if ttl else None, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+        ).fetchone()
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM shared_state WHERE expires_at < ?", (time.time(),))
+        return row[0]
+
+    def acquire(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        # One statement, so two workers cannot both take an expired lease
+        row = self._conn().execute(
+            """
+            INSERT INTO shared_state (namespace, key, version, expires_at, value) VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                version = version + 1, expires_at = excluded.expires_at, value = excluded.value
+            WHERE shared_state.value = excluded.value OR shared_state.expires_at < ?
+            RETURNING version
+            """,
+            (namespace, key, now + ttl, pickle.dumps(owner, pickle.HIGHEST_PROTOCOL), now),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, namespace: str, key: str):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def count(self, namespace: str) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM shared_state WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+
+def create_store(backend: str = SHARED_STATE_BACKEND, path: str = SHARED_STATE_PATH):
+    if backend == "memory":
+        return InProcessStore()
+    if backend == "sqlite":
+        return SqliteStore(path)
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {backend!r}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """The process-wide store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
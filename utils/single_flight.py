@@ -0,0 +1,125 @@
+# utils/single_flight.py
+"""
+Single-flight: while a call for a key is in flight, identical calls wait for
+its result instead of starting their own.
+
+    llm_flight = SingleFlight("llm")
+    result = llm_flight.do(key, lambda: post(payload))        # threads
+    result = await llm_flight.ado(key, lambda: apost(payload))  # coroutines
+
+Only for idempotent reads (an LLM completion, a web search); the result or
+exception of the leading call is shared with every follower. A coroutine
+call keeps running when the caller that started it is cancelled, as long as
+another caller still waits for it. Coalesced calls are counted in
+jarvis_coalesced_calls_total{kind}.
+SINGLE_FLIGHT_ENABLED=0 makes every call run on its own.
+"""
+import asyncio
+import os
+import threading
+
+from utils.metrics import REGISTRY
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+
+COALESCED_CALLS = REGISTRY.counter("jarvis_coalesced_calls_total",
+                                   "Calls answered by an identical call already in flight.", ("kind",))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._calls = {}    # key -> _Call (threads)
+        self._futures = {}  # (loop id, key) -> _Flight (coroutines; tasks belong to one loop)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def _record(self, coalesced: bool):
+        with self._lock:
+            self._stats["calls"] += 1
+            if coalesced:
+                self._stats["coalesced"] += 1
+        if coalesced:
+            COALESCED_CALLS.inc((self.kind,))
+
+    def do(self, key, fn):
+        if not SINGLE_FLIGHT_ENABLED:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._record(not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, afn):
+        if not SINGLE_FLIGHT_ENABLED:
+            return await afn()
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            flight = self._futures.get(flight_key)
+            leader = flight is None
+            if leader:
+                # The call runs as its own task, so cancelling whichever caller
+                # started it (a tool timeout, a dropped client) leaves it running
+                # for the others
+                flight = self._futures[flight_key] = _Flight(loop.create_task(afn()))
+                flight.task.add_done_callback(lambda _: self._finish(flight_key, flight))
+            flight.waiters += 1
+        self._record(not leader)
+
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and not flight.task.done()
+            if abandoned:  # every caller gave up
+                flight.task.cancel()
+
+    def _finish(self, flight_key, flight):
+        with self._lock:
+            if self._futures.get(flight_key) is flight:
+                del self._futures[flight_key]
+        # Nobody may be waiting: don't warn about an unretrieved exception
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls) + len(self._futures))
@@ -0,0 +1,113 @@
+# utils/warmup.py
+"""
+Background warm-up of the slow components (embedding model, vector store,
+compiled graph + checkpointer) and the readiness state reported by /ready.
+Each component also loads lazily on first use, so warm-up is optional:
+readiness checks whether each component is actually loaded, whoever loaded
+it. A component that fails to load (e.g. Postgres not up yet) is retried
+with exponential backoff, WARMUP_RETRY_SECONDS doubling up to
+WARMUP_RETRY_MAX_SECONDS (WARMUP_RETRY_SECONDS=0: no retries).
+"""
+import asyncio
+import importlib
+import inspect
+import os
+import sys
+import time
+
+from utils.log import get_logger
+
+log = get_logger("warmup")
+
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 2))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", 60))
+
+
+def _load_embedding_model():
+    from memory.local_embedding import get_embed_model
+    get_embed_model()
+
+
+def _load_memory_store():
+    from memory.llama_index_memory import memory_service
+    memory_service.get_index()
+
+
+async def _load_graph():
+    # Import in a worker thread so langgraph's import cost doesn't stall requests
+    main_graph = await asyncio.to_thread(importlib.import_module, "graph.main_graph")
+    await main_graph.get_async_graph()
+
+
+# Whether a component is loaded, without importing anything that isn't yet
+# (getattr: the module may still be importing in another thread)
+def _graph_loaded():
+    main_graph = sys.modules.get("graph.main_graph")
+    return getattr(main_graph, "_async_graph", None) is not None or getattr(main_graph, "_graph", None) is not None
+
+
+def _embedding_model_loaded():
+    return getattr(sys.modules.get("memory.local_embedding"), "_embed_model_instance", None) is not None
+
+
+def _memory_store_loaded():
+    service = getattr(sys.modules.get("memory.llama_index_memory"), "memory_service", None)
+    return getattr(service, "_index", None) is not None
+
+
+COMPONENTS = {
+    "graph": (_load_graph, _graph_loaded),
+    "embedding_model": (_load_embedding_model, _embedding_model_loaded),
+    "memory_store": (_load_memory_store, _memory_store_loaded),
+}
+
+_status = {name: {"state": "pending"} for name in COMPONENTS}
+
+
+async def _load(name) -> bool:
+    loader, _ = COMPONENTS[name]
+    attempts = _status[name].get("attempts", 0) + 1
+    _status[name] = {"state": "loading", "attempts": attempts}
+    start = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(loader):
+            await loader()
+        else:
+            # Model/DB loading blocks; keep it off the event loop
+            await asyncio.to_thread(loader)
+    except Exception as e:
+        log.error(f"[Warm-up] {name} failed (attempt {attempts}): {e}")
+        _status[name] = {"state": "failed", "error": str(e), "attempts": attempts}
+        return False
+    _status[name] = {"state": "ready", "seconds": round(time.perf_counter() - start, 3)}
+    return True
+
+
+async def _retry(name):
+    delay = WARMUP_RETRY_SECONDS
+    while not COMPONENTS[name][1]():
+        await asyncio.sleep(delay)
+        if await _load(name):
+            return
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+
+async def warm_up():
+    """Loads every component in turn, then retries the ones that failed until they load."""
+    failed = [name for name in COMPONENTS if not await _load(name)]
+    if failed and WARMUP_RETRY_SECONDS > 0:
+        await asyncio.gather(*(_retry(name) for name in failed))
+
+
+def readiness():
+    report = {}
+    for name, (_, loaded) in COMPONENTS.items():
+        status = dict(_status[name])
+        if status["state"] != "ready" and loaded():
+            status = {"state": "ready"}  # loaded lazily by a request
+        report[name] = status
+    return report
+
+
+def is_ready() -> bool:
+    return all(status["state"] == "ready" for status in readiness().values())